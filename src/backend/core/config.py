@@ -38,6 +38,18 @@ class Settings(BaseModel):
     DATABASE_PORT: str = os.getenv("DATABASE_PORT", "")
     DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL", "")
     DATABASE_URI: Optional[str] = os.getenv("DATABASE_URI", "")
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
+    DATABASE_POOL_TIMEOUT: int = int(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+    DATABASE_POOL_RECYCLE: int = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+    DATABASE_POOL_PRE_PING: bool = os.getenv("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+    DATABASE_STATEMENT_CACHE_SIZE: int = int(os.getenv("DATABASE_STATEMENT_CACHE_SIZE", "500"))
+    DATABASE_BACKEND: str = os.getenv("DATABASE_BACKEND", "postgresql").lower()
+    DATABASE_PATH: str = os.getenv("DATABASE_PATH", "")
+    DATABASE_ANALYTICS_PATH: str = os.getenv("DATABASE_ANALYTICS_PATH", ":memory:")
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "4096"))
+    QUERY_CACHE_TTL: int = int(os.getenv("QUERY_CACHE_TTL", "86400"))
 
 
 
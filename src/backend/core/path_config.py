@@ -27,6 +27,27 @@ log.debug(f"DATA_PATH: {DATA_PATH}")
 # Path to the NBA Data directory
 NBA_DATA_PATH = os.path.join(DATA_PATH, 'nba')
 
+# Path to the basketball-reference CSV files
+BBALL_REF_PATH = os.path.join(NBA_DATA_PATH, 'processed', 'Data', 'bball_ref')
+
+# Path to the nba_api response cache
+NBA_CACHE_PATH = os.path.join(NBA_DATA_PATH, 'cache', 'responses.sqlite')
+
+# Path to the persisted player identity index
+NBA_IDENTITY_PATH = os.path.join(NBA_DATA_PATH, 'cache', 'identity.pickle')
+
+# Path to the persisted player season similarity index
+NBA_SIMILARITY_PATH = os.path.join(NBA_DATA_PATH, 'cache', 'similarity.npz')
+
+# Path to the persisted rolling game log feature state
+NBA_ROLLING_STATE_PATH = os.path.join(NBA_DATA_PATH, 'cache', 'rolling_state.npz')
+
+# Path to the season-partitioned LeagueDashPlayerStats store
+NBA_LEAGUE_DASH_PATH = os.path.join(NBA_DATA_PATH, 'processed', 'Data', 'nba', 'stats', 'league_dash')
+
+# Path to the incrementally ingested game logs
+NBA_GAME_LOG_PATH = os.path.join(NBA_DATA_PATH, 'processed', 'Data', 'nba', 'game_logs')
+
 
 PKG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 log.debug(f"PKG_ROOT: {PKG_ROOT}")
@@ -0,0 +1,421 @@
+"""Vectorized advanced stats of every player season, from box totals and team context.
+
+The metrics of ``PlayerAdvancedStats`` are computed for all seasons in one
+lazy polars plan, each formula a column expression over the whole corpus:
+
+    shooting    TS%, eFG%, 3PAr, FTr, TOV%
+    shares      ORB%, DRB%, TRB%, AST%, STL%, BLK%, USG%
+    ratings     Dean Oliver's individual offensive and defensive ratings
+    value       offensive/defensive win shares, WS/48, BPM and VORP
+
+Team and opponent context comes from ``Team Totals.csv`` and ``Opponent
+Totals.csv``. The corpus has no player totals file, so ``player_totals``
+rebuilds them from ``Per 100 Poss.csv``: a per 100 stat times the player's
+possessions (team possessions times their share of team minutes), with makes
+refined from the published percentages. Seasons before 1974 lack turnovers
+and offensive rebounds and are skipped.
+
+Players who changed teams are computed per team stint, then combined: box
+rates from the summed totals, shares and ratings weighted by minutes, win
+shares and VORP summed.
+
+BPM and OBPM are the BPM 1.0 regressions, with team adjustments making the
+minutes weighted BPM of a team equal its net rating and its OBPM its
+offensive rating less the league's; DBPM is BPM less OBPM. The published files carry no
+BPM or win shares to check against; ``validate`` compares the team shooting
+and pace formulas with ``Team Summaries.csv`` and the player ratings with
+the ``o_rtg``/``d_rtg`` of ``Per 100 Poss.csv``:
+
+    python -m backend.data.nba.advanced --validate
+"""
+import argparse
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import polars as pl
+from loguru import logger
+
+from backend.data.nba.bball_ref import BOX_STATS, scan
+
+
+log = logger.bind(name=__file__)
+
+# Team name of the league average rows of the team files
+LEAGUE_AVERAGE = "League Average"
+
+# Team of the combined row of players who played for several teams
+MULTI_TEAM = r"^(TOT|\dTM)$"
+
+# Counting stats rebuilt from the per 100 possession rates
+COUNTING_STATS = [s for s in BOX_STATS if not s.endswith("_percent")]
+
+# Coefficients of the BPM 1.0 regression; the usage times turnover term and
+# the scoring constant are subtracted
+BPM = {
+    "mpg": 0.123391, "orb": 0.119597, "drb": -0.151287, "stl": 1.255644,
+    "blk": 0.531838, "ast": -0.305868, "usg_tov": 0.921292, "usg_scoring": 0.711217,
+    "scoring_ast": 0.017022, "scoring_3par": 0.297639, "scoring_constant": 0.213485,
+    "ast_trb": 0.725930,
+}
+
+# Coefficients of the BPM 1.0 offensive regression, as for BPM
+OBPM = {
+    "mpg": 0.064448, "orb": 0.211125, "drb": -0.107545, "stl": 0.346513,
+    "blk": -0.052476, "ast": -0.041787, "usg_tov": 0.932965, "usg_scoring": 0.688191,
+    "scoring_ast": 0.007952, "scoring_3par": 0.374441, "scoring_constant": -0.181598,
+    "ast_trb": 0.239659,
+}
+
+# BPM of a replacement level player, the baseline of VORP
+REPLACEMENT_BPM = -2.0
+
+# Team games VORP is scaled to
+SEASON_GAMES = 82
+
+# Columns of PlayerAdvancedStats and the frame columns they are filled from
+MODEL_COLUMNS = {
+    "true_shooting_percentage": "ts_percent",
+    "effective_field_goal_percentage": "e_fg_percent",
+    "three_point_attempt_rate": "x3p_ar",
+    "free_throw_attempt_rate": "f_tr",
+    "offensive_rebound_percentage": "orb_percent",
+    "defensive_rebound_percentage": "drb_percent",
+    "total_rebound_percentage": "trb_percent",
+    "assist_percentage": "ast_percent",
+    "steal_percentage": "stl_percent",
+    "block_percentage": "blk_percent",
+    "turnover_percentage": "tov_percent",
+    "usage_percentage": "usg_percent",
+    "offensive_win_shares": "ows",
+    "defensive_win_shares": "dws",
+    "win_shares": "ws",
+    "win_shares_per_48_minutes": "ws_per_48",
+    "offensive_box_plus_minus": "obpm",
+    "defensive_box_plus_minus": "dbpm",
+    "box_plus_minus": "bpm",
+    "value_over_replacement_player": "vorp",
+}
+
+
+def c(name: str) -> pl.Expr:
+    return pl.col(name)
+
+
+def _div(numerator: pl.Expr, denominator: pl.Expr) -> pl.Expr:
+    """Divide, null instead of inf/NaN where the denominator is zero."""
+    return pl.when(denominator != 0).then(numerator / denominator).otherwise(None)
+
+
+def possessions(tm: str = "tm_", opp: str = "opp_") -> pl.Expr:
+    """Basketball-reference's possession estimate, averaged over both teams."""
+    def side(a: str, b: str) -> pl.Expr:
+        orb_share = _div(c(f"{a}orb"), c(f"{a}orb") + c(f"{b}drb"))
+        return (c(f"{a}fga") + 0.4 * c(f"{a}fta")
+                - 1.07 * orb_share * (c(f"{a}fga") - c(f"{a}fg")) + c(f"{a}tov"))
+    return 0.5 * (side(tm, opp) + side(opp, tm))
+
+
+def shooting(prefix: str = "") -> Dict[str, pl.Expr]:
+    """TS%, eFG%, 3PAr, FTr and TOV% of box totals whose columns start with ``prefix``."""
+    def p(name: str) -> pl.Expr:
+        return c(f"{prefix}{name}")
+    attempts = p("fga") + 0.44 * p("fta")
+    return {
+        "ts_percent": _div(p("pts"), 2 * attempts),
+        "e_fg_percent": _div(p("fg") + 0.5 * p("x3p"), p("fga")),
+        "x3p_ar": _div(p("x3pa"), p("fga")),
+        "f_tr": _div(p("fta"), p("fga")),
+        "tov_percent": 100 * _div(p("tov"), attempts + p("tov")),
+    }
+
+
+def team_context(seasons: Optional[Iterable[int]] = None) -> pl.LazyFrame:
+    """
+    Team totals joined with their opponents' totals and league averages.
+
+    Team columns are prefixed ``tm_``, opponent columns ``opp_`` and league
+    columns ``lg_``; one row per (season, lg, abbreviation).
+    """
+    keys = ["season", "lg", "team", "abbreviation"]
+    stats = COUNTING_STATS
+    team = scan("team_totals", [*keys, "g", "mp", *stats]).rename(
+        {name: f"tm_{name}" for name in ["g", "mp", *stats]})
+    opponent = scan("opponent_totals", [*keys, *(f"opp_{s}" for s in stats)])
+    frame = team.join(opponent, on=keys).filter(
+        (c("team") != LEAGUE_AVERAGE) & c("tm_tov").is_not_null() & c("tm_orb").is_not_null())
+    if seasons is not None:
+        frame = frame.filter(c("season").is_in(list(seasons)))
+    frame = frame.with_columns(tm_poss=possessions())
+    frame = frame.with_columns(tm_pace=48 * c("tm_poss") / (c("tm_mp") / 5))
+    league = pl.col("season"), pl.col("lg")
+    return frame.with_columns(
+        lg_ppp=(c("tm_pts").sum() / c("tm_poss").sum()).over(*league),
+        lg_ppg=(c("tm_pts").sum() / c("tm_g").sum()).over(*league),
+        lg_pace=(48 * c("tm_poss").sum() / (c("tm_mp").sum() / 5)).over(*league),
+        lg_x3p_ar=(c("tm_x3pa").sum() / c("tm_fga").sum()).over(*league),
+        tm_ts_percent=shooting("tm_")["ts_percent"],
+        tm_net_rtg=100 * (c("tm_pts") - c("opp_pts")) / c("tm_poss"),
+    )
+
+
+def player_totals(seasons: Optional[Iterable[int]] = None) -> pl.LazyFrame:
+    """
+    Box totals of every player team stint, rebuilt from the per 100 possession file.
+
+    Combined rows of players who changed teams are dropped, their stints
+    are kept. Each row carries the context of its team.
+    """
+    per_100 = scan("per_100_poss").filter(~c("tm").str.contains(MULTI_TEAM))
+    frame = per_100.join(team_context(seasons),
+                         left_on=["season", "lg", "tm"],
+                         right_on=["season", "lg", "abbreviation"])
+    poss = c("tm_poss") * c("mp") / (c("tm_mp") / 5)
+    frame = frame.with_columns(poss=poss).with_columns(
+        (c(f"{s}_per_100_poss") * c("poss") / 100).round(0).alias(s) for s in COUNTING_STATS)
+    # The published percentages have more precision than the rates
+    frame = frame.with_columns(
+        pl.when(c(f"{shot}_percent").is_not_null())
+        .then((c(f"{shot}a") * c(f"{shot}_percent")).round(0))
+        .otherwise(c(shot)).alias(shot)
+        for shot in ("fg", "x3p", "ft"))
+    return frame.with_columns(
+        x2p=c("fg") - c("x3p"), x2pa=c("fga") - c("x3pa"),
+        pts=2 * c("fg") + c("x3p") + c("ft"))
+
+
+def _shares() -> Dict[str, pl.Expr]:
+    share = c("mp") / (c("tm_mp") / 5)
+    return {
+        "orb_percent": 100 * _div(c("orb"), share * (c("tm_orb") + c("opp_drb"))),
+        "drb_percent": 100 * _div(c("drb"), share * (c("tm_drb") + c("opp_orb"))),
+        "trb_percent": 100 * _div(c("trb"), share * (c("tm_trb") + c("opp_trb"))),
+        "ast_percent": 100 * _div(c("ast"), share * c("tm_fg") - c("fg")),
+        "stl_percent": 100 * _div(c("stl"), share * c("tm_poss")),
+        "blk_percent": 100 * _div(c("blk"), share * (c("opp_fga") - c("opp_x3pa"))),
+        "usg_percent": 100 * _div(c("fga") + 0.44 * c("fta") + c("tov"),
+                                  share * (c("tm_fga") + 0.44 * c("tm_fta") + c("tm_tov"))),
+    }
+
+
+def _offense(frame: pl.LazyFrame) -> pl.LazyFrame:
+    """Points produced, possessions used and offensive rating (Dean Oliver)."""
+    share = c("mp") / (c("tm_mp") / 5)
+    tm_ft_share = 1 - (1 - _div(c("tm_ft"), c("tm_fta"))) ** 2
+    frame = frame.with_columns(
+        q_ast=share * (1.14 * _div(c("tm_ast") - c("ast"), c("tm_fg")))
+        + _div(c("tm_ast") / c("tm_mp") * c("mp") * 5 - c("ast"),
+               c("tm_fg") / c("tm_mp") * c("mp") * 5 - c("fg")) * (1 - share),
+        tm_sc_poss=c("tm_fg") + tm_ft_share * c("tm_fta") * 0.4,
+        tm_orb_percent=c("tm_orb") / (c("tm_orb") + c("opp_drb")),
+        ft_share=(1 - (1 - _div(c("ft"), c("fta"))) ** 2).fill_null(0),
+        shot_points=_div(c("pts") - c("ft"), 2 * c("fga")).fill_null(0),
+    ).with_columns(
+        tm_play_percent=c("tm_sc_poss") / (c("tm_fga") + c("tm_fta") * 0.4 + c("tm_tov")),
+    ).with_columns(
+        tm_orb_weight=((1 - c("tm_orb_percent")) * c("tm_play_percent"))
+        / ((1 - c("tm_orb_percent")) * c("tm_play_percent")
+           + c("tm_orb_percent") * (1 - c("tm_play_percent"))),
+    ).with_columns(
+        orb_factor=1 - c("tm_orb") / c("tm_sc_poss") * c("tm_orb_weight") * c("tm_play_percent"),
+        ast_points=0.5 * _div((c("tm_pts") - c("tm_ft")) - (c("pts") - c("ft")),
+                              2 * (c("tm_fga") - c("fga"))) * c("ast"),
+        orb_part=c("orb") * c("tm_orb_weight") * c("tm_play_percent"),
+    )
+    sc_poss = ((c("fg") * (1 - 0.5 * c("shot_points") * c("q_ast")) + c("ast_points")
+                + c("ft_share") * 0.4 * c("fta")) * c("orb_factor") + c("orb_part"))
+    missed = ((c("fga") - c("fg")) * (1 - 1.07 * c("tm_orb_percent"))
+              + (1 - _div(c("ft"), c("fta")).fill_null(0)) ** 2 * 0.4 * c("fta"))
+    points = ((2 * (c("fg") + 0.5 * c("x3p")) * (1 - 0.5 * c("shot_points") * c("q_ast"))
+               + 2 * _div(c("tm_fg") - c("fg") + 0.5 * (c("tm_x3p") - c("x3p")),
+                          c("tm_fg") - c("fg")) * c("ast_points")
+               + c("ft")) * c("orb_factor")
+              + c("orb_part") * c("tm_pts") / c("tm_sc_poss"))
+    return frame.with_columns(
+        off_poss=sc_poss + missed + c("tov"), points_produced=points,
+    ).with_columns(o_rtg_calc=100 * _div(c("points_produced"), c("off_poss")))
+
+
+def _defense(frame: pl.LazyFrame) -> pl.LazyFrame:
+    """Stops and defensive rating (Dean Oliver)."""
+    dor = c("opp_orb") / (c("opp_orb") + c("tm_drb"))
+    dfg = c("opp_fg") / c("opp_fga")
+    opp_ft_miss = (1 - _div(c("opp_ft"), c("opp_fta"))) ** 2
+    frame = frame.with_columns(
+        fm_wt=(dfg * (1 - dor)) / (dfg * (1 - dor) + (1 - dfg) * dor), dor=dor)
+    stops = (c("stl") + c("blk") * c("fm_wt") * (1 - 1.07 * c("dor"))
+             + c("drb") * (1 - c("fm_wt"))
+             + ((c("opp_fga") - c("opp_fg") - c("tm_blk")) / c("tm_mp")
+                * c("fm_wt") * (1 - 1.07 * c("dor"))
+                + (c("opp_tov") - c("tm_stl")) / c("tm_mp")) * c("mp")
+             + _div(c("pf"), c("tm_pf")) * 0.4 * c("opp_fta") * opp_ft_miss)
+    tm_d_rtg = 100 * c("opp_pts") / c("tm_poss")
+    points_per_stop = c("opp_pts") / (c("opp_fg") + (1 - opp_ft_miss) * c("opp_fta") * 0.4)
+    stop_percent = stops * c("tm_mp") / (c("tm_poss") * c("mp"))
+    return frame.with_columns(
+        d_rtg_calc=tm_d_rtg + 0.2 * (100 * points_per_stop * (1 - stop_percent) - tm_d_rtg))
+
+
+def _win_shares(frame: pl.LazyFrame) -> pl.LazyFrame:
+    points_per_win = 0.32 * c("lg_ppg") * (c("tm_pace") / c("lg_pace"))
+    return frame.with_columns(
+        ows=(c("points_produced") - 0.92 * c("lg_ppp") * c("off_poss")) / points_per_win,
+        dws=(c("mp") / c("tm_mp") * c("tm_poss")
+             * (1.08 * c("lg_ppp") - c("d_rtg_calc") / 100)) / points_per_win,
+    ).with_columns(ws=c("ows") + c("dws"))
+
+
+def _raw_bpm(coefficients: Dict[str, float]) -> pl.Expr:
+    """A BPM 1.0 regression of the stint's box rates, before the team adjustment."""
+    tov = c("tov_percent") / 100
+    scoring = (2 * (c("ts_percent") - c("tm_ts_percent"))
+               + coefficients["scoring_ast"] * c("ast_percent")
+               + coefficients["scoring_3par"] * (c("x3p_ar") - c("lg_x3p_ar"))
+               - coefficients["scoring_constant"])
+    return (coefficients["mpg"] * c("mp") / (c("g") + 4)
+            + coefficients["orb"] * c("orb_percent") + coefficients["drb"] * c("drb_percent")
+            + coefficients["stl"] * c("stl_percent") + coefficients["blk"] * c("blk_percent")
+            + coefficients["ast"] * c("ast_percent")
+            - coefficients["usg_tov"] * c("usg_percent") * tov
+            + coefficients["usg_scoring"] * c("usg_percent") * (1 - tov) * scoring
+            + coefficients["ast_trb"] * (c("ast_percent") * c("trb_percent")).sqrt()
+            ).fill_nan(None)
+
+
+def _team_adjusted(raw: str, target: pl.Expr) -> pl.Expr:
+    """Shift ``raw`` so the minutes weighted sum of every team equals ``target``."""
+    team = ["season", "lg", "tm"]
+    # Divided by the summed shares, not 5, as rounded player minutes rarely add up exactly
+    return c(raw) + ((target - (c(raw) * c("minutes_share")).sum().over(team))
+                     / c("minutes_share").filter(c(raw).is_not_null()).sum().over(team))
+
+
+def _box_plus_minus(frame: pl.LazyFrame) -> pl.LazyFrame:
+    """BPM, OBPM and DBPM 1.0 per stint, adjusted per team, and VORP."""
+    frame = frame.with_columns(raw_bpm=_raw_bpm(BPM), raw_obpm=_raw_bpm(OBPM),
+                               minutes_share=c("mp") / (c("tm_mp") / 5))
+    return frame.with_columns(
+        bpm=_team_adjusted("raw_bpm", c("tm_net_rtg")),
+        obpm=_team_adjusted("raw_obpm", 100 * (c("tm_pts") / c("tm_poss") - c("lg_ppp"))),
+    ).with_columns(
+        dbpm=c("bpm") - c("obpm"),
+        vorp=(c("bpm") - REPLACEMENT_BPM) * c("minutes_share") * c("tm_g") / SEASON_GAMES)
+
+
+def _stints(seasons: Optional[Iterable[int]] = None) -> pl.LazyFrame:
+    frame = player_totals(seasons).with_columns(**shooting(), **_shares())
+    return _box_plus_minus(_win_shares(_defense(_offense(frame))))
+
+
+def _combine(stints: pl.LazyFrame) -> pl.LazyFrame:
+    """One row per player season out of the team stints."""
+    weighted = ["orb_percent", "drb_percent", "trb_percent", "ast_percent", "stl_percent",
+                "blk_percent", "usg_percent", "o_rtg_calc", "d_rtg_calc", "bpm", "obpm"]
+    summed = ["g", "mp", *COUNTING_STATS, "ows", "dws", "ws", "vorp"]
+    frame = stints.group_by("player_id", "season").agg(
+        c("player").first(), c("tm").str.join("/").alias("tm"),
+        *(c(name).sum() for name in summed),
+        *((_div((c(name) * c("mp")).sum(), c("mp").filter(c(name).is_not_null()).sum()))
+          .alias(name) for name in weighted),
+    )
+    return frame.with_columns(
+        **shooting(),
+        ws_per_48=48 * _div(c("ws"), c("mp")),
+        dbpm=c("bpm") - c("obpm"),
+    ).rename({"o_rtg_calc": "o_rtg", "d_rtg_calc": "d_rtg"})
+
+
+def compute_advanced(seasons: Optional[Iterable[int]] = None) -> pl.DataFrame:
+    """
+    Compute the advanced stats of every player season in one pass.
+
+    Args:
+        seasons: Seasons to compute, as the end years of the bball_ref files,
+            all seasons since 1974 by default.
+
+    Returns:
+        One row per (player_id, season) with the box totals, the columns of
+        ``MODEL_COLUMNS`` and the offensive and defensive ratings.
+    """
+    start = time.perf_counter()
+    frame = _combine(_stints(seasons)).sort("season", "player_id").collect()
+    log.info(f"Computed advanced stats of {frame.height} player seasons "
+             f"in {time.perf_counter() - start:.2f}s")
+    return frame
+
+
+def validate(seasons: Optional[Iterable[int]] = None) -> Dict[str, float]:
+    """
+    Compare the computed values with the published ones.
+
+    Returns:
+        Mean absolute error per metric: the team shooting and pace formulas
+        against Team Summaries, and the player offensive and defensive
+        ratings, of players with at least 500 minutes, against Per 100 Poss.
+    """
+    keys = ["season", "lg", "abbreviation"]
+    teams = team_context(seasons).with_columns(**shooting("tm_")).join(
+        scan("team_summaries", [*keys, "pace", "ts_percent", "e_fg_percent", "tov_percent",
+                                "x3p_ar", "f_tr"]), on=keys, suffix="_published")
+    errors = teams.select(
+        pace=(c("tm_pace") - c("pace")).abs().mean(),
+        **{name: (c(name) - c(f"{name}_published")).abs().mean()
+           for name in ("ts_percent", "e_fg_percent", "tov_percent", "x3p_ar", "f_tr")},
+    ).collect().row(0, named=True)
+    stints = _stints(seasons).filter(c("mp") >= 500).select(
+        o_rtg=(c("o_rtg_calc") - c("o_rtg")).abs().mean(),
+        d_rtg=(c("d_rtg_calc") - c("d_rtg")).abs().mean(),
+    ).collect().row(0, named=True)
+    return {**{f"team {k}": v for k, v in errors.items()},
+            **{f"player {k}": v for k, v in stints.items()}}
+
+
+def model_rows(frame: pl.DataFrame, nba_ids: Optional[Dict[int, int]] = None) -> pl.DataFrame:
+    """
+    Return the PlayerAdvancedStats rows of computed advanced stats.
+
+    Args:
+        frame: Result of ``compute_advanced``.
+        nba_ids: bball_ref player id to players.id, from the identity index by default.
+
+    Rows are keyed by (player_id, season_id), season_id being the start year
+    of the season like the rest of the schema. Players without an NBA id are skipped.
+    """
+    if nba_ids is None:
+        from backend.data.nba.identity import get_identity_index
+
+        nba_ids = get_identity_index().nba_ids(frame["player_id"].unique().to_list())
+    return frame.with_columns(
+        nba_id=c("player_id").replace_strict(nba_ids, default=None, return_dtype=pl.Int64),
+        season_id=c("season") - 1,
+    ).filter(c("nba_id").is_not_null()).select(
+        c("nba_id").alias("player_id"), "season_id",
+        *(c(source).alias(column) for column, source in MODEL_COLUMNS.items()),
+    )
+
+
+def store_advanced(session: Any, frame: pl.DataFrame, nba_ids: Optional[Dict[int, int]] = None):
+    """Upsert computed advanced stats into PlayerAdvancedStats, see ``model_rows``."""
+    from backend.models.NBA.models import PlayerAdvancedStats
+
+    return PlayerAdvancedStats.upsert_many(session, model_rows(frame, nba_ids).iter_rows(named=True))
+
+
+def main() -> None:
+    from backend.utils.logger import init_file_sinks
+
+    parser = argparse.ArgumentParser(description="Compute the advanced stats of every player season")
+    parser.add_argument("--seasons", type=int, nargs="*", help="end years, all by default")
+    parser.add_argument("--validate", action="store_true",
+                        help="compare with the published values")
+    args = parser.parse_args()
+    init_file_sinks()
+    start = time.perf_counter()
+    frame = compute_advanced(args.seasons)
+    print(f"{frame.height} player seasons in {time.perf_counter() - start:.2f}s")
+    if args.validate:
+        for name, error in validate(args.seasons).items():
+            print(f"{name:<20} mean abs error {error:.4f}")
+
+
+if __name__ == "__main__":
+    main()
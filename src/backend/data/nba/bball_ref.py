@@ -0,0 +1,256 @@
+"""Lazy, typed query catalog over the basketball-reference CSV corpus.
+
+Every file of ``processed/Data/bball_ref`` is registered with an explicit
+schema and its key columns. Tables are scanned lazily with ``pl.scan_csv``
+(``NA`` read as null), so joins across tables on ``seas_id`` or ``player_id``
+are planned once by polars, with filters and column selections pushed down
+to the file scans:
+
+    frame = join(
+        "per_100_poss", "player_shooting", "player_play_by_play",
+        columns={"player_shooting": ["avg_dist_fga", "percent_corner_3s_of_3pa"],
+                 "player_play_by_play": ["sg_percent", "on_court_plus_minus_per_100_poss"]},
+    ).filter((pl.col("pos") == "SG") & (pl.col("season") >= 2000)).collect()
+"""
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import polars as pl
+from loguru import logger
+
+from backend.core.path_config import BBALL_REF_PATH
+
+
+log = logger.bind(name=__file__)
+
+# Value used for nulls in every file
+NULL_VALUE = "NA"
+
+# Box score columns shared by the team, opponent and per-100 player files
+BOX_STATS = [
+    "fg", "fga", "fg_percent", "x3p", "x3pa", "x3p_percent", "x2p", "x2pa",
+    "x2p_percent", "ft", "fta", "ft_percent", "orb", "drb", "trb", "ast", "stl",
+    "blk", "tov", "pf", "pts",
+]
+
+
+def box_columns(prefix: str = "", suffix: str = "",
+                count_dtype: pl.DataType = pl.Int64) -> Dict[str, pl.DataType]:
+    """Return the box score columns with a prefix/suffix, percentages as floats."""
+    return {
+        f"{prefix}{name}" if name.endswith("_percent") else f"{prefix}{name}{suffix}":
+        pl.Float64 if name.endswith("_percent") else count_dtype
+        for name in BOX_STATS
+    }
+
+
+# Leading columns of the team level files
+TEAM_SEASON = {
+    "season": pl.Int64, "lg": pl.Utf8, "team": pl.Utf8,
+    "abbreviation": pl.Utf8, "playoffs": pl.Boolean,
+}
+
+# Leading columns of the player season files
+PLAYER_SEASON = {
+    "seas_id": pl.Int64, "season": pl.Int64, "player_id": pl.Int64,
+    "player": pl.Utf8, "birth_year": pl.Int64, "pos": pl.Utf8, "age": pl.Int64,
+    "experience": pl.Int64, "lg": pl.Utf8, "tm": pl.Utf8,
+}
+
+
+@dataclass(frozen=True)
+class Table:
+    """A registered CSV file."""
+
+    name: str
+    file: str
+    schema: Dict[str, pl.DataType]
+    keys: Tuple[str, ...]
+
+    @property
+    def path(self) -> str:
+        return os.path.join(BBALL_REF_PATH, self.file)
+
+
+TABLES: Dict[str, Table] = {table.name: table for table in (
+    Table("all_star_selections", "All-Star Selections.csv", {
+        "player": pl.Utf8, "team": pl.Utf8, "lg": pl.Utf8, "season": pl.Int64,
+        "replaced": pl.Boolean,
+    }, ("season", "player")),
+    Table("end_of_season_teams_voting", "End of Season Teams (Voting).csv", {
+        "season": pl.Int64, "lg": pl.Utf8, "type": pl.Utf8, "number_tm": pl.Utf8,
+        "position": pl.Utf8, "player": pl.Utf8, "age": pl.Int64, "tm": pl.Utf8,
+        "pts_won": pl.Int64, "pts_max": pl.Int64, "share": pl.Float64,
+        "x1st_tm": pl.Int64, "x2nd_tm": pl.Int64, "x3rd_tm": pl.Int64,
+        "seas_id": pl.Int64, "player_id": pl.Int64,
+    }, ("seas_id", "type")),
+    Table("end_of_season_teams", "End of Season Teams.csv", {
+        "season": pl.Int64, "lg": pl.Utf8, "type": pl.Utf8, "number_tm": pl.Utf8,
+        "player": pl.Utf8, "position": pl.Utf8, "seas_id": pl.Int64,
+        "player_id": pl.Int64, "birth_year": pl.Int64, "tm": pl.Utf8,
+        "age": pl.Int64,
+    }, ("seas_id", "type")),
+    Table("opponent_stats_per_100_poss", "Opponent Stats Per 100 Poss.csv", {
+        **TEAM_SEASON, "g": pl.Int64, "mp": pl.Int64,
+        **box_columns("opp_", "_per_100_poss", pl.Float64),
+    }, ("season", "lg", "team")),
+    Table("opponent_stats_per_game", "Opponent Stats Per Game.csv", {
+        **TEAM_SEASON, "g": pl.Int64, "mp_per_game": pl.Float64,
+        **box_columns("opp_", "_per_game", pl.Float64),
+    }, ("season", "lg", "team")),
+    Table("opponent_totals", "Opponent Totals.csv", {
+        **TEAM_SEASON, "g": pl.Int64, "mp": pl.Int64, **box_columns("opp_"),
+    }, ("season", "lg", "team")),
+    Table("per_100_poss", "Per 100 Poss.csv", {
+        **PLAYER_SEASON, "g": pl.Int64, "gs": pl.Int64, "mp": pl.Int64,
+        **box_columns("", "_per_100_poss", pl.Float64),
+        "o_rtg": pl.Float64, "d_rtg": pl.Float64,
+    }, ("seas_id",)),
+    Table("player_award_shares", "Player Award Shares.csv", {
+        "season": pl.Int64, "award": pl.Utf8, "player": pl.Utf8, "age": pl.Int64,
+        "tm": pl.Utf8, "first": pl.Float64, "pts_won": pl.Float64,
+        "pts_max": pl.Int64, "share": pl.Float64, "winner": pl.Boolean,
+        "seas_id": pl.Int64, "player_id": pl.Int64,
+    }, ("seas_id", "award")),
+    Table("player_career_info", "Player Career Info.csv", {
+        "player_id": pl.Int64, "player": pl.Utf8, "birth_year": pl.Int64,
+        "hof": pl.Boolean, "num_seasons": pl.Int64, "first_seas": pl.Int64,
+        "last_seas": pl.Int64,
+    }, ("player_id",)),
+    Table("player_play_by_play", "Player Play By Play.csv", {
+        **PLAYER_SEASON, "g": pl.Int64, "mp": pl.Int64,
+        "pg_percent": pl.Float64, "sg_percent": pl.Float64,
+        "sf_percent": pl.Float64, "pf_percent": pl.Float64,
+        "c_percent": pl.Float64,
+        "on_court_plus_minus_per_100_poss": pl.Float64,
+        "net_plus_minus_per_100_poss": pl.Float64,
+        "bad_pass_turnover": pl.Int64, "lost_ball_turnover": pl.Int64,
+        "shooting_foul_committed": pl.Int64, "offensive_foul_committed": pl.Int64,
+        "shooting_foul_drawn": pl.Int64, "offensive_foul_drawn": pl.Int64,
+        "points_generated_by_assists": pl.Int64, "and1": pl.Int64,
+        "fga_blocked": pl.Int64,
+    }, ("seas_id",)),
+    Table("player_season_info", "Player Season Info.csv", {
+        "season": pl.Int64, "seas_id": pl.Int64, "player_id": pl.Int64,
+        "player": pl.Utf8, "birth_year": pl.Int64, "pos": pl.Utf8,
+        "age": pl.Int64, "lg": pl.Utf8, "tm": pl.Utf8, "experience": pl.Int64,
+    }, ("seas_id",)),
+    Table("player_shooting", "Player Shooting.csv", {
+        **PLAYER_SEASON, "g": pl.Int64, "mp": pl.Int64,
+        "fg_percent": pl.Float64, "avg_dist_fga": pl.Float64,
+        "percent_fga_from_x2p_range": pl.Float64,
+        "percent_fga_from_x0_3_range": pl.Float64,
+        "percent_fga_from_x3_10_range": pl.Float64,
+        "percent_fga_from_x10_16_range": pl.Float64,
+        "percent_fga_from_x16_3p_range": pl.Float64,
+        "percent_fga_from_x3p_range": pl.Float64,
+        "fg_percent_from_x2p_range": pl.Float64,
+        "fg_percent_from_x0_3_range": pl.Float64,
+        "fg_percent_from_x3_10_range": pl.Float64,
+        "fg_percent_from_x10_16_range": pl.Float64,
+        "fg_percent_from_x16_3p_range": pl.Float64,
+        "fg_percent_from_x3p_range": pl.Float64,
+        "percent_assisted_x2p_fg": pl.Float64,
+        "percent_assisted_x3p_fg": pl.Float64,
+        "percent_dunks_of_fga": pl.Float64, "num_of_dunks": pl.Int64,
+        "percent_corner_3s_of_3pa": pl.Float64,
+        "corner_3_point_percent": pl.Float64,
+        "num_heaves_attempted": pl.Int64, "num_heaves_made": pl.Int64,
+    }, ("seas_id",)),
+    Table("team_abbrev", "Team Abbrev.csv", {
+        "season": pl.Int64, "lg": pl.Utf8, "team": pl.Utf8,
+        "playoffs": pl.Boolean, "abbreviation": pl.Utf8,
+    }, ("season", "lg", "team")),
+    Table("team_stats_per_100_poss", "Team Stats Per 100 Poss.csv", {
+        **TEAM_SEASON, "g": pl.Int64, "mp": pl.Int64,
+        **box_columns("", "_per_100_poss", pl.Float64),
+    }, ("season", "lg", "team")),
+    Table("team_stats_per_game", "Team Stats Per Game.csv", {
+        **TEAM_SEASON, "g": pl.Int64, "mp_per_game": pl.Float64,
+        **box_columns("", "_per_game", pl.Float64),
+    }, ("season", "lg", "team")),
+    Table("team_summaries", "Team Summaries.csv", {
+        **TEAM_SEASON, "age": pl.Float64, "w": pl.Int64, "l": pl.Int64,
+        "pw": pl.Int64, "pl": pl.Int64, "mov": pl.Float64, "sos": pl.Float64,
+        "srs": pl.Float64, "o_rtg": pl.Float64, "d_rtg": pl.Float64,
+        "n_rtg": pl.Float64, "pace": pl.Float64, "f_tr": pl.Float64,
+        "x3p_ar": pl.Float64, "ts_percent": pl.Float64,
+        "e_fg_percent": pl.Float64, "tov_percent": pl.Float64,
+        "orb_percent": pl.Float64, "ft_fga": pl.Float64,
+        "opp_e_fg_percent": pl.Float64, "opp_tov_percent": pl.Float64,
+        "opp_drb_percent": pl.Float64, "opp_ft_fga": pl.Float64,
+        "arena": pl.Utf8, "attend": pl.Int64, "attend_g": pl.Int64,
+    }, ("season", "lg", "team")),
+    Table("team_totals", "Team Totals.csv", {
+        **TEAM_SEASON, "g": pl.Int64, "mp": pl.Int64, **box_columns(),
+    }, ("season", "lg", "team")),
+)}
+
+
+def get_table(name: str) -> Table:
+    """Return a registered table by name."""
+    try:
+        return TABLES[name]
+    except KeyError:
+        raise KeyError(f"Unknown bball_ref table {name}, "
+                       f"expected one of {sorted(TABLES)}") from None
+
+
+def scan(name: str, columns: Optional[Sequence[str]] = None) -> pl.LazyFrame:
+    """Return a lazy, typed scan of a table, optionally projected to ``columns``."""
+    table = get_table(name)
+    frame = pl.scan_csv(table.path, schema=table.schema, null_values=NULL_VALUE)
+    if columns is not None:
+        frame = frame.select(list(columns))
+    return frame
+
+
+def join(base: str, *others: str, on: Sequence[str] = ("seas_id",),
+         columns: Optional[Dict[str, List[str]]] = None,
+         how: str = "inner") -> pl.LazyFrame:
+    """Join tables on shared keys into a single lazy plan.
+
+    Columns that the base table already has (player, season, pos, ...) are
+    taken from the base only. ``columns`` maps table names to the columns
+    wanted from them; the join keys are always kept. Filters applied to the
+    result are pushed down to the scans by polars.
+    """
+    columns = columns or {}
+    on = list(on)
+    frame = scan(base, _with_keys(columns.get(base), on))
+    seen = set(frame.collect_schema().names())
+    for name in others:
+        wanted = columns.get(name) or [c for c in get_table(name).schema
+                                        if c not in seen]
+        wanted = [c for c in wanted if c not in seen]
+        frame = frame.join(scan(name, [*on, *wanted]), on=on, how=how)
+        seen.update(wanted)
+    return frame
+
+
+def _with_keys(columns: Optional[List[str]], keys: List[str]) -> Optional[List[str]]:
+    if columns is None:
+        return None
+    return [*keys, *[c for c in columns if c not in keys]]
+
+
+# Columns of each table read by guard_seasons_with_splits
+GUARD_SPLIT_COLUMNS = {
+    "per_100_poss": ["player", "season", "pos", "tm", "pts_per_100_poss"],
+    "player_shooting": ["avg_dist_fga", "percent_fga_from_x3p_range",
+                        "percent_corner_3s_of_3pa"],
+    "player_play_by_play": ["pg_percent", "sg_percent"],
+}
+
+
+def guard_seasons_with_splits(since: int = 2000,
+                              columns: Optional[Dict[str, List[str]]] = None) -> pl.LazyFrame:
+    """All shooting guard seasons since ``since`` with their shooting and PBP splits.
+
+    Only the ``GUARD_SPLIT_COLUMNS`` of each file are read unless ``columns``
+    says otherwise, see ``join``.
+    """
+    return join("per_100_poss", "player_shooting", "player_play_by_play",
+                columns=columns or GUARD_SPLIT_COLUMNS).filter(
+        (pl.col("pos") == "SG") & (pl.col("season") >= since))
@@ -0,0 +1,235 @@
+"""Persistent on-disk cache for nba_api responses.
+
+Responses are stored in a SQLite file keyed by endpoint name plus normalized
+parameters. Every entry gets a TTL from ``ttl_for``: closed seasons and
+retired players never change so they are kept forever, while anything about
+the current season expires after a few minutes. The cache is bounded in size
+and evicts the least recently used entries first.
+"""
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+
+log = logger.bind(name=__file__)
+
+# Expiry value of entries that never expire
+FOREVER = None
+
+# Default TTLs in seconds
+CURRENT_SEASON_TTL = 10 * 60
+DEFAULT_TTL = 60 * 60
+
+# TTLs of endpoints that are not tied to a season
+ENDPOINT_TTLS = {
+    "commonallplayers": 24 * 60 * 60,
+    "commonplayerinfo": 24 * 60 * 60,
+    "playerindex": 24 * 60 * 60,
+    "commonteamyears": 7 * 24 * 60 * 60,
+}
+
+# Default size bound of the cache file contents
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def current_season_start(today: Optional[datetime.date] = None) -> int:
+    """Return the start year of the current NBA season; seasons start in October."""
+    today = today or datetime.date.today()
+    return today.year if today.month >= 10 else today.year - 1
+
+
+def season_start(season: Any) -> Optional[int]:
+    """Return the start year of a season parameter like '2015-16' or 2015."""
+    try:
+        return int(str(season)[:4])
+    except ValueError:
+        return None
+
+
+def ttl_for(endpoint: str, params: Dict[str, Any],
+            data: Optional[Dict[str, Any]] = None) -> Optional[float]:
+    """Return the TTL in seconds of a response, or FOREVER if it cannot change."""
+    start = season_start(params.get("Season") or params.get("SeasonYear") or "")
+    if start is not None:
+        return FOREVER if start < current_season_start() else CURRENT_SEASON_TTL
+    if endpoint == "commonplayerinfo" and data is not None:
+        try:
+            result = data["resultSets"][0]
+            row = dict(zip(result["headers"], result["rowSet"][0]))
+            if row.get("ROSTERSTATUS") == "Inactive":
+                return FOREVER
+        except (KeyError, IndexError, TypeError):
+            pass
+    return ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL)
+
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, str]:
+    """Return params with empty values dropped, values as strings and keys sorted."""
+    return {key: str(value) for key, value in sorted(params.items())
+            if value is not None and value != ""}
+
+
+def cache_key(endpoint: str, params: Dict[str, Any]) -> str:
+    """Return the cache key of an endpoint call."""
+    raw = json.dumps([endpoint.lower(), normalize_params(params)], sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    """Metadata of a cached response."""
+
+    key: str
+    endpoint: str
+    params: Dict[str, str]
+    size: int
+    created_at: float
+    expires_at: Optional[float]
+    last_access: float
+    hits: int
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= time.time()
+
+
+class ResponseCache:
+    """SQLite backed response cache with per-endpoint TTLs and LRU eviction.
+
+    Args:
+        path: Path of the cache file, ':memory:' for a throwaway cache.
+        max_bytes: Size bound of the stored (compressed) payloads.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, params TEXT NOT NULL,"
+            " payload BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, expires_at REAL,"
+            " last_access REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_responses_last_access"
+            " ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, endpoint: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the cached response, or None if it is missing or expired."""
+        key = cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM responses WHERE key = ?",
+                (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ?, hits = hits + 1"
+                " WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, endpoint: str, params: Dict[str, Any], data: Dict[str, Any],
+            ttl: Any = "default") -> None:
+        """Store a response; ``ttl`` defaults to ``ttl_for`` and None never expires."""
+        if ttl == "default":
+            ttl = ttl_for(endpoint, params, data)
+        now = time.time()
+        payload = zlib.compress(json.dumps(data).encode())
+        expires_at = None if ttl is None else now + ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, params,"
+                " payload, size, created_at, expires_at, last_access, hits)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (cache_key(endpoint, params), endpoint.lower(),
+                 json.dumps(normalize_params(params)), payload, len(payload),
+                 now, expires_at, now))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the least recently used until under max_bytes."""
+        self._conn.execute(
+            "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),))
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        log.debug(f"Evicted {evicted} cached responses")
+
+    def entries(self, endpoint: Optional[str] = None) -> List[CacheEntry]:
+        """Return the metadata of the cached responses, most recently used first."""
+        query = ("SELECT key, endpoint, params, size, created_at, expires_at,"
+                 " last_access, hits FROM responses")
+        args = ()
+        if endpoint is not None:
+            query += " WHERE endpoint = ?"
+            args = (endpoint.lower(),)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY last_access DESC",
+                                      args).fetchall()
+        return [CacheEntry(key, name, json.loads(params), *rest)
+                for key, name, params, *rest in rows]
+
+    def purge(self, endpoint: Optional[str] = None,
+              params: Optional[Dict[str, Any]] = None,
+              expired_only: bool = False) -> int:
+        """Delete entries by endpoint and/or exact params and return how many went."""
+        clauses, args = [], []
+        if params is not None:
+            clauses.append("key = ?")
+            args.append(cache_key(endpoint or "", params))
+        elif endpoint is not None:
+            clauses.append("endpoint = ?")
+            args.append(endpoint.lower())
+        if expired_only:
+            clauses.append("expires_at IS NOT NULL AND expires_at <= ?")
+            args.append(time.time())
+        query = "DELETE FROM responses"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            deleted = self._conn.execute(query, args).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count, stored bytes and the hit/miss counters."""
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        self._conn.close()
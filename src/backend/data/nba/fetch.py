@@ -0,0 +1,308 @@
+"""Concurrent, rate-limited fetch engine for the nba_api stats endpoints.
+
+The nba_api endpoint classes make one blocking request when they are
+constructed. The engine builds the same requests with ``get_request=False``
+and sends them itself from a thread pool, so a full-league backfill runs many
+calls at once while staying under the stats.nba.com rate limits.
+
+    engine = FetchEngine(max_workers=8, rate=4.0)
+    results = engine.fetch_many(
+        endpoint_request(PlayerGameLog, player_id=pid) for pid in player_ids)
+
+``base_url`` is configurable so the engine can be pointed at a local stub
+HTTP server instead of stats.nba.com. Failed requests are retried with
+jittered exponential backoff, or after the delay of a 429's Retry-After. With a ``cache`` set, responses are read
+from and written to a ResponseCache and only misses go over the network.
+Fresh responses are checked against the schema registry and header changes
+are reported on the result's ``drift``.
+"""
+import email.utils
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from backend.core.path_config import NBA_CACHE_PATH
+from backend.data.nba.cache import ResponseCache
+from backend.data.nba.schemas import SchemaDriftError, check_headers
+
+if TYPE_CHECKING:
+    import requests
+
+
+log = logger.bind(name=__file__)
+
+# Base url of the stats api, endpoints are appended as a path segment
+STATS_BASE_URL = "https://stats.nba.com/stats"
+
+# Status codes that are worth retrying
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Concurrency caps for endpoints that are known to be slow or strict
+DEFAULT_ENDPOINT_LIMITS = {
+    "leaguedashplayerstats": 2,
+    "leaguedashteamstats": 2,
+    "commonallplayers": 1,
+    "playerindex": 1,
+}
+
+
+class FetchError(Exception):
+    """Raised when a request still fails after all retries."""
+
+    def __init__(self, endpoint: str, params: Dict[str, Any], message: str) -> None:
+        super().__init__(f"{endpoint} {params}: {message}")
+        self.endpoint = endpoint
+        self.params = params
+
+
+@dataclass
+class FetchResult:
+    """The outcome of a single endpoint request."""
+
+    endpoint: str
+    params: Dict[str, Any]
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[Exception] = None
+    attempts: int = 0
+    elapsed: float = 0.0
+    cached: bool = False
+    drift: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting requests per second.
+
+    ``rate`` tokens are added per second up to ``capacity``; every request
+    takes one token and waits until one is available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until ``tokens`` are available and return the time waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Return a full-jitter exponential backoff delay for the given attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after(response: Any) -> Optional[float]:
+    """Return the delay in seconds a Retry-After header asks for, None if there is none."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def endpoint_request(endpoint_cls: Any, **kwargs) -> Tuple[str, Dict[str, Any]]:
+    """Build the (endpoint, params) pair of an nba_api endpoint without sending it.
+
+    Uses the endpoint class defaults, so ``endpoint_request(PlayerGameLog,
+    player_id=2544)`` carries the same Season/SeasonType/LeagueID parameters
+    ``PlayerGameLog(player_id=2544)`` would send.
+    """
+    endpoint = endpoint_cls(**kwargs, get_request=False)
+    return endpoint.endpoint, dict(endpoint.parameters)
+
+
+@dataclass
+class FetchEngine:
+    """Thread pool that sends nba_api requests under a shared rate limit.
+
+    Args:
+        base_url: Url the endpoint names are appended to.
+        max_workers: Number of requests in flight across all endpoints.
+        rate: Requests per second allowed by the token bucket.
+        burst: Token bucket capacity, defaults to ``rate``.
+        endpoint_limits: Max in-flight requests per endpoint name.
+        max_retries: Retries after the first attempt before giving up.
+        backoff_base: Base delay in seconds of the exponential backoff.
+        backoff_cap: Upper bound in seconds of a single backoff delay.
+        timeout: Timeout in seconds of a single request.
+        headers: Request headers, defaults to the nba_api stats headers.
+        cache: Response cache consulted before sending a request.
+    """
+
+    base_url: str = STATS_BASE_URL
+    max_workers: int = 8
+    rate: float = 4.0
+    burst: Optional[float] = None
+    endpoint_limits: Dict[str, int] = field(
+        default_factory=lambda: dict(DEFAULT_ENDPOINT_LIMITS))
+    max_retries: int = 5
+    backoff_base: float = 0.5
+    backoff_cap: float = 30.0
+    timeout: float = 30.0
+    headers: Optional[Dict[str, str]] = None
+    cache: Optional[ResponseCache] = None
+
+    def __post_init__(self) -> None:
+        if self.headers is None:
+            from nba_api.stats.library.http import STATS_HEADERS
+            self.headers = dict(STATS_HEADERS)
+        self.bucket = TokenBucket(self.rate, self.burst)
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._semaphores_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _semaphore(self, endpoint: str) -> threading.BoundedSemaphore:
+        """Return the concurrency cap of an endpoint."""
+        with self._semaphores_lock:
+            if endpoint not in self._semaphores:
+                limit = self.endpoint_limits.get(endpoint, self.max_workers)
+                self._semaphores[endpoint] = threading.BoundedSemaphore(limit)
+            return self._semaphores[endpoint]
+
+    def _session(self) -> "requests.Session":
+        """Return the keep-alive session of the current worker thread."""
+        import requests
+
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _send(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a single request and return the decoded json."""
+        import requests
+
+        url = f"{self.base_url.rstrip('/')}/{endpoint}"
+        response = self._session().get(url, params=params, timeout=self.timeout)
+        if response.status_code in RETRY_STATUS_CODES:
+            raise requests.HTTPError(
+                f"{response.status_code} from {url}", response=response)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Fetch one endpoint, retrying with jittered backoff. Raises FetchError."""
+        result = self._fetch_result(endpoint, params)
+        if not result.ok:
+            raise result.error
+        return result.data
+
+    def _fetch_result(self, endpoint: str, params: Dict[str, Any]) -> FetchResult:
+        import requests
+
+        result = FetchResult(endpoint=endpoint, params=params)
+        start = time.monotonic()
+        if self.cache is not None:
+            result.data = self.cache.get(endpoint, params)
+            if result.data is not None:
+                result.cached = True
+                result.elapsed = time.monotonic() - start
+                return result
+        with self._semaphore(endpoint):
+            for attempt in range(self.max_retries + 1):
+                result.attempts = attempt + 1
+                self.bucket.acquire()
+                try:
+                    result.data = self._send(endpoint, params)
+                    break
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.HTTPError, ValueError) as e:
+                    retryable = not isinstance(e, requests.HTTPError) or (
+                        e.response is not None
+                        and e.response.status_code in RETRY_STATUS_CODES)
+                    if not retryable or attempt == self.max_retries:
+                        result.error = FetchError(endpoint, params, str(e))
+                        break
+                    delay = None
+                    if isinstance(e, requests.HTTPError) and e.response.status_code == 429:
+                        delay = retry_after(e.response)
+                    if delay is None:
+                        delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                    log.warning(f"{endpoint} attempt {attempt + 1} failed ({e}), "
+                                f"retrying in {delay:.2f}s")
+                    time.sleep(delay)
+        if result.ok:
+            try:
+                check_headers(endpoint, result.data)
+            except SchemaDriftError as e:
+                result.drift = str(e)
+                log.error(f"Schema drift: {e}")
+            if self.cache is not None:
+                self.cache.set(endpoint, params, result.data)
+        result.elapsed = time.monotonic() - start
+        return result
+
+    def fetch_many(self, requests_: Iterable[Tuple[str, Dict[str, Any]]],
+                   on_result: Optional[Callable[[FetchResult], None]] = None
+                   ) -> List[FetchResult]:
+        """Fetch many (endpoint, params) pairs concurrently.
+
+        Failed requests do not stop the batch, they are returned with ``error``
+        set. Results are returned in the order of the requests; ``on_result`` is
+        called as each one completes.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._fetch_result, endpoint, params)
+                       for endpoint, params in requests_]
+            if on_result is not None:
+                for future in as_completed(futures):
+                    on_result(future.result())
+            results = [future.result() for future in futures]
+        failed = sum(not r.ok for r in results)
+        cached = sum(r.cached for r in results)
+        log.info(f"Fetched {len(results) - failed}/{len(results)} requests"
+                 f" ({cached} from cache)")
+        return results
+
+
+def result_rows(data: Dict[str, Any], index: int = 0) -> List[List[Any]]:
+    """Return the rowSet of a result set from a raw stats response."""
+    result_sets = data.get("resultSets", data.get("resultSet"))
+    if isinstance(result_sets, dict):
+        result_sets = [result_sets]
+    return result_sets[index].get("rowSet")
+
+
+# Get the shared engine
+@lru_cache
+def get_engine() -> FetchEngine:
+    """Return the process-wide fetch engine backed by the on-disk response cache."""
+    return FetchEngine(cache=ResponseCache(NBA_CACHE_PATH))
@@ -0,0 +1,320 @@
+"""Cross-source player identity index.
+
+basketball-reference identifies players by its own ``player_id`` while the
+NBA API uses person ids. The index links the two by normalized name, checked
+against the seasons each source has the player active and, where both know
+it, the birth year. Players found in only one source are kept with the other
+id left empty.
+
+Every name is also registered in a trigram index, so fuzzy lookups touch only
+the posting lists of the query's trigrams instead of scanning all names. The
+built index is pickled under the cache directory together with the size and
+mtime of its source files and reloaded from there while they are unchanged.
+
+    index = get_identity_index()
+    index.nba_id(5025)           # bball_ref id of A.J. Green -> 1631260
+    index.search("jokic", 3)
+"""
+import csv
+import os
+import pickle
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from backend.core.path_config import BBALL_REF_PATH, NBA_DATA_PATH, NBA_IDENTITY_PATH
+from backend.data.nba.stream import iter_batches
+
+
+log = logger.bind(name=__file__)
+
+# Bump when the pickled layout changes
+INDEX_VERSION = 1
+
+# Source files of the index
+CAREER_INFO_PATH = os.path.join(BBALL_REF_PATH, "Player Career Info.csv")
+NBA_INDEX_PATH = os.path.join(NBA_DATA_PATH, "processed", "Data", "nba", "NBA_Index.json")
+STATIC_PLAYERS_PATH = os.path.join(NBA_DATA_PATH, "raw", "nba", "static_players.csv")
+TEAM_ROSTER_PATH = os.path.join(NBA_DATA_PATH, "raw", "nba", "team_roster.csv")
+
+# Name suffixes the sources disagree on
+NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv", "v"}
+
+# Lowest trigram similarity accepted when linking names that differ
+LINK_THRESHOLD = 0.6
+
+# Seasons of slack allowed between the sources' first and last seasons
+SEASON_SLACK = 1
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a name and strip accents, punctuation and suffixes like 'Jr.'."""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).lower()
+    name = re.sub(r"[.'`’]", "", name)
+    words = re.sub(r"[^a-z0-9]+", " ", name).split()
+    while len(words) > 1 and words[-1] in NAME_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def trigrams(name: str) -> set:
+    """Return the trigrams of a normalized name, padded to mark word starts."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Inverted index from name trigrams to entries, scored by Jaccard similarity."""
+
+    def __init__(self) -> None:
+        self.keys: List[Any] = []
+        self.sizes: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+
+    def add(self, key: Any, name: str) -> None:
+        grams = trigrams(normalize_name(name))
+        position = len(self.keys)
+        self.keys.append(key)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(position)
+
+    def search(self, name: str, limit: int = 5,
+               min_score: float = 0.0) -> List[Tuple[Any, float]]:
+        """Return up to ``limit`` (key, score) pairs, best first."""
+        grams = trigrams(normalize_name(name))
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for position in self.postings.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        scored = []
+        for position, count in shared.items():
+            score = count / (len(grams) + self.sizes[position] - count)
+            if score >= min_score:
+                scored.append((score, position))
+        scored.sort(reverse=True)
+        return [(self.keys[position], score) for score, position in scored[:limit]]
+
+
+@dataclass
+class PlayerIdentity:
+    """One player with the ids and career details known for them.
+
+    Seasons are given as start years, like the NBA API's FROM_YEAR/TO_YEAR.
+    """
+
+    name: str
+    nba_id: Optional[int] = None
+    bbref_id: Optional[int] = None
+    birth_year: Optional[int] = None
+    first_season: Optional[int] = None
+    last_season: Optional[int] = None
+
+
+@dataclass
+class Match:
+    """A fuzzy search hit."""
+
+    player: PlayerIdentity
+    score: float
+
+
+def _overlaps(a: PlayerIdentity, b: PlayerIdentity) -> bool:
+    """True if both careers are known and overlap within the season slack."""
+    if None in (a.first_season, a.last_season, b.first_season, b.last_season):
+        return False
+    return (a.first_season <= b.last_season + SEASON_SLACK
+            and b.first_season <= a.last_season + SEASON_SLACK)
+
+
+def _compatible(a: PlayerIdentity, b: PlayerIdentity) -> bool:
+    if a.birth_year is not None and b.birth_year is not None \
+            and abs(a.birth_year - b.birth_year) > 1:
+        return False
+    return _overlaps(a, b)
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    return int(float(value)) if value not in (None, "", "NA") else None
+
+
+def bbref_players(path: str = CAREER_INFO_PATH) -> List[PlayerIdentity]:
+    """Read the bball_ref career info, converting season end years to start years."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [PlayerIdentity(
+            name=row["player"], bbref_id=int(row["player_id"]),
+            birth_year=_int(row["birth_year"]),
+            first_season=_int(row["first_seas"]) - 1,
+            last_season=_int(row["last_seas"]) - 1,
+        ) for row in csv.DictReader(f)]
+
+
+def nba_players(index_path: str = NBA_INDEX_PATH,
+                static_path: str = STATIC_PLAYERS_PATH,
+                roster_path: str = TEAM_ROSTER_PATH) -> List[PlayerIdentity]:
+    """Read the NBA API players: careers from the PlayerIndex, the players it
+    lacks from static_players.csv and birth years from the team rosters."""
+    players: Dict[int, PlayerIdentity] = {}
+    for _, batch in iter_batches(index_path, result_set="PlayerIndex"):
+        for row in batch.to_pylist():
+            players[row["PERSON_ID"]] = PlayerIdentity(
+                name=f"{row['PLAYER_FIRST_NAME']} {row['PLAYER_LAST_NAME']}".strip(),
+                nba_id=row["PERSON_ID"],
+                first_season=_int(row["FROM_YEAR"]), last_season=_int(row["TO_YEAR"]))
+    with open(static_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if int(row["id"]) not in players:
+                players[int(row["id"])] = PlayerIdentity(row["full_name"], int(row["id"]))
+    with open(roster_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            player = players.get(_int(row["PLAYER_ID"]))
+            if player is not None and row["BIRTH_DATE"]:
+                player.birth_year = int(row["BIRTH_DATE"][-4:])
+    return list(players.values())
+
+
+def link(bbref: Iterable[PlayerIdentity],
+         nba: Iterable[PlayerIdentity]) -> List[PlayerIdentity]:
+    """Merge the players of both sources into one identity per person.
+
+    Exact normalized-name matches are linked first, then the remaining
+    bball_ref players are matched by trigram similarity. Both need
+    overlapping careers and no conflicting birth year, and every NBA player
+    is linked at most once.
+    """
+    nba = list(nba)
+    by_name: Dict[str, List[PlayerIdentity]] = {}
+    names = TrigramIndex()
+    for position, player in enumerate(nba):
+        by_name.setdefault(normalize_name(player.name), []).append(player)
+        names.add(position, player.name)
+
+    linked: Dict[int, PlayerIdentity] = {}
+    unmatched = []
+
+    def attach(player: PlayerIdentity, candidates: List[PlayerIdentity]) -> bool:
+        candidates = [c for c in candidates
+                      if c.nba_id not in linked and _compatible(player, c)]
+        if not candidates:
+            return False
+        best = min(candidates, key=lambda c: abs(c.first_season - player.first_season))
+        linked[best.nba_id] = PlayerIdentity(
+            name=best.name, nba_id=best.nba_id, bbref_id=player.bbref_id,
+            birth_year=best.birth_year or player.birth_year,
+            first_season=min(best.first_season, player.first_season),
+            last_season=max(best.last_season, player.last_season))
+        return True
+
+    for player in bbref:
+        if not attach(player, by_name.get(normalize_name(player.name), [])):
+            unmatched.append(player)
+    rest = []
+    for player in unmatched:
+        hits = names.search(player.name, limit=5, min_score=LINK_THRESHOLD)
+        if not attach(player, [nba[position] for position, _ in hits]):
+            rest.append(player)
+
+    identities = [linked.get(player.nba_id, player) for player in nba]
+    log.info(f"Linked {len(linked)} players, {len(rest)} bball_ref and "
+             f"{len(nba) - len(linked)} NBA API players unmatched")
+    return identities + rest
+
+
+class IdentityIndex:
+    """Id mapping and fuzzy name search over the linked players."""
+
+    def __init__(self, players: List[PlayerIdentity],
+                 sources: Optional[Dict[str, Tuple[int, float]]] = None) -> None:
+        self.version = INDEX_VERSION
+        self.players = players
+        self.sources = sources or {}
+        self._by_nba = {p.nba_id: p for p in players if p.nba_id is not None}
+        self._by_bbref = {p.bbref_id: p for p in players if p.bbref_id is not None}
+        self._names = TrigramIndex()
+        for position, player in enumerate(players):
+            self._names.add(position, player.name)
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def by_nba_id(self, nba_id: int) -> Optional[PlayerIdentity]:
+        return self._by_nba.get(nba_id)
+
+    def by_bbref_id(self, bbref_id: int) -> Optional[PlayerIdentity]:
+        return self._by_bbref.get(bbref_id)
+
+    def nba_id(self, bbref_id: int) -> Optional[int]:
+        """Return the NBA API person id of a bball_ref player."""
+        player = self._by_bbref.get(bbref_id)
+        return player.nba_id if player else None
+
+    def nba_ids(self, bbref_ids: Iterable[int]) -> Dict[int, int]:
+        """Return the NBA API person ids of the bball_ref players that have one."""
+        return {bbref_id: player.nba_id for bbref_id in bbref_ids
+                if (player := self._by_bbref.get(bbref_id)) and player.nba_id is not None}
+
+    def bbref_id(self, nba_id: int) -> Optional[int]:
+        """Return the bball_ref player id of an NBA API person."""
+        player = self._by_nba.get(nba_id)
+        return player.bbref_id if player else None
+
+    def search(self, name: str, limit: int = 5, min_score: float = 0.2) -> List[Match]:
+        """Return the players whose names are most similar to ``name``."""
+        return [Match(self.players[position], score)
+                for position, score in self._names.search(name, limit, min_score)]
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "IdentityIndex":
+        with open(path, "rb") as f:
+            index = pickle.load(f)
+        if not isinstance(index, cls) or index.version != INDEX_VERSION:
+            raise ValueError(f"{path} is not a version {INDEX_VERSION} identity index")
+        return index
+
+
+def source_stamps(paths: Iterable[str]) -> Dict[str, Tuple[int, float]]:
+    """Return the size and mtime of each source file."""
+    return {path: (os.stat(path).st_size, os.stat(path).st_mtime) for path in paths}
+
+
+def build_index(career_info_path: str = CAREER_INFO_PATH,
+                index_path: str = NBA_INDEX_PATH,
+                static_path: str = STATIC_PLAYERS_PATH,
+                roster_path: str = TEAM_ROSTER_PATH) -> IdentityIndex:
+    """Build the identity index from the source files."""
+    players = link(bbref_players(career_info_path),
+                   nba_players(index_path, static_path, roster_path))
+    return IdentityIndex(players, source_stamps(
+        [career_info_path, index_path, static_path, roster_path]))
+
+
+@lru_cache(maxsize=None)
+def get_identity_index(path: Optional[str] = None) -> IdentityIndex:
+    """Load the persisted index, rebuilding it when missing or out of date.
+
+    Args:
+        path: Index file, NBA_IDENTITY_PATH by default.
+    """
+    path = path or NBA_IDENTITY_PATH
+    if os.path.exists(path):
+        try:
+            index = IdentityIndex.load(path)
+            if index.sources == source_stamps(index.sources):
+                return index
+            log.info("Identity index sources changed, rebuilding")
+        except (ValueError, OSError, pickle.UnpicklingError, AttributeError) as e:
+            log.warning(f"Discarding identity index at {path}: {e}")
+    index = build_index()
+    index.save(path)
+    return index
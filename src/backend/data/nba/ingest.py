@@ -0,0 +1,247 @@
+"""Incremental, watermark-based ingestion of player and team game logs.
+
+For every player or team the last ingested game (date and Game_ID) is kept as
+a watermark. A run only asks the API for games from the watermark date on,
+drops the games it has already seen and appends the rest as a small Parquet
+part file, so a nightly refresh costs as much as the games played that day.
+
+Entities finished by a run are checkpointed; restarting a run with the same
+``run_id`` after a crash skips them. Part file names are derived from the
+entity and its newest game, so re-running an entity that died between writing
+its part and advancing its watermark rewrites the same file.
+"""
+import datetime
+import glob
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from backend.core.path_config import NBA_GAME_LOG_PATH
+from backend.data.nba.fetch import FetchEngine, FetchResult, endpoint_request, get_engine
+from backend.data.nba.schemas import find_result_set, project
+
+
+log = logger.bind(name=__file__)
+
+# Endpoint, schema name and id parameter of each kind of game log
+GAME_LOG_KINDS = {
+    "player": ("PlayerGameLog", "playergamelog", "player_id"),
+    "team": ("TeamGameLog", "teamgamelog", "team_id"),
+}
+
+# Date format of the DateFrom parameter
+API_DATE_FORMAT = "%m/%d/%Y"
+
+# Date format of GAME_DATE in the game log rows, e.g. 'APR 10, 2024'
+GAME_DATE_FORMAT = "%b %d, %Y"
+
+
+@dataclass
+class Watermark:
+    """The newest game ingested for an entity in a season."""
+
+    kind: str
+    entity_id: int
+    season: str
+    last_game_date: datetime.date
+    last_game_id: str
+
+    @property
+    def position(self) -> Tuple[datetime.date, str]:
+        return self.last_game_date, self.last_game_id
+
+
+@dataclass
+class IngestStats:
+    """Summary of an ingestion run."""
+
+    run_id: str
+    entities: int = 0
+    skipped: int = 0
+    failed: int = 0
+    new_games: int = 0
+
+
+class WatermarkStore:
+    """SQLite file holding the watermarks and the run checkpoints."""
+
+    def __init__(self, path: str) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            " kind TEXT NOT NULL, entity_id INTEGER NOT NULL, season TEXT NOT NULL,"
+            " last_game_date TEXT NOT NULL, last_game_id TEXT NOT NULL,"
+            " updated_at TEXT NOT NULL, PRIMARY KEY (kind, entity_id, season));"
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " run_id TEXT NOT NULL, kind TEXT NOT NULL, entity_id INTEGER NOT NULL,"
+            " done_at TEXT NOT NULL, PRIMARY KEY (run_id, kind, entity_id));")
+
+    def get(self, kind: str, entity_id: int, season: str) -> Optional[Watermark]:
+        """Return the watermark of an entity, None if nothing was ingested yet."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_game_date, last_game_id FROM watermarks"
+                " WHERE kind = ? AND entity_id = ? AND season = ?",
+                (kind, entity_id, season)).fetchone()
+        if row is None:
+            return None
+        return Watermark(kind, entity_id, season,
+                         datetime.date.fromisoformat(row[0]), row[1])
+
+    def advance(self, run_id: str, watermark: Optional[Watermark],
+                kind: str, entity_id: int) -> None:
+        """Store a new watermark and checkpoint the entity in one transaction."""
+        now = datetime.datetime.now().isoformat()
+        with self._lock, self._conn:
+            if watermark is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?, ?, ?)",
+                    (watermark.kind, watermark.entity_id, watermark.season,
+                     watermark.last_game_date.isoformat(), watermark.last_game_id,
+                     now))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?)",
+                (run_id, kind, entity_id, now))
+
+    def done(self, run_id: str, kind: str) -> set:
+        """Return the ids of the entities a run already finished."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entity_id FROM checkpoints WHERE run_id = ? AND kind = ?",
+                (run_id, kind)).fetchall()
+        return {row[0] for row in rows}
+
+    def finish(self, run_id: str) -> None:
+        """Drop the checkpoints of a completed run."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+
+
+def parse_game_date(value: str) -> datetime.date:
+    """Parse a GAME_DATE value like 'APR 10, 2024'."""
+    return datetime.datetime.strptime(value, GAME_DATE_FORMAT).date()
+
+
+class GameLogIngestor:
+    """Fetch and append only the games played since each entity's watermark.
+
+    Args:
+        root: Directory the Parquet parts and the watermark file are written to.
+        engine: Fetch engine used for the requests.
+        store: Watermark store, defaults to ``<root>/watermarks.sqlite``.
+    """
+
+    def __init__(self, root: str = NBA_GAME_LOG_PATH,
+                 engine: Optional[FetchEngine] = None,
+                 store: Optional[WatermarkStore] = None) -> None:
+        self.root = root
+        self.engine = engine or get_engine()
+        self.store = store or WatermarkStore(os.path.join(root, "watermarks.sqlite"))
+
+    def part_dir(self, kind: str, season: str) -> str:
+        return os.path.join(self.root, kind, f"season={season}")
+
+    def _request(self, kind: str, entity_id: int, season: str) -> Tuple[str, Dict[str, Any]]:
+        """Build the game log request, starting at the entity's watermark date."""
+        from nba_api.stats import endpoints
+
+        endpoint_name, _, id_param = GAME_LOG_KINDS[kind]
+        kwargs = {id_param: entity_id, "season": season}
+        watermark = self.store.get(kind, entity_id, season)
+        if watermark is not None:
+            kwargs["date_from_nullable"] = watermark.last_game_date.strftime(API_DATE_FORMAT)
+        return endpoint_request(getattr(endpoints, endpoint_name), **kwargs)
+
+    def _append(self, run_id: str, kind: str, entity_id: int, season: str,
+                result: FetchResult) -> int:
+        """Write the unseen games of a response and advance the watermark."""
+        _, schema_name, _ = GAME_LOG_KINDS[kind]
+        watermark = self.store.get(kind, entity_id, season)
+        result_set = find_result_set(result.data)
+        date_index = result_set["headers"].index("GAME_DATE")
+        id_index = result_set["headers"].index("Game_ID")
+        rows = []
+        for row in result_set["rowSet"]:
+            position = (parse_game_date(row[date_index]), row[id_index])
+            if watermark is None or position > watermark.position:
+                rows.append((position, row))
+        if not rows:
+            self.store.advance(run_id, None, kind, entity_id)
+            return 0
+
+        rows.sort(key=lambda item: item[0])
+        last_date, last_game_id = rows[-1][0]
+        frame = project({"resultSets": [dict(result_set, rowSet=[row for _, row in rows])]},
+                        schema_name)
+        os.makedirs(self.part_dir(kind, season), exist_ok=True)
+        frame.write_parquet(os.path.join(
+            self.part_dir(kind, season), f"{entity_id}-{last_game_id}.parquet"))
+        self.store.advance(run_id, Watermark(kind, entity_id, season, last_date,
+                                             last_game_id), kind, entity_id)
+        return len(rows)
+
+    def run(self, kind: str, entity_ids: List[int], season: str,
+            run_id: Optional[str] = None) -> IngestStats:
+        """Ingest the new games of every entity for a season.
+
+        ``run_id`` defaults to one per kind, season and day, so re-running after
+        a crash on the same day resumes where the previous run stopped.
+        """
+        run_id = run_id or f"{kind}-{season}-{datetime.date.today().isoformat()}"
+        stats = IngestStats(run_id=run_id)
+        done = self.store.done(run_id, kind)
+        todo = [entity_id for entity_id in entity_ids if entity_id not in done]
+        stats.skipped = len(entity_ids) - len(todo)
+        if stats.skipped:
+            log.info(f"Resuming {run_id}, skipping {stats.skipped} finished entities")
+
+        requests_ = [self._request(kind, entity_id, season) for entity_id in todo]
+        entity_by_request = {id(params): entity_id
+                             for entity_id, (_, params) in zip(todo, requests_)}
+
+        def on_result(result: FetchResult) -> None:
+            entity_id = entity_by_request[id(result.params)]
+            if not result.ok:
+                stats.failed += 1
+                log.error(f"{kind} {entity_id} failed: {result.error}")
+                return
+            stats.new_games += self._append(run_id, kind, entity_id, season, result)
+            stats.entities += 1
+
+        self.engine.fetch_many(requests_, on_result=on_result)
+        if not stats.failed:
+            self.store.finish(run_id)
+        log.info(f"{run_id}: {stats.new_games} new games for {stats.entities} "
+                 f"{kind}s, {stats.failed} failed")
+        return stats
+
+    def scan(self, kind: str, season: str) -> Any:
+        """Return a lazy polars frame over every ingested game of a season."""
+        import polars as pl
+
+        if not glob.glob(os.path.join(self.part_dir(kind, season), "*.parquet")):
+            raise FileNotFoundError(f"No {kind} game logs ingested for {season}")
+        return pl.scan_parquet(os.path.join(self.part_dir(kind, season), "*.parquet"))
+
+    def compact(self, kind: str, season: str) -> int:
+        """Merge the part files of a season into one and return the row count."""
+        import polars as pl
+
+        parts = glob.glob(os.path.join(self.part_dir(kind, season), "*.parquet"))
+        if len(parts) < 2:
+            return 0
+        frame = pl.read_parquet(parts)
+        target = os.path.join(self.part_dir(kind, season), "compacted.parquet")
+        frame.write_parquet(target + ".tmp")
+        os.replace(target + ".tmp", target)
+        for part in parts:
+            if part != target:
+                os.remove(part)
+        return frame.height
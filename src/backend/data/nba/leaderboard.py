@@ -0,0 +1,292 @@
+"""Local leaderboards computing the *_RANK columns of LeagueDashPlayerStats.
+
+The API ranks every stat server-side. The same ranks follow from the stats
+themselves, so they are computed here instead of being requested:
+
+* ties share the best rank and the next rank skips, e.g. 1, 2, 2, 4
+* the highest value ranks first, except for the ``ASCENDING`` stats of the
+  per mode, e.g. losses and fouls of Totals rows
+* Totals percentages are ranked by their exact ratio, e.g. FGM / FGA, since
+  the stored percentages are rounded to three decimals; no attempts count
+  as 0
+
+PerGame stats are stored rounded to one decimal while the API ranks the
+unrounded values, so players tied after rounding share a rank here that the
+API splits.
+
+``add_ranks`` adds the rank columns to a whole frame in one pass. A
+``Leaderboard`` keeps, per season, stat and minimum of games, the players
+sorted by the stat, so a rank is a binary search and the top k are a slice.
+Rows passed to ``update`` move players between positions without resorting:
+
+    board = Leaderboard.from_store(seasons=(2015, 2016), per_mode="PerGame")
+    board.rank(2016, "PTS", player_id=201939)
+    board.top(2016, "FG3_PCT", k=5, min_gp=50)
+    board.update(season_store.load(seasons=(2016, 2016), per_mode="PerGame"))
+"""
+import bisect
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import polars as pl
+from loguru import logger
+
+from backend.core.path_config import NBA_LEAGUE_DASH_PATH
+from backend.data.nba import season_store
+from backend.data.nba.schemas import headers
+
+
+log = logger.bind(name=__file__)
+
+# Stats of LeagueDashPlayerStats with a *_RANK column
+RANKED_STATS = [name[:-len("_RANK")] for name in headers("leaguedashplayerstats")
+                if name.endswith("_RANK")]
+
+# Stats ranked from the lowest value, by the per_mode the rows were requested with
+ASCENDING = {
+    "Totals": {"L", "BLKA", "PF"},
+    "PerGame": set(),
+}
+
+# Percentages of Totals rows ranked by the ratio of their (made, attempts) columns
+RATIOS = {
+    "W_PCT": ("W", "GP"),
+    "FG_PCT": ("FGM", "FGA"),
+    "FG3_PCT": ("FG3M", "FG3A"),
+    "FT_PCT": ("FTM", "FTA"),
+}
+
+# Columns the leaderboards read
+COLUMNS = ["PLAYER_ID", *dict.fromkeys(
+    ["GP", *RANKED_STATS, *(column for columns in RATIOS.values() for column in columns)])]
+
+
+def _ascending(per_mode: str) -> set:
+    try:
+        return ASCENDING[per_mode]
+    except KeyError:
+        raise ValueError(f"Unsupported per_mode {per_mode}, expected one of "
+                         f"{list(ASCENDING)}") from None
+
+
+def _source_columns(stat: str, per_mode: str) -> tuple:
+    return RATIOS[stat] if per_mode == "Totals" and stat in RATIOS else (stat,)
+
+
+def rank_value(stat: str, per_mode: str = "Totals") -> pl.Expr:
+    """Return the expression of the value a stat is ranked by."""
+    if len(_source_columns(stat, per_mode)) == 2:
+        made, attempts = RATIOS[stat]
+        return pl.when(pl.col(attempts) > 0).then(pl.col(made) / pl.col(attempts)) \
+            .otherwise(0.0)
+    return pl.col(stat).cast(pl.Float64)
+
+
+def row_value(stat: str, row: Dict[str, Any], per_mode: str = "Totals") -> Optional[float]:
+    """Return the value a stat is ranked by for a row, like ``rank_value``."""
+    if len(_source_columns(stat, per_mode)) == 2:
+        made, attempts = (row.get(name) for name in RATIOS[stat])
+        if made is None or attempts is None:
+            return None
+        return made / attempts if attempts > 0 else 0.0
+    value = row.get(stat)
+    return None if value is None or value != value else float(value)
+
+
+def add_ranks(frame: pl.DataFrame, stats: Optional[List[str]] = None,
+              min_gp: int = 0, per_mode: str = "Totals") -> pl.DataFrame:
+    """
+    Add the *_RANK columns of ``stats`` to a frame, within each season.
+
+    Args:
+        frame: LeagueDashPlayerStats rows, with a ``season`` column when
+            they span several seasons.
+        stats: Stats to rank, all of ``RANKED_STATS`` by default; stats the
+            frame lacks are skipped.
+        min_gp: Games a player needs to be ranked, the others get null ranks.
+        per_mode: Per mode the rows were requested with, Totals or PerGame.
+    """
+    ascending = _ascending(per_mode)
+    over = ["season"] if "season" in frame.columns else None
+    ranks = []
+    for stat in stats or RANKED_STATS:
+        if not all(column in frame.columns for column in _source_columns(stat, per_mode)):
+            continue
+        value = pl.when(pl.col("GP") >= min_gp).then(rank_value(stat, per_mode)).fill_nan(None)
+        rank = value.rank("min", descending=stat not in ascending)
+        ranks.append((rank.over(over) if over else rank).cast(pl.Int64).alias(f"{stat}_RANK"))
+    return frame.with_columns(ranks)
+
+
+class Entry(NamedTuple):
+    """A player's place on a leaderboard."""
+
+    rank: int
+    player_id: int
+    value: float
+
+
+class Board:
+    """Players of one season sorted by one stat, best first."""
+
+    def __init__(self, stat: str, min_gp: int = 0, per_mode: str = "Totals") -> None:
+        self.stat = stat
+        self.min_gp = min_gp
+        self.per_mode = per_mode
+        self.sign = 1.0 if stat in _ascending(per_mode) else -1.0
+        # (sign * value, player_id), ascending
+        self.entries: List[Tuple[float, int]] = []
+
+    def key(self, row: Dict[str, Any]) -> Optional[float]:
+        """Return the sort key of a row, None if it is not on the board."""
+        value = row_value(self.stat, row, self.per_mode)
+        if value is None or (row.get("GP") or 0) < self.min_gp:
+            return None
+        return self.sign * value
+
+    def build(self, rows: Dict[int, Dict[str, Any]]) -> None:
+        self.entries = sorted((key, player_id) for player_id, key in (
+            (player_id, self.key(row)) for player_id, row in rows.items()) if key is not None)
+
+    def add(self, player_id: int, row: Dict[str, Any]) -> None:
+        key = self.key(row)
+        if key is not None:
+            bisect.insort(self.entries, (key, player_id))
+
+    def remove(self, player_id: int, row: Dict[str, Any]) -> None:
+        key = self.key(row)
+        if key is None:
+            return
+        i = bisect.bisect_left(self.entries, (key, player_id))
+        if i < len(self.entries) and self.entries[i] == (key, player_id):
+            del self.entries[i]
+
+    def rank_of(self, value: float) -> int:
+        """Return the rank a value would have, ties sharing the best rank."""
+        # (key,) sorts before every (key, player_id)
+        return bisect.bisect_left(self.entries, (self.sign * value,)) + 1
+
+    def top(self, k: int) -> List[Entry]:
+        entries = []
+        for i, (key, player_id) in enumerate(self.entries[:k]):
+            rank = entries[-1].rank if i and key == self.entries[i - 1][0] else i + 1
+            entries.append(Entry(rank, player_id, self.sign * key))
+        return entries
+
+
+class Leaderboard:
+    """
+    Player season stats and their boards, built on first use per season, stat and min_gp.
+
+    Args:
+        per_mode: Per mode of the rows, Totals or PerGame.
+    """
+
+    def __init__(self, per_mode: str = "Totals") -> None:
+        _ascending(per_mode)
+        self.per_mode = per_mode
+        self.rows: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        self._boards: Dict[Tuple[int, str, int], Board] = {}
+
+    @classmethod
+    def from_frame(cls, frame: pl.DataFrame, per_mode: str = "Totals") -> "Leaderboard":
+        board = cls(per_mode)
+        board.update(frame)
+        return board
+
+    @classmethod
+    def from_store(cls, seasons: Optional[Tuple[int, int]] = None, per_mode: str = "Totals",
+                   root: str = NBA_LEAGUE_DASH_PATH) -> "Leaderboard":
+        """Build the leaderboards of the season store partitions of a per mode."""
+        return cls.from_frame(
+            season_store.load(COLUMNS, seasons, per_mode=per_mode, root=root), per_mode)
+
+    @property
+    def seasons(self) -> List[int]:
+        return sorted(self.rows)
+
+    def update(self, frame: pl.DataFrame, season: Optional[int] = None) -> int:
+        """
+        Add or replace player rows, repositioning them on the built boards.
+
+        Args:
+            frame: LeagueDashPlayerStats rows, with a ``season`` column unless
+                ``season`` is given.
+            season: Season of every row, as the start year or '2016-17'.
+
+        Returns:
+            The number of rows updated.
+        """
+        if season is not None:
+            frame = frame.with_columns(season=pl.lit(season_store.season_year(season)))
+        columns = [name for name in COLUMNS if name in frame.columns]
+        for row in frame.select("season", *columns).iter_rows(named=True):
+            season = row.pop("season")
+            rows = self.rows.setdefault(season, {})
+            player_id = row["PLAYER_ID"]
+            old = rows.get(player_id)
+            for (board_season, _, _), board in self._boards.items():
+                if board_season != season:
+                    continue
+                if old is not None:
+                    board.remove(player_id, old)
+                board.add(player_id, row)
+            rows[player_id] = row
+        return frame.height
+
+    def board(self, season: int, stat: str, min_gp: int = 0) -> Board:
+        """Return the board of a season and stat, building it on first use."""
+        if stat not in RANKED_STATS:
+            raise KeyError(f"{stat} is not a ranked stat")
+        if season not in self.rows:
+            raise KeyError(f"No stats for season {season}")
+        key = (season, stat, min_gp)
+        if key not in self._boards:
+            board = Board(stat, min_gp, self.per_mode)
+            board.build(self.rows[season])
+            self._boards[key] = board
+        return self._boards[key]
+
+    def rank(self, season: int, stat: str, player_id: int, min_gp: int = 0) -> Optional[int]:
+        """Return a player's rank, None if the player is not on the board."""
+        board = self.board(season, stat, min_gp)
+        row = self.rows[season].get(player_id)
+        key = board.key(row) if row is not None else None
+        return None if key is None else board.rank_of(board.sign * key)
+
+    def rank_of(self, season: int, stat: str, value: float, min_gp: int = 0) -> int:
+        """Return the rank a value would have among the season's players."""
+        return self.board(season, stat, min_gp).rank_of(value)
+
+    def top(self, season: int, stat: str, k: int = 10, min_gp: int = 0) -> List[Entry]:
+        """Return the k best players of a stat, by rank."""
+        return self.board(season, stat, min_gp).top(k)
+
+    def ranks(self, season: int, min_gp: int = 0) -> pl.DataFrame:
+        """Return the *_RANK columns of every player of a season."""
+        frame = pl.DataFrame(list(self.rows[season].values()), infer_schema_length=None)
+        ranked = add_ranks(frame, min_gp=min_gp, per_mode=self.per_mode)
+        return ranked.select("PLAYER_ID", *(name for name in ranked.columns
+                                            if name.endswith("_RANK")))
+
+
+def validate(season: int, per_mode: str = "Totals",
+             root: str = NBA_LEAGUE_DASH_PATH) -> Dict[str, float]:
+    """
+    Return, per stat, the share of a stored season's API ranks ``add_ranks`` agrees with.
+
+    A rank agrees when it lies within the ranks of the players tied with the
+    same value, see the module docstring for the ties of PerGame rows.
+    """
+    stored = season_store.load(seasons=(season, season), per_mode=per_mode, root=root)
+    local = add_ranks(stored.drop(f"{stat}_RANK" for stat in RANKED_STATS), per_mode=per_mode)
+    ascending = _ascending(per_mode)
+    shares = {}
+    for stat in RANKED_STATS:
+        name = f"{stat}_RANK"
+        if name not in local.columns or stored[name].is_null().all():
+            continue
+        tied_last = local.select(rank_value(stat, per_mode).rank(
+            "max", descending=stat not in ascending)).to_series()
+        agrees = (stored[name] >= local[name]) & (stored[name] <= tied_last)
+        shares[stat] = agrees.filter(stored[name].is_not_null()).mean()
+    return shares
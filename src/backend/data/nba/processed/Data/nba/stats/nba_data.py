@@ -1,45 +1,73 @@
 """Module that contains functions and classes for getting NBA data."""
-import os
-import sys
+from typing import TYPE_CHECKING, Any, Dict, List
 
-from pathlib import Path
-from dotenv import load_dotenv
+from loguru import logger
 
-import pandas as pd
-import numpy as np
-import requests
-import json
-from datetime import datetime
-from typing import List, Dict, Union, Any
+from backend.data.nba.fetch import endpoint_request, get_engine, result_rows
+from backend.data.nba.schemas import headers, project
 
-from nba_api.stats.endpoints import LeagueDashPlayerStats, LeagueDashTeamStats
-from nba_api.stats.static import teams
-from nba_api.stats.static import players
+if TYPE_CHECKING:
+    import polars as pl
 
 
-from loguru import logger
+log = logger.bind(name=__file__)
 
-from backend.core.path_config import PKG_ROOT, DATA_PATH, NBA_DATA_PATH
 
+def _league_dash_player_stats() -> Any:
+    """Return the LeagueDashPlayerStats endpoint class, imported on first use."""
+    from nba_api.stats.endpoints import LeagueDashPlayerStats
 
-log = logger.bind(name=__file__)
+    return LeagueDashPlayerStats
+
+
+# Stats of LeagueDashPlayerStats that are not wanted besides the *_RANK columns
+UNWANTED_STAT_NAMES = ['NICKNAME', 'DD2', 'TD3', 'WNBA_FANTASY_PTS']
 
 
 def stat_names() -> List[str]:
-    """Return a list of the names of the stats that are available from the NBA API."""
-    return LeagueDashPlayerStats().get_dict().get('resultSets')[0].get(
-        'headers')
+    """Return a list of the names of the stats that are available from the NBA API.
+
+    Read from the local schema registry, no request is made.
+    """
+    return headers('leaguedashplayerstats')
 
 
 def wanted_stat_names() -> List[str]:
-    """Return a list of the names of the stats that are wanted from the NBA API."""
-    return [
-        'PLAYER_ID', 'PLAYER_NAME', 'TEAM_ID', 'TEAM_ABBREVIATION', 'AGE',
-        'GP', 'W', 'L', 'W_PCT', 'MIN', 'FGM', 'FGA', 'FG_PCT', 'FG3M', 'FG3A',
-        'FG3_PCT', 'FTM', 'FTA', 'FT_PCT', 'OREB', 'DREB', 'REB', 'AST', 'TOV',
-        'STL', 'BLK', 'BLKA', 'PF', 'PFD', 'PTS', 'PLUS_MINUS', 'NBA_FANTASY_PTS',
-    ]
+    """Return a list of the names of the stats that are wanted from the NBA API.
+
+    The *_RANK columns are computed locally, see backend.data.nba.leaderboard.
+    """
+    return [name for name in stat_names()
+            if name not in UNWANTED_STAT_NAMES and not name.endswith('_RANK')]
+
+
+def season_player_frame(season: str, columns: List[str] = None, **kwargs) -> 'pl.DataFrame':
+    """Return the typed LeagueDashPlayerStats frame of a season, wanted stats by default."""
+    data = get_engine().fetch(
+        *endpoint_request(_league_dash_player_stats(), season=season, **kwargs))
+    return project(data, 'leaguedashplayerstats', columns or wanted_stat_names())
+
+
+def season_player_stats(seasons: List[str], **kwargs) -> Dict[str, List[List[Any]]]:
+    """Return the LeagueDashPlayerStats rowSet of every season, fetched concurrently."""
+    results = get_engine().fetch_many(
+        endpoint_request(_league_dash_player_stats(), season=season, **kwargs)
+        for season in seasons)
+    rows = {}
+    for season, result in zip(seasons, results):
+        if not result.ok:
+            log.error(f"LeagueDashPlayerStats {season} failed: {result.error}")
+            continue
+        rows[season] = result_rows(result.data)
+    return rows
+
+
+def store_season_player_stats(season: str, **kwargs) -> str:
+    """Fetch a season's LeagueDashPlayerStats and write it to the season store.
 
+    Stored under the ``per_mode_detailed`` it was requested with, Totals by default.
+    """
+    from backend.data.nba.season_store import DEFAULT_PER_MODE, write_season
 
-#stat_names: ['PLAYER_ID', 'PLAYER_NAME', 'NICKNAME', 'TEAM_ID', 'TEAM_ABBREVIATION', 'AGE', 'GP', 'W', 'L', 'W_PCT', 'MIN', 'FGM', 'FGA', 'FG_PCT', 'FG3M', 'FG3A', 'FG3_PCT', 'FTM', 'FTA', 'FT_PCT', 'OREB', 'DREB', 'REB', 'AST', 'TOV', 'STL', 'BLK', 'BLKA', 'PF', 'PFD', 'PTS', 'PLUS_MINUS', 'NBA_FANTASY_PTS', 'DD2', 'TD3', 'WNBA_FANTASY_PTS', 'GP_RANK', 'W_RANK', 'L_RANK',
-             'W_PCT_RANK', 'MIN_RANK', 'FGM_RANK', 'FGA_RANK', 'FG_PCT_RANK', 'FG3M_RANK', 'FG3A_RANK', 'FG3_PCT_RANK', 'FTM_RANK', 'FTA_RANK', 'FT_PCT_RANK', 'OREB_RANK', 'DREB_RANK', 'REB_RANK', 'AST_RANK', 'TOV_RANK', 'STL_RANK', 'BLK_RANK', 'BLKA_RANK', 'PF_RANK', 'PFD_RANK', 'PTS_RANK', 'PLUS_MINUS_RANK', 'NBA_FANTASY_PTS_RANK', 'DD2_RANK', 'TD3_RANK', 'WNBA_FANTASY_PTS_RANK'] # type: ignore
+    per_mode = kwargs.get('per_mode_detailed', DEFAULT_PER_MODE)
+    return write_season(season_player_frame(season, stat_names(), **kwargs), season, per_mode)
@@ -0,0 +1,334 @@
+"""Rolling form features of player game logs, updated one game at a time.
+
+For every player and stat of ``STATS`` the state keeps the sums of the last
+``WINDOWS`` games, exponentially weighted means with the ``SPANS`` and the
+lengths of the current ``STREAKS``. Applying a game costs O(1) per player:
+the ring buffer of the last games gives the value leaving each window, the
+EWMA and streaks only need their previous value. Games are applied in
+rounds of at most one game per player, each round vectorized over players,
+so a night of games is a single round.
+
+``backfill`` computes the same features for every game of historical logs
+with polars window expressions and derives the state from the last rows, so
+a backfilled state and one built game by game are interchangeable:
+
+    history, state = backfill(logs)              # once, over whole careers
+    state.update(tonights_games)                 # then per night
+    state.features()                             # one row per player
+
+Games at or before a player's last applied game are skipped, so updates are
+idempotent. ``update_from_ingest`` reads only the game log part files that
+are new or changed since the state last read them, by size and mtime, since
+``GameLogIngestor.compact`` rewrites ``compacted.parquet`` in place. The state is persisted as an ``.npz`` file under the
+cache directory.
+
+Missing stat values, e.g. PLUS_MINUS of old games, count as 0.
+"""
+import glob
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from backend.core.path_config import NBA_GAME_LOG_PATH, NBA_ROLLING_STATE_PATH
+from backend.data.nba.identity import source_stamps
+from backend.data.nba.ingest import GAME_DATE_FORMAT
+from backend.data.nba.schemas import get_schema, project
+
+
+log = logger.bind(name=__file__)
+
+# Bump when the persisted layout changes
+STATE_VERSION = 2
+
+# Game log columns the features are computed for
+STATS = ["PTS", "REB", "AST", "STL", "BLK", "TOV", "FG3M", "FGM", "FGA", "FTA",
+         "MIN", "PLUS_MINUS"]
+
+# Lengths of the last N games windows
+WINDOWS = (5, 10, 20)
+
+# Spans of the exponentially weighted means, alpha = 2 / (span + 1)
+SPANS = (5, 15)
+
+# Streaks of consecutive games meeting a condition
+STREAKS = {
+    "win": pl.col("WL") == "W",
+    "loss": pl.col("WL") == "L",
+    "pts_20": pl.col("PTS") >= 20,
+    "double_digit_reb": pl.col("REB") >= 10,
+}
+
+# Key columns of a prepared game log
+PLAYER, DATE, GAME = "Player_ID", "GAME_DATE", "Game_ID"
+
+
+def from_rows(rows: List[List[Any]], columns: Optional[Sequence[str]] = None) -> pl.DataFrame:
+    """Build a game log frame from a PlayerGameLog rowSet, e.g. of get_player_game_log."""
+    schema = get_schema("playergamelog")
+    result = {"name": schema.result_set, "headers": list(columns or schema.headers),
+              "rowSet": rows}
+    return project({"resultSets": [result]}, "playergamelog")
+
+
+def prepare(logs: pl.DataFrame) -> pl.DataFrame:
+    """Parse dates, fill missing stats, evaluate the streak conditions and sort the games."""
+    frame = logs.lazy()
+    if logs.schema[DATE] == pl.Utf8:
+        frame = frame.with_columns(pl.col(DATE).str.strptime(pl.Date, GAME_DATE_FORMAT))
+    return frame.select(
+        PLAYER, DATE, GAME,
+        *(pl.col(stat).cast(pl.Float64).fill_null(0.0) for stat in STATS),
+        *(condition.fill_null(False).alias(f"streak_{name}")
+          for name, condition in STREAKS.items()),
+    ).unique([PLAYER, GAME], keep="last").sort(PLAYER, DATE, GAME).collect()
+
+
+def _alphas() -> np.ndarray:
+    return np.array([2 / (span + 1) for span in SPANS])
+
+
+def feature_names() -> List[str]:
+    """Return the feature columns, in the order of ``RollingState.features``."""
+    names = [f"{stat.lower()}_last_{window}" for window in WINDOWS for stat in STATS]
+    names += [f"{stat.lower()}_ewm_{span}" for span in SPANS for stat in STATS]
+    names += [f"streak_{name}" for name in STREAKS]
+    return names
+
+
+def history_features(games: pl.DataFrame) -> pl.DataFrame:
+    """
+    Return the features after every game of prepared logs, in one vectorized pass.
+
+    Columns are those of ``feature_names`` plus ``games`` and, for the state,
+    the window sums.
+    """
+    streak_columns = []
+    for name in STREAKS:
+        condition = pl.col(f"streak_{name}")
+        run = (~condition).cum_sum().over(PLAYER)
+        streak_columns.append(condition.cast(pl.Int64).cum_sum().over(PLAYER, run)
+                              .alias(f"streak_{name}"))
+    games_played = pl.int_range(1, pl.len() + 1).over(PLAYER)
+    return games.with_columns(
+        games=games_played,
+        **{f"{stat.lower()}_sum_{window}":
+           pl.col(stat).rolling_sum(window, min_samples=1).over(PLAYER)
+           for window in WINDOWS for stat in STATS},
+        **{f"{stat.lower()}_ewm_{span}":
+           pl.col(stat).ewm_mean(alpha=2 / (span + 1), adjust=False).over(PLAYER)
+           for span in SPANS for stat in STATS},
+    ).with_columns(
+        *streak_columns,
+        *((pl.col(f"{stat.lower()}_sum_{window}") / pl.min_horizontal("games", pl.lit(window)))
+          .alias(f"{stat.lower()}_last_{window}") for window in WINDOWS for stat in STATS),
+    )
+
+
+class RollingState:
+    """Rolling feature state of every player, one slot per player."""
+
+    def __init__(self) -> None:
+        self.version = STATE_VERSION
+        self.config = {"stats": STATS, "windows": list(WINDOWS), "spans": list(SPANS),
+                       "streaks": list(STREAKS)}
+        self.capacity = max(WINDOWS)
+        self.player_ids = np.empty(0, dtype=np.int64)
+        self.games = np.empty(0, dtype=np.int64)
+        self.buffer = np.empty((0, self.capacity, len(STATS)))
+        self.sums = np.empty((0, len(WINDOWS), len(STATS)))
+        self.ewm = np.empty((0, len(SPANS), len(STATS)))
+        self.streaks = np.empty((0, len(STREAKS)), dtype=np.int64)
+        self.last_date = np.empty(0, dtype="datetime64[D]")
+        self.last_game = np.empty(0, dtype="U10")
+        # Size and mtime of the part files applied, by path
+        self.applied_parts: Dict[str, Tuple[int, float]] = {}
+        self._slots: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.player_ids)
+
+    def _grow(self, player_ids: np.ndarray) -> None:
+        new = [p for p in dict.fromkeys(player_ids.tolist()) if p not in self._slots]
+        if not new:
+            return
+        n = len(new)
+        self._slots.update((p, len(self.player_ids) + i) for i, p in enumerate(new))
+        self.player_ids = np.concatenate([self.player_ids, new])
+        self.games = np.concatenate([self.games, np.zeros(n, dtype=np.int64)])
+        self.buffer = np.concatenate([self.buffer, np.zeros((n, *self.buffer.shape[1:]))])
+        self.sums = np.concatenate([self.sums, np.zeros((n, *self.sums.shape[1:]))])
+        self.ewm = np.concatenate([self.ewm, np.zeros((n, *self.ewm.shape[1:]))])
+        self.streaks = np.concatenate(
+            [self.streaks, np.zeros((n, self.streaks.shape[1]), dtype=np.int64)])
+        self.last_date = np.concatenate(
+            [self.last_date, np.full(n, np.datetime64("NaT"), dtype="datetime64[D]")])
+        self.last_game = np.concatenate([self.last_game, np.full(n, "", dtype="U10")])
+
+    def slots(self, player_ids: np.ndarray) -> np.ndarray:
+        """Return the slots of players, adding the ones not seen yet."""
+        self._grow(player_ids)
+        return np.array([self._slots[p] for p in player_ids.tolist()], dtype=np.int64)
+
+    def _unseen(self, games: pl.DataFrame) -> pl.DataFrame:
+        """Drop the games at or before each player's last applied game."""
+        if not len(self):
+            return games
+        last = pl.DataFrame({PLAYER: self.player_ids, "_date": self.last_date,
+                             "_game": self.last_game})
+        return games.join(last, on=PLAYER, how="left").filter(
+            pl.col("_date").is_null() | (pl.col(DATE) > pl.col("_date"))
+            | ((pl.col(DATE) == pl.col("_date")) & (pl.col(GAME) > pl.col("_game")))
+        ).drop("_date", "_game")
+
+    def _apply(self, slots: np.ndarray, values: np.ndarray, conditions: np.ndarray,
+               dates: np.ndarray, game_ids: np.ndarray) -> None:
+        """Apply one game to each of ``slots``, which must be distinct."""
+        count = self.games[slots]
+        for j, window in enumerate(WINDOWS):
+            leaving = self.buffer[slots, (count - window) % self.capacity]
+            leaving[count < window] = 0.0
+            self.sums[slots, j] += values - leaving
+        self.buffer[slots, count % self.capacity] = values
+        alphas = _alphas()[None, :, None]
+        first = (count == 0)[:, None, None]
+        self.ewm[slots] = np.where(first, values[:, None, :],
+                                   (1 - alphas) * self.ewm[slots] + alphas * values[:, None, :])
+        self.streaks[slots] = np.where(conditions, self.streaks[slots] + 1, 0)
+        self.games[slots] = count + 1
+        self.last_date[slots] = dates
+        self.last_game[slots] = game_ids
+
+    def update(self, logs: pl.DataFrame) -> int:
+        """
+        Apply new games to the state.
+
+        Args:
+            logs: Game log rows of any players, e.g. the rows ingested tonight.
+
+        Returns:
+            The number of games applied.
+        """
+        games = self._unseen(prepare(logs))
+        if games.is_empty():
+            return 0
+        games = games.with_columns(_round=pl.int_range(pl.len()).over(PLAYER))
+        for _, batch in games.sort("_round", DATE, GAME).group_by("_round", maintain_order=True):
+            self._apply(
+                self.slots(batch[PLAYER].to_numpy()),
+                batch.select(STATS).to_numpy(),
+                batch.select(f"streak_{name}" for name in STREAKS).to_numpy(),
+                batch[DATE].to_numpy(), batch[GAME].to_numpy().astype("U10"))
+        return games.height
+
+    def load_history(self, history: pl.DataFrame) -> None:
+        """Set the state of the players of ``history_features`` output to their last game."""
+        tail = history.with_columns(_game_index=pl.col("games") - 1).filter(
+            pl.col("games") > pl.col("games").max().over(PLAYER) - self.capacity)
+        slots = self.slots(tail[PLAYER].to_numpy())
+        self.buffer[slots, tail["_game_index"].to_numpy() % self.capacity] = \
+            tail.select(STATS).to_numpy()
+        last = history.group_by(PLAYER, maintain_order=True).last()
+        slots = self.slots(last[PLAYER].to_numpy())
+        self.games[slots] = last["games"].to_numpy()
+        for j, window in enumerate(WINDOWS):
+            self.sums[slots, j] = last.select(
+                f"{stat.lower()}_sum_{window}" for stat in STATS).to_numpy()
+        for j, span in enumerate(SPANS):
+            self.ewm[slots, j] = last.select(f"{stat.lower()}_ewm_{span}" for stat in STATS).to_numpy()
+        self.streaks[slots] = last.select(f"streak_{name}" for name in STREAKS).to_numpy()
+        self.last_date[slots] = last[DATE].to_numpy()
+        self.last_game[slots] = last[GAME].to_numpy().astype("U10")
+
+    def features(self) -> pl.DataFrame:
+        """Return the current features, one row per player."""
+        divisors = np.minimum(self.games[:, None, None], np.array(WINDOWS)[None, :, None])
+        means = self.sums / np.maximum(divisors, 1)
+        values = np.concatenate([
+            means.reshape(len(self), -1), self.ewm.reshape(len(self), -1),
+            self.streaks.astype(np.float64)], axis=1)
+        frame = pl.DataFrame(values, schema=feature_names(), orient="row")
+        return frame.with_columns(
+            pl.Series(name, array) for name, array in (
+                (PLAYER, self.player_ids), ("games", self.games),
+                (DATE, self.last_date), (GAME, self.last_game))
+        ).with_columns(pl.col(name).cast(pl.Int64) for name in frame.columns
+                       if name.startswith("streak_")).select(
+            PLAYER, "games", DATE, GAME, *feature_names())
+
+    def save(self, path: str = NBA_ROLLING_STATE_PATH) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {"version": self.version, "config": self.config,
+                "applied_parts": self.applied_parts}
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), player_ids=self.player_ids,
+                     games=self.games, buffer=self.buffer, sums=self.sums, ewm=self.ewm,
+                     streaks=self.streaks, last_date=self.last_date, last_game=self.last_game)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str = NBA_ROLLING_STATE_PATH) -> "RollingState":
+        state = cls()
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["version"] != STATE_VERSION or meta["config"] != state.config:
+                raise ValueError(f"{path} was saved with another version or feature set")
+            for name in ("player_ids", "games", "buffer", "sums", "ewm", "streaks",
+                         "last_date", "last_game"):
+                setattr(state, name, data[name])
+        state.applied_parts = {part: tuple(stamp)
+                               for part, stamp in meta["applied_parts"].items()}
+        state._slots = {p: i for i, p in enumerate(state.player_ids.tolist())}
+        return state
+
+
+def backfill(logs: pl.DataFrame) -> Tuple[pl.DataFrame, RollingState]:
+    """
+    Compute the features of every historical game and the state after the last one.
+
+    Returns:
+        The per game features and the state, ready for ``update``.
+    """
+    history = history_features(prepare(logs))
+    state = RollingState()
+    state.load_history(history)
+    log.info(f"Backfilled {history.height} games of {len(state)} players")
+    return history.select(PLAYER, DATE, GAME, "games", *feature_names()), state
+
+
+def load_state(path: str = NBA_ROLLING_STATE_PATH) -> RollingState:
+    """Load the persisted state, an empty one if there is none or it is outdated."""
+    if os.path.exists(path):
+        try:
+            return RollingState.load(path)
+        except (ValueError, OSError, KeyError) as e:
+            log.warning(f"Discarding rolling state at {path}: {e}")
+    return RollingState()
+
+
+def update_from_ingest(season: str, root: str = NBA_GAME_LOG_PATH,
+                       path: str = NBA_ROLLING_STATE_PATH) -> int:
+    """
+    Apply the player game log parts of a season written since the last update.
+
+    Only part files that are new or changed since they were applied are read,
+    their games already applied are skipped, then the state is saved. Returns
+    the number of games applied.
+    """
+    state = load_state(path)
+    parts = sorted(glob.glob(os.path.join(root, "player", f"season={season}", "*.parquet")))
+    stamps = source_stamps(parts)
+    new = [part for part in parts if state.applied_parts.get(part) != stamps[part]]
+    if not new:
+        return 0
+    applied = state.update(pl.read_parquet(new))
+    # Parts merged away by compaction are forgotten
+    state.applied_parts = {part: stamp for part, stamp in state.applied_parts.items()
+                           if os.path.exists(part)}
+    state.applied_parts.update(stamps)
+    state.save(path)
+    log.info(f"Applied {applied} games from {len(new)} part files")
+    return applied
@@ -0,0 +1,274 @@
+"""Local registry of the nba_api endpoint schemas.
+
+Each schema records the headers of one result set of an endpoint, their
+dtypes and a version number. Header lookups are answered from the registry
+without a network call, and fetched payloads are projected straight into
+compact typed polars frames. ``check_headers`` compares a payload's headers
+with the registered versions so an API change is caught on the next real
+fetch instead of silently shifting columns.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+log = logger.bind(name=__file__)
+
+# Polars dtype names of the registry dtypes
+POLARS_DTYPES = {
+    "int": "Int64",
+    "float": "Float64",
+    "str": "Utf8",
+    "bool": "Boolean",
+}
+
+
+class SchemaDriftError(Exception):
+    """Raised when a payload's headers match no registered schema version."""
+
+
+@dataclass(frozen=True)
+class EndpointSchema:
+    """Headers and dtypes of one result set of an endpoint."""
+
+    endpoint: str
+    result_set: str
+    version: int
+    columns: Dict[str, str]
+
+    @property
+    def headers(self) -> List[str]:
+        return list(self.columns)
+
+    def polars_schema(self, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Return the polars dtypes of the given columns, all columns by default."""
+        import polars as pl
+        return {name: getattr(pl, POLARS_DTYPES[self.columns[name]])
+                for name in (columns or self.headers)}
+
+
+# LeagueDashPlayerStats, as in years/2016 and current responses
+LEAGUE_DASH_PLAYER_STATS_V2 = {
+    "PLAYER_ID": "int", "PLAYER_NAME": "str", "NICKNAME": "str",
+    "TEAM_ID": "int", "TEAM_ABBREVIATION": "str", "AGE": "float", "GP": "int",
+    "W": "int", "L": "int", "W_PCT": "float", "MIN": "float", "FGM": "float",
+    "FGA": "float", "FG_PCT": "float", "FG3M": "float", "FG3A": "float",
+    "FG3_PCT": "float", "FTM": "float", "FTA": "float", "FT_PCT": "float",
+    "OREB": "float", "DREB": "float", "REB": "float", "AST": "float",
+    "TOV": "float", "STL": "float", "BLK": "float", "BLKA": "float",
+    "PF": "float", "PFD": "float", "PTS": "float", "PLUS_MINUS": "float",
+    "NBA_FANTASY_PTS": "float", "DD2": "int", "TD3": "int",
+    "WNBA_FANTASY_PTS": "float", "GP_RANK": "int", "W_RANK": "int",
+    "L_RANK": "int", "W_PCT_RANK": "int", "MIN_RANK": "int", "FGM_RANK": "int",
+    "FGA_RANK": "int", "FG_PCT_RANK": "int", "FG3M_RANK": "int",
+    "FG3A_RANK": "int", "FG3_PCT_RANK": "int", "FTM_RANK": "int",
+    "FTA_RANK": "int", "FT_PCT_RANK": "int", "OREB_RANK": "int",
+    "DREB_RANK": "int", "REB_RANK": "int", "AST_RANK": "int",
+    "TOV_RANK": "int", "STL_RANK": "int", "BLK_RANK": "int",
+    "BLKA_RANK": "int", "PF_RANK": "int", "PFD_RANK": "int", "PTS_RANK": "int",
+    "PLUS_MINUS_RANK": "int", "NBA_FANTASY_PTS_RANK": "int", "DD2_RANK": "int",
+    "TD3_RANK": "int", "WNBA_FANTASY_PTS_RANK": "int",
+}
+
+
+# CommonAllPlayers
+COMMON_ALL_PLAYERS = {
+    "PERSON_ID": "int", "DISPLAY_LAST_COMMA_FIRST": "str",
+    "DISPLAY_FIRST_LAST": "str", "ROSTERSTATUS": "str", "FROM_YEAR": "int",
+    "TO_YEAR": "int", "PLAYERCODE": "str", "PLAYER_SLUG": "str",
+    "TEAM_ID": "int", "TEAM_CITY": "str", "TEAM_NAME": "str",
+    "TEAM_ABBREVIATION": "str", "TEAM_CODE": "str", "TEAM_SLUG": "str",
+    "GAMES_PLAYED_FLAG": "str", "OTHERLEAGUE_EXPERIENCE_CH": "str",
+}
+
+
+# CommonPlayerInfo
+COMMON_PLAYER_INFO = {
+    "PERSON_ID": "int", "FIRST_NAME": "str", "LAST_NAME": "str",
+    "DISPLAY_FIRST_LAST": "str", "DISPLAY_LAST_COMMA_FIRST": "str",
+    "DISPLAY_FI_LAST": "str", "PLAYER_SLUG": "str", "BIRTHDATE": "str",
+    "SCHOOL": "str", "COUNTRY": "str", "LAST_AFFILIATION": "str",
+    "HEIGHT": "str", "WEIGHT": "str", "SEASON_EXP": "int", "JERSEY": "str",
+    "POSITION": "str", "ROSTERSTATUS": "str", "TEAM_ID": "int",
+    "TEAM_NAME": "str", "TEAM_ABBREVIATION": "str", "TEAM_CODE": "str",
+    "TEAM_CITY": "str", "PLAYERCODE": "str", "FROM_YEAR": "int",
+    "TO_YEAR": "int", "DLEAGUE_FLAG": "str", "NBA_FLAG": "str",
+    "GAMES_PLAYED_FLAG": "str", "DRAFT_YEAR": "str", "DRAFT_ROUND": "str",
+    "DRAFT_NUMBER": "str",
+}
+
+
+# PlayerGameLog
+PLAYER_GAME_LOG = {
+    "SEASON_ID": "str", "Player_ID": "int", "Game_ID": "str",
+    "GAME_DATE": "str", "MATCHUP": "str", "WL": "str", "MIN": "int",
+    "FGM": "int", "FGA": "int", "FG_PCT": "float", "FG3M": "int",
+    "FG3A": "int", "FG3_PCT": "float", "FTM": "int", "FTA": "int",
+    "FT_PCT": "float", "OREB": "int", "DREB": "int", "REB": "int",
+    "AST": "int", "STL": "int", "BLK": "int", "TOV": "int", "PF": "int",
+    "PTS": "int", "PLUS_MINUS": "float", "VIDEO_AVAILABLE": "int",
+}
+
+
+# TeamGameLog
+TEAM_GAME_LOG = {
+    "Team_ID": "int", "Game_ID": "str", "GAME_DATE": "str", "MATCHUP": "str",
+    "WL": "str", "W": "int", "L": "int", "W_PCT": "float", "MIN": "int",
+    "FGM": "int", "FGA": "int", "FG_PCT": "float", "FG3M": "int",
+    "FG3A": "int", "FG3_PCT": "float", "FTM": "int", "FTA": "int",
+    "FT_PCT": "float", "OREB": "int", "DREB": "int", "REB": "int",
+    "AST": "int", "STL": "int", "BLK": "int", "TOV": "int", "PF": "int",
+    "PTS": "int",
+}
+
+
+# PlayerIndex, the result set of NBA_Index.json
+PLAYER_INDEX = {
+    "PERSON_ID": "int", "PLAYER_LAST_NAME": "str", "PLAYER_FIRST_NAME": "str",
+    "PLAYER_SLUG": "str", "TEAM_ID": "int", "TEAM_SLUG": "str",
+    "IS_DEFUNCT": "int", "TEAM_CITY": "str", "TEAM_NAME": "str",
+    "TEAM_ABBREVIATION": "str", "JERSEY_NUMBER": "str", "POSITION": "str",
+    "HEIGHT": "str", "WEIGHT": "str", "COLLEGE": "str", "COUNTRY": "str",
+    "DRAFT_YEAR": "int", "DRAFT_ROUND": "int", "DRAFT_NUMBER": "int",
+    "ROSTER_STATUS": "float", "PTS": "float", "REB": "float", "AST": "float",
+    "STATS_TIMEFRAME": "str", "FROM_YEAR": "int", "TO_YEAR": "int",
+}
+
+
+# CommonTeamRoster
+COMMON_TEAM_ROSTER = {
+    "TeamID": "int", "SEASON": "str", "LeagueID": "str", "PLAYER": "str",
+    "PLAYER_SLUG": "str", "NUM": "str", "POSITION": "str", "HEIGHT": "str",
+    "WEIGHT": "str", "BIRTH_DATE": "str", "AGE": "float", "EXP": "str",
+    "SCHOOL": "str", "PLAYER_ID": "int",
+}
+
+# LeagueDashPlayerStats before NICKNAME and WNBA_FANTASY_PTS_RANK were added
+LEAGUE_DASH_PLAYER_STATS_V1 = {
+    name: dtype for name, dtype in LEAGUE_DASH_PLAYER_STATS_V2.items()
+    if name not in ("NICKNAME", "WNBA_FANTASY_PTS_RANK")
+}
+
+# Registered schemas keyed by (endpoint, result set), newest version last
+SCHEMAS: Dict[Tuple[str, str], List[EndpointSchema]] = {}
+
+
+def register(schema: EndpointSchema) -> EndpointSchema:
+    """Add a schema version to the registry."""
+    versions = SCHEMAS.setdefault((schema.endpoint, schema.result_set), [])
+    versions.append(schema)
+    versions.sort(key=lambda s: s.version)
+    return schema
+
+
+for _schema in (
+    EndpointSchema("leaguedashplayerstats", "LeagueDashPlayerStats", 1,
+                   LEAGUE_DASH_PLAYER_STATS_V1),
+    EndpointSchema("leaguedashplayerstats", "LeagueDashPlayerStats", 2,
+                   LEAGUE_DASH_PLAYER_STATS_V2),
+    EndpointSchema("commonallplayers", "CommonAllPlayers", 1, COMMON_ALL_PLAYERS),
+    EndpointSchema("commonplayerinfo", "CommonPlayerInfo", 1, COMMON_PLAYER_INFO),
+    EndpointSchema("playergamelog", "PlayerGameLog", 1, PLAYER_GAME_LOG),
+    EndpointSchema("teamgamelog", "TeamGameLog", 1, TEAM_GAME_LOG),
+    EndpointSchema("playerindex", "PlayerIndex", 1, PLAYER_INDEX),
+    EndpointSchema("commonteamroster", "CommonTeamRoster", 1, COMMON_TEAM_ROSTER),
+):
+    register(_schema)
+
+
+def get_schema(endpoint: str, result_set: Optional[str] = None,
+               version: Optional[int] = None) -> EndpointSchema:
+    """Return a registered schema, the first result set and newest version by default."""
+    endpoint = endpoint.lower()
+    for (name, result), versions in SCHEMAS.items():
+        if name == endpoint and (result_set is None or result == result_set):
+            if version is None:
+                return versions[-1]
+            for schema in versions:
+                if schema.version == version:
+                    return schema
+    raise KeyError(f"No schema registered for {endpoint} {result_set or ''} "
+                   f"{version or ''}".strip())
+
+
+def headers(endpoint: str, result_set: Optional[str] = None) -> List[str]:
+    """Return the registered headers of an endpoint without calling the API."""
+    return get_schema(endpoint, result_set).headers
+
+
+def find_result_set(data: Dict[str, Any], result_set: Optional[str] = None) -> Dict[str, Any]:
+    """Return a result set of a raw stats response by name, the first by default."""
+    result_sets = data.get("resultSets", data.get("resultSet"))
+    if isinstance(result_sets, dict):
+        result_sets = [result_sets]
+    if result_set is None:
+        return result_sets[0]
+    for result in result_sets:
+        if result.get("name") == result_set:
+            return result
+    raise KeyError(f"Result set {result_set} not in response")
+
+
+def check_headers(endpoint: str, data: Dict[str, Any]) -> Dict[str, EndpointSchema]:
+    """Match every registered result set of a payload to a schema version.
+
+    Only the header lists are compared, so this is cheap enough to run on every
+    fetch. Raises SchemaDriftError naming the added and missing columns when a
+    result set matches no registered version.
+    """
+    matched = {}
+    for (name, result_name), versions in SCHEMAS.items():
+        if name != endpoint.lower():
+            continue
+        try:
+            got = find_result_set(data, result_name).get("headers")
+        except (KeyError, TypeError):
+            continue
+        for schema in reversed(versions):
+            if schema.headers == got:
+                matched[result_name] = schema
+                break
+        else:
+            latest = versions[-1].headers
+            added = [h for h in got if h not in latest]
+            missing = [h for h in latest if h not in got]
+            raise SchemaDriftError(
+                f"{endpoint} {result_name} headers changed: added {added}, "
+                f"missing {missing}")
+    return matched
+
+
+def _series(name: str, values: List[Any], dtype: Any) -> Any:
+    """Build a polars Series of the given dtype from raw json values."""
+    import polars as pl
+
+    if dtype == pl.Utf8:
+        return pl.Series(name, [None if v is None else str(v) for v in values],
+                         dtype=pl.Utf8)
+    return pl.Series(name, values, strict=False).cast(dtype, strict=False)
+
+
+def project(data: Dict[str, Any], endpoint: str,
+            columns: Optional[List[str]] = None,
+            result_set: Optional[str] = None) -> Any:
+    """Project the wanted columns of a payload into a typed polars DataFrame.
+
+    Columns are located by the payload's own headers and cast to the registry
+    dtypes, so only the requested columns are ever materialized.
+    """
+    import polars as pl
+
+    schema = get_schema(endpoint, result_set)
+    result = find_result_set(data, schema.result_set)
+    index = {name: i for i, name in enumerate(result["headers"])}
+    columns = columns or [h for h in schema.headers if h in index]
+    missing = [name for name in columns if name not in index]
+    if missing:
+        raise SchemaDriftError(f"{endpoint} response is missing {missing}")
+    rows = result["rowSet"]
+    dtypes = schema.polars_schema(columns)
+    return pl.DataFrame([
+        _series(name, [row[index[name]] for row in rows], dtypes[name])
+        for name in columns
+    ])
@@ -0,0 +1,104 @@
+"""Season-partitioned Parquet store of the LeagueDashPlayerStats data.
+
+Every season is written to ``season=YYYY/per_mode=<PerMode>/part-0.parquet``
+under ``NBA_LEAGUE_DASH_PATH`` with the column names and dtypes of the schema
+registry. The per mode the stats were requested with (Totals, PerGame, ...)
+is a partition of its own, so totals and per game averages never share a
+column. ``load`` scans the dataset lazily, so the season range and per mode
+are resolved from the partition directories, and column projections plus
+team/GP filters are pushed down to the Parquet reader instead of parsing
+whole files.
+
+    frame = load(['PLAYER_NAME', 'PTS'], seasons=(2015, 2016), min_gp=20)
+    frame = load(['PLAYER_NAME', 'PTS'], per_mode='PerGame')
+"""
+import glob
+import os
+from typing import List, Optional, Sequence, Tuple, Union
+
+import polars as pl
+from loguru import logger
+
+from backend.core.path_config import NBA_LEAGUE_DASH_PATH
+from backend.data.nba.schemas import get_schema
+
+
+log = logger.bind(name=__file__)
+
+# Registry schema the stored columns follow
+SCHEMA = get_schema("leaguedashplayerstats")
+
+# PerModeDetailed of LeagueDashPlayerStats, the endpoint default
+DEFAULT_PER_MODE = "Totals"
+
+
+def season_year(season: Union[str, int]) -> int:
+    """Return the start year of a season given as 2015 or '2015-16'."""
+    return int(str(season)[:4])
+
+
+def conform(frame: pl.DataFrame) -> pl.DataFrame:
+    """Cast a frame to the registry columns, adding the ones it lacks as nulls."""
+    dtypes = SCHEMA.polars_schema()
+    return frame.select([
+        pl.col(name).cast(dtype, strict=False) if name in frame.columns
+        else pl.lit(None, dtype=dtype).alias(name)
+        for name, dtype in dtypes.items()
+    ])
+
+
+def write_season(frame: pl.DataFrame, season: Union[str, int],
+                 per_mode: str = DEFAULT_PER_MODE, root: str = NBA_LEAGUE_DASH_PATH) -> str:
+    """Write one season's stats in one per mode as its partition, replacing any previous one."""
+    path = os.path.join(root, f"season={season_year(season)}", f"per_mode={per_mode}")
+    os.makedirs(path, exist_ok=True)
+    target = os.path.join(path, "part-0.parquet")
+    conform(frame).sort("TEAM_ID", "PLAYER_ID").write_parquet(
+        target + ".tmp", statistics=True)
+    os.replace(target + ".tmp", target)
+    return target
+
+
+def seasons(per_mode: Optional[str] = DEFAULT_PER_MODE,
+            root: str = NBA_LEAGUE_DASH_PATH) -> List[int]:
+    """Return the seasons present in the store in a per mode, in any per mode if None."""
+    partitions = glob.glob(os.path.join(root, "season=*", f"per_mode={per_mode or '*'}"))
+    return sorted({int(os.path.basename(os.path.dirname(path)).split("=")[1])
+                   for path in partitions})
+
+
+def scan(root: str = NBA_LEAGUE_DASH_PATH) -> pl.LazyFrame:
+    """Return a lazy frame over every partition, with ``season`` and ``per_mode`` as columns."""
+    return pl.scan_parquet(os.path.join(root, "season=*", "per_mode=*", "*.parquet"),
+                           hive_partitioning=True)
+
+
+def load(columns: Optional[Sequence[str]] = None,
+         seasons: Optional[Tuple[int, int]] = None,
+         teams: Optional[Sequence[str]] = None,
+         min_gp: Optional[int] = None,
+         per_mode: Optional[str] = DEFAULT_PER_MODE,
+         root: str = NBA_LEAGUE_DASH_PATH) -> pl.DataFrame:
+    """Load player season stats, reading only the needed partitions and columns.
+
+    Args:
+        columns: Columns to return, all by default; ``season`` is always added.
+        seasons: Inclusive (first, last) season start years.
+        teams: Team abbreviations to keep.
+        min_gp: Minimum games played.
+        per_mode: Per mode of the stats, every per mode if None, in which
+            case ``per_mode`` is always added to the columns.
+    """
+    frame = scan(root)
+    if per_mode is not None:
+        frame = frame.filter(pl.col("per_mode") == per_mode)
+    if seasons is not None:
+        frame = frame.filter(pl.col("season").is_between(*seasons))
+    if teams is not None:
+        frame = frame.filter(pl.col("TEAM_ABBREVIATION").is_in(list(teams)))
+    if min_gp is not None:
+        frame = frame.filter(pl.col("GP") >= min_gp)
+    if columns is not None:
+        keys = ["season"] if per_mode is not None else ["season", "per_mode"]
+        frame = frame.select([*keys, *[c for c in columns if c not in keys]])
+    return frame.collect()
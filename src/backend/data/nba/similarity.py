@@ -0,0 +1,317 @@
+"""Nearest neighbour search over player season style profiles.
+
+Every player season is described by a feature vector built from ``Per 100
+Poss.csv`` (rates and percentages), ``Player Shooting.csv`` (shot distance,
+zones, assisted shares, dunks, corner threes) and ``Player Play By
+Play.csv`` (positional split, fouls drawn). Each feature is standardized
+within its season and league, so profiles compare players against their own
+era and the NBA and ABA seasons of the 1970s are not pooled, and a season's
+vectors do not depend on any other season. Features a season lacks, like the
+shooting splits before 1997, are imputed with the season mean. Players who
+changed teams within a league are represented by their combined row, labelled
+``TOT`` or, in the newer files, ``2TM``, ``3TM`` and so on; the few
+who played in both leagues in one season have a profile per league, so rows
+are keyed by ``seas_id``.
+
+Vectors are normalized to unit length, so a query is one matrix product
+with the whole index followed by a partial sort of the top k scores; filters
+are boolean masks applied before the sort:
+
+    index = get_similarity_index()
+    seas_id, = index.seas_ids(player_id=4000, season=2016)
+    index.most_similar(seas_id, k=5, seasons=(2000, 2024), positions=["PG"],
+                       min_minutes=1000)
+
+The index is persisted as an ``.npz`` file under the cache directory together
+with the size and mtime of its source files, and the labels as an Arrow IPC
+buffer, so loading it never unpickles. When they change, only the
+newest indexed season and the seasons after it are recomputed and appended.
+"""
+import io
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import polars as pl
+from loguru import logger
+
+from backend.core.path_config import NBA_SIMILARITY_PATH
+from backend.data.nba.advanced import MULTI_TEAM
+from backend.data.nba.bball_ref import get_table, scan
+from backend.data.nba.identity import source_stamps
+
+
+log = logger.bind(name=__file__)
+
+# Bump when the persisted layout or the features change
+INDEX_VERSION = 2
+
+# Feature columns of each source table
+FEATURES: Dict[str, List[str]] = {
+    "per_100_poss": [
+        "fga_per_100_poss", "x3pa_per_100_poss", "fta_per_100_poss", "orb_per_100_poss",
+        "drb_per_100_poss", "ast_per_100_poss", "stl_per_100_poss", "blk_per_100_poss",
+        "tov_per_100_poss", "pf_per_100_poss", "pts_per_100_poss", "fg_percent",
+        "x3p_percent", "ft_percent",
+    ],
+    "player_shooting": [
+        "avg_dist_fga", "percent_fga_from_x0_3_range", "percent_fga_from_x3_10_range",
+        "percent_fga_from_x10_16_range", "percent_fga_from_x16_3p_range",
+        "percent_fga_from_x3p_range", "percent_assisted_x2p_fg", "percent_assisted_x3p_fg",
+        "percent_dunks_of_fga", "percent_corner_3s_of_3pa",
+    ],
+    "player_play_by_play": [
+        "pg_percent", "sg_percent", "sf_percent", "pf_percent", "c_percent",
+        "shooting_fouls_drawn_per_36",
+    ],
+}
+
+# Descriptive columns kept next to the vectors
+LABELS = ["seas_id", "player_id", "player", "season", "lg", "pos", "tm", "mp"]
+
+# Minutes a player season needs to count towards its league season's means and deviations
+MIN_REFERENCE_MINUTES = 250
+
+# Standardized values are clipped to this many deviations, so outliers of
+# tiny samples cannot dominate a profile
+Z_CLIP = 5.0
+
+
+@dataclass
+class Neighbor:
+    """A player season and its similarity to the query."""
+
+    player: str
+    seas_id: int
+    player_id: int
+    season: int
+    lg: str
+    tm: str
+    pos: str
+    minutes: int
+    score: float
+
+
+def _combined_rows(frame: pl.LazyFrame) -> pl.LazyFrame:
+    """Keep a traded player's combined row (``TOT`` or ``2TM``...) and drop the team stints."""
+    combined = pl.col("tm").str.contains(MULTI_TEAM)
+    return frame.filter(combined | ~combined.any().over("player_id", "season", "lg"))
+
+
+def profiles(seasons: Optional[Iterable[int]] = None) -> pl.DataFrame:
+    """
+    Return the standardized feature profile of every player season.
+
+    Args:
+        seasons: Seasons to build, as the end years of the bball_ref files,
+            all by default.
+    """
+    frame = scan("per_100_poss", [*LABELS, *FEATURES["per_100_poss"]])
+    if seasons is not None:
+        frame = frame.filter(pl.col("season").is_in(list(seasons)))
+    frame = _combined_rows(frame)
+    frame = frame.join(scan("player_shooting", ["seas_id", *FEATURES["player_shooting"]]),
+                       on="seas_id", how="left")
+    pbp = scan("player_play_by_play", ["seas_id", "mp", *FEATURES["player_play_by_play"][:-1],
+                                       "shooting_foul_drawn"])
+    pbp = pbp.with_columns(shooting_fouls_drawn_per_36=pl.when(pl.col("mp") > 0).then(
+        36 * pl.col("shooting_foul_drawn") / pl.col("mp"))).drop("mp", "shooting_foul_drawn")
+    frame = frame.join(pbp, on="seas_id", how="left")
+
+    reference = pl.col("mp") >= MIN_REFERENCE_MINUTES
+    features = [name for names in FEATURES.values() for name in names]
+    standardized = [
+        ((pl.col(name) - pl.col(name).filter(reference).mean().over("season", "lg"))
+         / pl.col(name).filter(reference).std().over("season", "lg"))
+        .fill_nan(None).fill_null(0.0).clip(-Z_CLIP, Z_CLIP).alias(name)
+        for name in features
+    ]
+    return frame.select(*LABELS, *standardized).sort("season", "seas_id").collect()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class SimilarityIndex:
+    """Unit feature vectors of the player seasons and their labels."""
+
+    def __init__(self, vectors: np.ndarray, labels: pl.DataFrame,
+                 sources: Optional[Dict[str, Tuple[int, float]]] = None) -> None:
+        self.version = INDEX_VERSION
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.labels = labels
+        self.sources = sources or {}
+        self._refresh()
+
+    def _refresh(self) -> None:
+        self.seas_id = self.labels["seas_id"].to_numpy()
+        self.player_id = self.labels["player_id"].to_numpy()
+        self.season = self.labels["season"].to_numpy()
+        self.minutes = self.labels["mp"].fill_null(0).to_numpy()
+        self._rows = {seas_id: row for row, seas_id in enumerate(self.seas_id.tolist())}
+        if len(self._rows) != len(self.seas_id):
+            raise ValueError("Similarity index labels repeat a seas_id")
+        self._positions: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_profiles(cls, frame: pl.DataFrame,
+                      sources: Optional[Dict[str, Tuple[int, float]]] = None) -> "SimilarityIndex":
+        features = [name for names in FEATURES.values() for name in names]
+        vectors = _normalize(frame.select(features).to_numpy().astype(np.float32))
+        return cls(vectors, frame.select(LABELS), sources)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def seasons(self) -> List[int]:
+        return sorted(set(self.season.tolist()))
+
+    def row(self, seas_id: int) -> int:
+        """Return the row of a player season."""
+        try:
+            return self._rows[seas_id]
+        except KeyError:
+            raise KeyError(f"No profile for seas_id {seas_id}") from None
+
+    def seas_ids(self, player_id: int, season: int) -> List[int]:
+        """Return the seas_id of each league profile of a player in a season."""
+        rows = np.flatnonzero((self.player_id == player_id) & (self.season == season))
+        return self.seas_id[rows].tolist()
+
+    def _position_mask(self, position: str) -> np.ndarray:
+        if position not in self._positions:
+            self._positions[position] = self.labels["pos"].fill_null("").str.split("-") \
+                .list.contains(position).to_numpy()
+        return self._positions[position]
+
+    def mask(self, seasons: Optional[Tuple[int, int]] = None,
+             positions: Optional[Sequence[str]] = None, min_minutes: int = 0) -> np.ndarray:
+        """Return the rows passing the filters."""
+        mask = self.minutes >= min_minutes
+        if seasons is not None:
+            mask &= (self.season >= seasons[0]) & (self.season <= seasons[1])
+        if positions:
+            mask &= np.logical_or.reduce([self._position_mask(p) for p in positions])
+        return mask
+
+    def query(self, vectors: np.ndarray, k: int = 10,
+              mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the rows and scores of the k nearest rows of each query vector.
+
+        Args:
+            vectors: Query vectors, one per row, normalized like the index.
+            k: Neighbours per query.
+            mask: Rows allowed in the results.
+
+        Returns:
+            (rows, scores), both of shape (queries, k), by descending cosine
+            similarity. Queries with fewer than k allowed rows are padded
+            with row -1 and score -inf.
+        """
+        scores = np.atleast_2d(vectors).astype(np.float32) @ self.vectors.T
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        rows = np.take_along_axis(top, order, axis=1)
+        scores = np.take_along_axis(top_scores, order, axis=1)
+        return np.where(np.isfinite(scores), rows, -1), scores
+
+    def most_similar(self, seas_id: int, k: int = 10,
+                     seasons: Optional[Tuple[int, int]] = None,
+                     positions: Optional[Sequence[str]] = None, min_minutes: int = 0,
+                     exclude_player: bool = True) -> List[Neighbor]:
+        """
+        Return the player seasons most similar to a player season.
+
+        Args:
+            seas_id: bball_ref player season id, see ``seas_ids``.
+            k: Neighbours to return.
+            seasons: Inclusive (first, last) season range of the neighbours.
+            positions: Positions of the neighbours, e.g. ['PG', 'SG'].
+            min_minutes: Minutes the neighbours played at least.
+            exclude_player: Leave out the player's other seasons.
+        """
+        row = self.row(seas_id)
+        mask = self.mask(seasons, positions, min_minutes)
+        mask[row] = False
+        if exclude_player:
+            mask &= self.player_id != self.player_id[row]
+        rows, scores = self.query(self.vectors[row], k, mask)
+        labels = self.labels
+        return [Neighbor(labels["player"][r], int(self.seas_id[r]), int(self.player_id[r]),
+                         int(self.season[r]), labels["lg"][r], labels["tm"][r],
+                         labels["pos"][r], int(self.minutes[r]), float(s))
+                for r, s in zip(rows[0].tolist(), scores[0].tolist()) if r >= 0]
+
+    def replace_seasons(self, other: "SimilarityIndex") -> "SimilarityIndex":
+        """Return this index with the seasons of ``other`` replaced or appended."""
+        keep = ~np.isin(self.season, other.season)
+        return SimilarityIndex(
+            np.concatenate([self.vectors[keep], other.vectors]),
+            pl.concat([self.labels.filter(pl.Series(keep)), other.labels]),
+            other.sources)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {"version": self.version, "sources": self.sources}
+        labels = io.BytesIO()
+        self.labels.write_ipc(labels)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, vectors=self.vectors, meta=np.array(json.dumps(meta)),
+                     labels=np.frombuffer(labels.getbuffer(), dtype=np.uint8))
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityIndex":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["version"] != INDEX_VERSION:
+                raise ValueError(f"{path} is not a version {INDEX_VERSION} similarity index")
+            labels = pl.read_ipc(io.BytesIO(data["labels"].tobytes()))
+            sources = {source: tuple(stamp) for source, stamp in meta["sources"].items()}
+            return cls(data["vectors"], labels, sources)
+
+
+def source_paths() -> List[str]:
+    return [get_table(name).path for name in FEATURES]
+
+
+def build_index(seasons: Optional[Iterable[int]] = None) -> SimilarityIndex:
+    """Build the index of all seasons, or of ``seasons`` only."""
+    return SimilarityIndex.from_profiles(profiles(seasons), source_stamps(source_paths()))
+
+
+def update_index(index: SimilarityIndex) -> SimilarityIndex:
+    """Recompute the newest indexed season and append the seasons after it."""
+    newest = max(index.seasons) if len(index) else None
+    available = scan("per_100_poss", ["season"]).unique().collect()["season"].to_list()
+    seasons = [s for s in available if newest is None or s >= newest]
+    log.info(f"Updating similarity index with seasons {sorted(seasons)}")
+    return index.replace_seasons(build_index(seasons))
+
+
+@lru_cache(maxsize=None)
+def get_similarity_index(path: str = NBA_SIMILARITY_PATH) -> SimilarityIndex:
+    """Load the persisted index, updating it when its sources changed."""
+    index = None
+    if os.path.exists(path):
+        try:
+            index = SimilarityIndex.load(path)
+            if index.sources == source_stamps(index.sources):
+                return index
+        except (ValueError, OSError, KeyError) as e:
+            log.warning(f"Discarding similarity index at {path}: {e}")
+            index = None
+    index = build_index() if index is None else update_index(index)
+    index.save(path)
+    return index
@@ -0,0 +1,260 @@
+"""Streaming reader for saved nba_api responses.
+
+A stats response is a JSON envelope of the form
+
+    {"resource": ..., "parameters": {...},
+     "resultSets": [{"name": ..., "headers": [...], "rowSet": [[...], ...]}]}
+
+``iter_batches`` walks that envelope incrementally, decoding one row of a
+rowSet at a time from a fixed size read buffer, and emits typed Arrow record
+batches of ``batch_size`` rows. Peak memory is bounded by the buffer and one
+batch, whatever the size of the file. Column types come from the schema
+registry when the resource and headers match a registered schema, and are
+inferred from the first batch otherwise.
+
+    for name, batch in iter_batches("NBA_Index.json"):
+        ...
+"""
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from loguru import logger
+
+from backend.data.nba.schemas import SCHEMAS
+
+
+log = logger.bind(name=__file__)
+
+# Characters read from the file per refill
+CHUNK_SIZE = 64 * 1024
+
+# Rows per emitted record batch
+DEFAULT_BATCH_SIZE = 10_000
+
+# Arrow types of the registry dtypes
+ARROW_TYPES = {
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "str": pa.string(),
+    "bool": pa.bool_(),
+}
+
+WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """Incremental JSON value reader over a text file."""
+
+    def __init__(self, f: Any, chunk_size: int = CHUNK_SIZE) -> None:
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _refill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._refill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of ``chars``."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r}, got {char!r} at {self._pos}")
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._refill():
+                    raise
+                continue
+            # A number or literal ending at the buffer edge may be cut off
+            if end == len(self._buffer) and not self._eof and self._refill():
+                continue
+            self._pos = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """Iterate the keys of an object; the caller must consume each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def items(self) -> Iterator[None]:
+        """Iterate the elements of an array; the caller must consume each one."""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield None
+            if self.expect(",]") == "]":
+                return
+
+
+def _arrow_column(values: List[Any], dtype: Optional[pa.DataType]) -> pa.Array:
+    """Build an Arrow array of ``dtype``, converting mismatched json values."""
+    if dtype is None:
+        return pa.array(values)
+    try:
+        return pa.array(values, type=dtype)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if pa.types.is_string(dtype):
+            return pa.array([None if v is None else str(v) for v in values], type=dtype)
+        return pa.array([None if v in (None, "") else str(v) for v in values],
+                        type=pa.string()).cast(dtype, safe=False)
+
+
+def _schema(resource: Optional[str], name: str, headers: List[str]) -> Optional[pa.Schema]:
+    """Return the registry schema of a result set if its headers match."""
+    for schema in SCHEMAS.get(((resource or "").lower(), name), []):
+        if schema.headers == headers:
+            return pa.schema([(h, ARROW_TYPES[schema.columns[h]]) for h in headers])
+    return None
+
+
+def _batch(rows: List[List[Any]], headers: List[str],
+           schema: Optional[pa.Schema]) -> pa.RecordBatch:
+    columns = [[row[i] for row in rows] for i in range(len(headers))]
+    if schema is None:
+        return pa.RecordBatch.from_arrays(
+            [_arrow_column(c, None) for c in columns], names=headers)
+    return pa.RecordBatch.from_arrays(
+        [_arrow_column(c, field.type) for c, field in zip(columns, schema)],
+        schema=schema)
+
+
+def _infer_schema(batch: pa.RecordBatch) -> pa.Schema:
+    """Fix the schema from the first batch, typing all-null columns as strings."""
+    return pa.schema([
+        (field.name, pa.string() if pa.types.is_null(field.type) else field.type)
+        for field in batch.schema
+    ])
+
+
+def _result_set(reader: _Reader, resource: Optional[str],
+                batch_size: int) -> Iterator[Tuple[str, pa.RecordBatch]]:
+    name, headers, schema, pending = "", None, None, None
+    for key in reader.members():
+        if key == "name":
+            name = reader.value()
+        elif key == "headers":
+            headers = reader.value()
+            schema = _schema(resource, name, headers)
+        elif key == "rowSet" and headers is None:
+            # Headers after the rows: nothing to stream into, keep the rows
+            pending = reader.value()
+        elif key == "rowSet":
+            rows = []
+            for _ in reader.items():
+                rows.append(reader.value())
+                if len(rows) == batch_size:
+                    batch = _batch(rows, headers, schema)
+                    schema = schema or _infer_schema(batch)
+                    yield name, batch.cast(schema) if batch.schema != schema else batch
+                    rows = []
+            if rows:
+                batch = _batch(rows, headers, schema)
+                yield name, batch.cast(schema or _infer_schema(batch))
+        else:
+            reader.value()
+    if pending:
+        for start in range(0, len(pending), batch_size):
+            yield name, _batch(pending[start:start + batch_size], headers,
+                               _schema(resource, name, headers))
+
+
+def iter_batches(path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 result_set: Optional[str] = None) -> Iterator[Tuple[str, pa.RecordBatch]]:
+    """Yield (result set name, record batch) pairs from a saved stats response.
+
+    Handles both the ``resultSets`` list and the single ``resultSet`` object
+    layouts. ``result_set`` restricts the output to one result set by name.
+    """
+    with open(path, encoding="utf-8") as f:
+        reader = _Reader(f)
+        resource = None
+        for key in reader.members():
+            if key == "resource":
+                resource = reader.value()
+            elif key in ("resultSets", "resultSet"):
+                if reader.peek() == "{":
+                    sets = iter([None])
+                else:
+                    sets = reader.items()
+                for _ in sets:
+                    for name, batch in _result_set(reader, resource, batch_size):
+                        if result_set is None or name == result_set:
+                            yield name, batch
+            else:
+                reader.value()
+
+
+def read_table(path: str, result_set: Optional[str] = None) -> pa.Table:
+    """Read one result set of a saved response into an Arrow table, the first by default."""
+    batches = []
+    for name, batch in iter_batches(path, result_set=result_set):
+        if result_set is None:
+            result_set = name
+        if name == result_set:
+            batches.append(batch)
+    if not batches:
+        raise KeyError(f"No rows for result set {result_set} in {path}")
+    return pa.Table.from_batches(batches)
+
+
+def to_parquet(path: str, target: str, result_set: Optional[str] = None,
+               batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Convert a result set of a saved response to Parquet batch by batch.
+
+    Returns the number of rows written.
+    """
+    writer, rows = None, 0
+    try:
+        for name, batch in iter_batches(path, batch_size, result_set):
+            if result_set is None:
+                result_set = name
+            if name != result_set:
+                continue
+            if writer is None:
+                writer = pq.ParquetWriter(target, batch.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    log.info(f"Wrote {rows} {result_set} rows to {target}")
+    return rows
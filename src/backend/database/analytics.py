@@ -0,0 +1,104 @@
+"""DuckDB views over the Parquet and CSV data files.
+
+Every DuckDB connection made through the engine factory gets one view per
+data file, so season-wide scans run in-process on DuckDB's columnar engine
+straight from the files, without loading them into a database first:
+
+    bball_ref_per_100_poss      Per 100 Poss.csv
+    bball_ref_team_summaries    Team Summaries.csv
+    ...
+    league_dash_player_stats    league_dash/season=*/per_mode=*/part-0.parquet
+
+    frame = query_polars(
+        "SELECT season, avg(pts_per_100_poss) FROM bball_ref_per_100_poss GROUP BY 1")
+
+The CSV files are converted to Parquet in the cache directory the first time
+and whenever they change. The views are only definitions over the Parquet
+files; each query decodes only the columns and row groups it needs.
+"""
+import glob
+import os
+import re
+from typing import Any, Dict, Optional, Tuple
+
+from backend.core.path_config import BBALL_REF_PATH, NBA_DATA_PATH, NBA_LEAGUE_DASH_PATH
+
+# Parquet copies of the CSV files, rebuilt when a CSV is newer
+PARQUET_CACHE_PATH = os.path.join(NBA_DATA_PATH, "cache", "parquet")
+
+
+def view_name(prefix: str, path: str) -> str:
+    """Return the view name of a data file, e.g. bball_ref_per_100_poss."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{prefix}_{re.sub(r'[^a-z0-9]+', '_', stem.lower()).strip('_')}"
+
+
+def _quote(path: str) -> str:
+    return "'" + path.replace("'", "''") + "'"
+
+
+def _parquet_copy(cursor: Any, csv_path: str, parquet_path: str) -> None:
+    """Convert a CSV file to Parquet unless an up to date copy exists."""
+    if (os.path.exists(parquet_path)
+            and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+        return
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+    cursor.execute(f"COPY (SELECT * FROM read_csv({_quote(csv_path)}, header = true, "
+                   f"nullstr = 'NA')) TO {_quote(parquet_path + '.tmp')} (FORMAT parquet)")
+    os.replace(parquet_path + ".tmp", parquet_path)
+
+
+def data_views(bball_ref_path: str = BBALL_REF_PATH,
+               league_dash_path: str = NBA_LEAGUE_DASH_PATH) -> Dict[str, Tuple[str, Optional[str]]]:
+    """Return the Parquet files and source CSV, if any, of every view by view name."""
+    views = {}
+    for path in sorted(glob.glob(os.path.join(bball_ref_path, "*.csv"))):
+        name = view_name("bball_ref", path)
+        views[name] = (os.path.join(PARQUET_CACHE_PATH, f"{name}.parquet"), path)
+    parquet = os.path.join(league_dash_path, "season=*", "per_mode=*", "*.parquet")
+    if glob.glob(parquet):
+        views["league_dash_player_stats"] = (parquet, None)
+    return views
+
+
+def register_views(dbapi_connection: Any,
+                   views: Optional[Dict[str, Tuple[str, Optional[str]]]] = None) -> None:
+    """
+    Create or replace the data file views on a DuckDB DBAPI connection.
+
+    CSV files are converted to Parquet once, and again when they change, so
+    the views always scan columnar files.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, (parquet, csv_path) in (views or data_views()).items():
+            if csv_path is not None:
+                _parquet_copy(cursor, csv_path, parquet)
+            cursor.execute(f'CREATE OR REPLACE VIEW "{name}" AS SELECT * FROM '
+                           f"read_parquet({_quote(parquet)}, hive_partitioning = true)")
+    finally:
+        cursor.close()
+
+
+def query_polars(sql: str, params: Optional[Dict[str, Any]] = None, engine: Any = None) -> Any:
+    """
+    Run a query on DuckDB and return its result as a polars DataFrame.
+
+    The result is handed over as Arrow, never as Python rows.
+
+    Args:
+        sql: Query, with $name placeholders for ``params``.
+        params: Bound parameters.
+        engine: DuckDB engine to run on, the analytics engine by default.
+    """
+    if engine is None:
+        from backend.database.db import get_analytics_engine
+
+        engine = get_analytics_engine()
+    with engine.connect() as conn:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(sql, params or {})
+            return cursor.pl()
+        finally:
+            cursor.close()
@@ -0,0 +1,374 @@
+"""Bulk loader streaming source files into the database.
+
+Rows are streamed into a temporary staging table and then merged into the
+real table with a single ``INSERT ... SELECT ... ON CONFLICT DO UPDATE``.
+On Postgres the staging table is filled with ``COPY FROM STDIN`` fed by a
+lazily generated CSV stream, so the source is never held in memory; any
+other dialect (SQLite for local runs and tests) fills it with batched
+``executemany`` calls through the same code path.
+
+Seasons are keyed by their start year, like the season store and the
+computed advanced stats. Player season stats are keyed by (player_id,
+season_id) and only loaded for players of the PlayerIndex:
+
+    basic       LeagueDashPlayerStats of the season store
+    advanced    ``advanced.compute_advanced`` of the bball_ref tables
+    shooting    the same box totals with the bball_ref Player Shooting table
+
+    engine = create_engine("sqlite:///nba.db")
+    for report in load_all(engine):
+        print(report)
+"""
+import csv
+import io
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import polars as pl
+from loguru import logger
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+
+from backend.core.path_config import BBALL_REF_PATH, NBA_DATA_PATH, NBA_LEAGUE_DASH_PATH
+from backend.data.nba import advanced, season_store
+from backend.data.nba.bball_ref import scan
+from backend.data.nba.stream import iter_batches
+from backend.models.NBA.models import (
+    Player, PlayerAdvancedStats, PlayerBasicStats, PlayerShootingStats, Season, Team)
+
+
+log = logger.bind(name=__file__)
+
+# Rows sent per executemany call when COPY is not available
+DEFAULT_CHUNK_ROWS = 10_000
+
+# Source files of the default load
+NBA_INDEX_PATH = os.path.join(NBA_DATA_PATH, "processed", "Data", "nba", "NBA_Index.json")
+STATIC_TEAMS_PATH = os.path.join(NBA_DATA_PATH, "raw", "nba", "static_teams.csv")
+TEAM_INFO_PATH = os.path.join(NBA_DATA_PATH, "processed", "Data", "nba", "NBA_Team_Info.csv")
+TEAM_SUMMARIES_PATH = os.path.join(BBALL_REF_PATH, "Team Summaries.csv")
+
+# Key of the player season stats tables
+STATS_KEY = ("player_id", "season_id")
+
+# Columns of PlayerBasicStats and the LeagueDashPlayerStats columns they are
+# filled from, divided by GP for Totals rows unless a percentage
+BASIC_COLUMNS = {
+    "minutes_per_game": "MIN",
+    "field_goals_made_per_game": "FGM",
+    "field_goals_attempted_per_game": "FGA",
+    "field_goal_percentage": "FG_PCT",
+    "three_point_field_goals_made_per_game": "FG3M",
+    "three_point_field_goals_attempted_per_game": "FG3A",
+    "three_point_field_goal_percentage": "FG3_PCT",
+    "free_throws_made_per_game": "FTM",
+    "free_throws_attempted_per_game": "FTA",
+    "free_throw_percentage": "FT_PCT",
+    "offensive_rebounds_per_game": "OREB",
+    "defensive_rebounds_per_game": "DREB",
+    "total_rebounds_per_game": "REB",
+    "assists_per_game": "AST",
+    "steals_per_game": "STL",
+    "blocks_per_game": "BLK",
+    "turnovers_per_game": "TOV",
+    "personal_fouls_per_game": "PF",
+    "points_per_game": "PTS",
+}
+
+# Shots of PlayerShootingStats:
+# (column prefix, percentage column, made, attempts, assisted percentage)
+SHOTS = [
+    ("two_point_field_goals", "two_point_field_goal_percentage",
+     "x2p", "x2pa", "percent_assisted_x2p_fg"),
+    ("three_point_field_goals", "three_point_field_goal_percentage",
+     "x3p", "x3pa", "percent_assisted_x3p_fg"),
+    ("free_throws", "free_throw_percentage", "ft", "fta", None),
+]
+
+
+@dataclass
+class LoadReport:
+    """Rows loaded into a table and how long it took."""
+
+    table: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else float("inf")
+
+    def __str__(self) -> str:
+        return (f"{self.table}: {self.rows} rows in {self.seconds:.2f}s "
+                f"({self.rows_per_second:,.0f} rows/s)")
+
+
+class CsvStream(io.TextIOBase):
+    """Read-only text stream rendering rows as CSV on demand, for COPY FROM STDIN."""
+
+    def __init__(self, rows: Iterable[Sequence[Any]]) -> None:
+        self._rows = iter(rows)
+        self._buffer = ""
+        self.count = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def _render(self, size: int) -> None:
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        while out.tell() < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            writer.writerow(["" if value is None else value for value in row])
+            self.count += 1
+        self._buffer += out.getvalue()
+
+    def read(self, size: int = -1) -> str:
+        if size is None or size < 0:
+            self._render(float("inf"))
+        elif len(self._buffer) < size:
+            self._render(size - len(self._buffer))
+        if size is None or size < 0:
+            data, self._buffer = self._buffer, ""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _merge_sql(table: Table, staging: str, columns: List[str],
+               key_columns: Sequence[str]) -> str:
+    """Return the statement merging the staging table into the target table."""
+    names = ", ".join(columns)
+    updates = [c for c in columns if c not in key_columns and c != "created_at"]
+    sql = (f"INSERT INTO {table.name} ({names}) SELECT {names} FROM {staging} "
+           f"WHERE true ON CONFLICT ({', '.join(key_columns)}) DO ")
+    if not updates:
+        return sql + "NOTHING"
+    return sql + "UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)
+
+
+def copy_rows(engine: Engine, table: Table, rows: Iterable[Dict[str, Any]],
+              key_columns: Sequence[str] = ("id",),
+              chunk_rows: int = DEFAULT_CHUNK_ROWS) -> LoadReport:
+    """Stream dict rows into ``table`` through a staging table and merge them.
+
+    The columns are taken from the first row; ``created_at``/``updated_at``
+    are filled in when the table has them and the rows do not. Existing rows
+    with the same ``key_columns`` are updated.
+    """
+    start = time.perf_counter()
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return LoadReport(table.name, 0, 0.0)
+    now = datetime.now().isoformat(" ")
+    stamps = {c: now for c in ("created_at", "updated_at")
+              if c in table.columns and c not in first}
+    columns = [*first, *stamps]
+    values = ([*row.values(), *stamps.values()]
+              for row in itertools.chain([first], rows))
+    staging = f"staging_{table.name}"
+    names = ", ".join(columns)
+
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        if engine.dialect.name == "postgresql":
+            cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table.name} "
+                           f"INCLUDING DEFAULTS) ON COMMIT DROP")
+            stream = CsvStream(values)
+            cursor.copy_expert(
+                f"COPY {staging} ({names}) FROM STDIN WITH (FORMAT csv)", stream)
+            count = stream.count
+        else:
+            if engine.dialect.name == "sqlite":
+                # make_engine leaves SQLite connections in autocommit
+                cursor.execute("BEGIN")
+            cursor.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+            cursor.execute(f"CREATE TEMP TABLE {staging} AS "
+                           f"SELECT {names} FROM {table.name} WHERE 0")
+            insert = (f"INSERT INTO {staging} ({names}) VALUES "
+                      f"({', '.join('?' for _ in columns)})")
+            count = 0
+            while chunk := list(itertools.islice(values, chunk_rows)):
+                cursor.executemany(insert, chunk)
+                count += len(chunk)
+        cursor.execute(_merge_sql(table, staging, columns, key_columns))
+        if engine.dialect.name != "postgresql":
+            cursor.execute(f"DROP TABLE temp.{staging}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    report = LoadReport(table.name, count, time.perf_counter() - start)
+    log.info(str(report))
+    return report
+
+
+def parse_height(height: Optional[str]) -> Optional[float]:
+    """Convert a height like '6-10' to inches."""
+    if not height or "-" not in height:
+        return None
+    feet, inches = height.split("-")
+    return int(feet) * 12 + int(inches)
+
+
+def team_rows(static_teams_path: str = STATIC_TEAMS_PATH,
+              team_info_path: str = TEAM_INFO_PATH) -> Iterator[Dict[str, Any]]:
+    """Yield Team rows from static_teams.csv with conference/division from NBA_Team_Info.csv."""
+    with open(team_info_path, newline="") as f:
+        info = {int(row["TEAM_ID"]): row for row in csv.DictReader(f)}
+    with open(static_teams_path, newline="") as f:
+        for row in csv.DictReader(f):
+            team_info = info.get(int(row["id"]), {})
+            yield {
+                "id": int(row["id"]),
+                "full_name": row["full_name"],
+                "name": row["nickname"],
+                "abbreviation": row["abbreviation"],
+                "city": row["city"],
+                "state": row["state"],
+                "year_founded": int(row["year_founded"]),
+                "conference": team_info.get("TEAM_CONFERENCE"),
+                "division": team_info.get("TEAM_DIVISION"),
+            }
+
+
+def season_rows(team_summaries_path: str = TEAM_SUMMARIES_PATH) -> Iterator[Dict[str, Any]]:
+    """Yield one Season row per season of the bball_ref team summaries, keyed by start year."""
+    with open(team_summaries_path, newline="") as f:
+        years = sorted({int(row["season"]) - 1 for row in csv.DictReader(f)})
+    for year in years:
+        yield {"id": year, "year": year}
+
+
+def player_rows(index_path: str = NBA_INDEX_PATH,
+                team_ids: Optional[set] = None) -> Iterator[Dict[str, Any]]:
+    """Yield Player rows from a saved PlayerIndex response, streamed batch by batch.
+
+    ``team_ids`` limits team_id to teams that exist, other values become null.
+    """
+    for _, batch in iter_batches(index_path, result_set="PlayerIndex"):
+        for row in batch.to_pylist():
+            yield _player_row(row, team_ids)
+
+
+def _player_row(row: Dict[str, Any], team_ids: Optional[set]) -> Dict[str, Any]:
+    """Map a PlayerIndex row to a Player row."""
+    team_id = row["TEAM_ID"] or None
+    if team_ids is not None and team_id not in team_ids:
+        team_id = None
+    return {
+        "id": row["PERSON_ID"],
+        "first_name": row["PLAYER_FIRST_NAME"],
+        "last_name": row["PLAYER_LAST_NAME"],
+        "full_name": f"{row['PLAYER_FIRST_NAME']} {row['PLAYER_LAST_NAME']}".strip(),
+        "is_active": row["ROSTER_STATUS"] == 1,
+        "height": parse_height(row["HEIGHT"]),
+        "weight": float(row["WEIGHT"]) if row["WEIGHT"] else None,
+        "position": row["POSITION"] or None,
+        "team_id": team_id,
+    }
+
+
+def _stats_rows(frame: pl.DataFrame, player_ids: Optional[set]) -> Iterator[Dict[str, Any]]:
+    if player_ids is not None:
+        frame = frame.filter(pl.col("player_id").is_in(list(player_ids)))
+    return frame.iter_rows(named=True)
+
+
+def basic_stats_rows(root: str = NBA_LEAGUE_DASH_PATH,
+                     player_ids: Optional[set] = None) -> Iterator[Dict[str, Any]]:
+    """Yield PlayerBasicStats rows from the season store.
+
+    PerGame partitions are used as is, Totals partitions are divided by games
+    played; a season stored with both per modes is read from PerGame.
+    ``player_ids`` limits the rows to players that exist.
+    """
+    frame = season_store.load(["PLAYER_ID", "GP", *BASIC_COLUMNS.values()],
+                              per_mode=None, root=root)
+    if frame.is_empty():
+        return iter(())
+    frame = frame.sort(pl.col("per_mode") != "PerGame").unique(
+        ["PLAYER_ID", "season"], keep="first", maintain_order=True)
+    games = pl.when(pl.col("per_mode") == "Totals").then(pl.col("GP")).otherwise(1)
+    frame = frame.select(
+        pl.col("PLAYER_ID").alias("player_id"), pl.col("season").alias("season_id"),
+        pl.col("GP").alias("games_played"),
+        *((pl.col(source) if source.endswith("_PCT") else pl.col(source) / games).alias(column)
+          for column, source in BASIC_COLUMNS.items()),
+    )
+    return _stats_rows(frame, player_ids)
+
+
+def advanced_stats_rows(totals: pl.DataFrame, nba_ids: Dict[int, int],
+                        player_ids: Optional[set] = None) -> Iterator[Dict[str, Any]]:
+    """Yield PlayerAdvancedStats rows of ``advanced.compute_advanced`` totals."""
+    return _stats_rows(advanced.model_rows(totals, nba_ids), player_ids)
+
+
+def shooting_stats_rows(totals: pl.DataFrame, nba_ids: Dict[int, int],
+                        player_ids: Optional[set] = None) -> Iterator[Dict[str, Any]]:
+    """Yield PlayerShootingStats rows of ``advanced.compute_advanced`` totals.
+
+    Makes and attempts per game come from the box totals, the assisted and
+    dunk percentages from the Player Shooting table, its combined row for
+    players who changed teams. The table has no layup splits, nor splits of
+    threes and free throws beyond the assisted threes, those stay null.
+    """
+    shooting = scan("player_shooting", ["player_id", "season", "tm", "num_of_dunks",
+                                        "percent_assisted_x2p_fg", "percent_assisted_x3p_fg"])
+    shooting = shooting.sort(~pl.col("tm").str.contains(advanced.MULTI_TEAM)).unique(
+        ["player_id", "season"], keep="first", maintain_order=True).drop("tm")
+    frame = totals.lazy().join(shooting, on=["player_id", "season"], how="left").with_columns(
+        nba_id=pl.col("player_id").replace_strict(nba_ids, default=None, return_dtype=pl.Int64),
+    ).filter(pl.col("nba_id").is_not_null())
+    columns = []
+    for prefix, percentage, made, attempts, assisted in SHOTS:
+        ratio = pl.when(pl.col(attempts) > 0)
+        columns += [
+            (pl.col(made) / pl.col("g")).alias(f"{prefix}_made_per_game"),
+            (pl.col(attempts) / pl.col("g")).alias(f"{prefix}_attempted_per_game"),
+            ratio.then(pl.col(made) / pl.col(attempts)).alias(percentage),
+            (pl.col(assisted) if assisted else pl.lit(None, pl.Float64))
+            .alias(f"{prefix}_assisted_percentage"),
+            (ratio.then(pl.col("num_of_dunks") / pl.col(attempts)) if prefix.startswith("two")
+             else pl.lit(None, pl.Float64)).alias(f"{prefix}_dunk_percentage"),
+            pl.lit(None, pl.Float64).alias(f"{prefix}_layup_percentage"),
+        ]
+    frame = frame.select(pl.col("nba_id").alias("player_id"),
+                         (pl.col("season") - 1).alias("season_id"), *columns).collect()
+    return _stats_rows(frame, player_ids)
+
+
+def load_all(engine: Engine) -> List[LoadReport]:
+    """Load teams, seasons, players and their season stats from the bundled data files."""
+    from backend.data.nba.identity import get_identity_index
+
+    teams = list(team_rows())
+    reports = [
+        copy_rows(engine, Team.__table__, teams),
+        copy_rows(engine, Season.__table__, season_rows()),
+    ]
+    player_ids = set()
+    players = (player_ids.add(row["id"]) or row
+               for row in player_rows(team_ids={team["id"] for team in teams}))
+    reports.append(copy_rows(engine, Player.__table__, players))
+
+    totals = advanced.compute_advanced()
+    nba_ids = get_identity_index().nba_ids(totals["player_id"].unique().to_list())
+    for table, rows in (
+            (PlayerBasicStats, basic_stats_rows(player_ids=player_ids)),
+            (PlayerAdvancedStats, advanced_stats_rows(totals, nba_ids, player_ids)),
+            (PlayerShootingStats, shooting_stats_rows(totals, nba_ids, player_ids))):
+        reports.append(copy_rows(engine, table.__table__, rows, key_columns=STATS_KEY))
+    return reports
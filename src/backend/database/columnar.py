@@ -0,0 +1,210 @@
+"""Columnar read path from the database into Arrow tables and polars frames.
+
+Rows never become ORM objects. On Postgres the query is wrapped in ``COPY
+(...) TO STDOUT`` and the CSV stream is parsed by Arrow's multithreaded CSV
+reader with the column types of the model. Other dialects read the raw DBAPI
+cursor in ``batch_size`` row chunks, each transposed into typed Arrow
+arrays:
+
+    frame = read_polars(engine, PlayerBasicStats, season_id=2023)
+    frame = PlayerBasicStats.to_polars(session, columns=["player_id", "points_per_game"])
+
+``python -m backend.database.columnar`` compares this path with loading ORM
+objects and building a frame from them.
+"""
+import argparse
+import io
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric, String, Text, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+# Rows per cursor fetch
+DEFAULT_BATCH_SIZE = 50_000
+
+# Null marker of the COPY output, distinct from an empty string
+COPY_NULL = r"\N"
+
+# Arrow types of the SQLAlchemy column types, checked in order
+ARROW_TYPES = [
+    (Boolean, pa.bool_()),
+    (Integer, pa.int64()),
+    (Float, pa.float64()),
+    (Numeric, pa.float64()),
+    (DateTime, pa.timestamp("us")),
+    (Date, pa.date32()),
+    (String, pa.string()),
+    (Text, pa.string()),
+]
+
+
+def arrow_type(column: Any) -> pa.DataType:
+    """Return the Arrow type of a column, strings for unknown types."""
+    for sql_type, type_ in ARROW_TYPES:
+        if isinstance(column.type, sql_type):
+            return type_
+    return pa.string()
+
+
+def _statement(model: Any, columns: Optional[Sequence[str]], kwargs: Dict[str, Any]):
+    table = model.__table__
+    selected = [table.c[name] for name in columns] if columns else list(table.columns)
+    statement = select(*selected)
+    for name, value in kwargs.items():
+        statement = statement.where(table.c[name] == value)
+    return statement, pa.schema([(c.name, arrow_type(c)) for c in selected])
+
+
+def _copy(conn: Connection, statement: Any, schema: pa.Schema) -> pa.Table:
+    """Read a statement with COPY TO STDOUT and parse it as typed CSV."""
+    sql = str(statement.compile(conn.engine, compile_kwargs={"literal_binds": True}))
+    buffer = io.BytesIO()
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer)
+    finally:
+        cursor.close()
+    buffer.seek(0)
+    return pa_csv.read_csv(
+        buffer,
+        read_options=pa_csv.ReadOptions(column_names=schema.names),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=schema, null_values=[COPY_NULL], strings_can_be_null=True,
+            true_values=["t"], false_values=["f"]),
+    )
+
+
+def _arrow_array(values: Sequence[Any], type_: pa.DataType) -> pa.Array:
+    """Build a typed array, parsing temporal columns the driver returns as text."""
+    try:
+        return pa.array(values, type=type_)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(values).cast(type_)
+
+
+def _cursor(conn: Connection, statement: Any, schema: pa.Schema,
+            batch_size: int) -> pa.Table:
+    """Read a statement with the DBAPI cursor, one record batch per ``batch_size`` rows.
+
+    The rows skip SQLAlchemy's result processing; every batch is transposed
+    into typed column arrays.
+    """
+    sql = str(statement.compile(conn.engine, compile_kwargs={"literal_binds": True}))
+    cursor = conn.connection.dbapi_connection.cursor()
+    batches = []
+    try:
+        cursor.execute(sql)
+        while rows := cursor.fetchmany(batch_size):
+            columns = zip(*rows)
+            batches.append(pa.RecordBatch.from_arrays(
+                [_arrow_array(values, field.type) for values, field in zip(columns, schema)],
+                schema=schema))
+    finally:
+        cursor.close()
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+def read_arrow(bind: Union[Engine, Connection, Session], model: Any,
+               columns: Optional[Sequence[str]] = None,
+               batch_size: int = DEFAULT_BATCH_SIZE, **kwargs) -> pa.Table:
+    """
+    Read a model's rows into an Arrow table without building ORM objects.
+
+    Args:
+        bind: Engine, connection or session to read with.
+        model: Mapped class whose table is read.
+        columns: Columns to read, all by default.
+        batch_size: Rows per cursor fetch, unused with COPY.
+        **kwargs: Column equality filters.
+    """
+    statement, schema = _statement(model, columns, kwargs)
+    if isinstance(bind, Session):
+        return _read(bind.connection(), statement, schema, batch_size)
+    if isinstance(bind, Engine):
+        with bind.connect() as conn:
+            return _read(conn, statement, schema, batch_size)
+    return _read(bind, statement, schema, batch_size)
+
+
+def _read(conn: Connection, statement: Any, schema: pa.Schema, batch_size: int) -> pa.Table:
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        return _copy(conn, statement, schema)
+    return _cursor(conn, statement, schema, batch_size)
+
+
+def read_polars(bind: Union[Engine, Connection, Session], model: Any,
+                columns: Optional[Sequence[str]] = None,
+                batch_size: int = DEFAULT_BATCH_SIZE, **kwargs) -> Any:
+    """Read a model's rows into a polars DataFrame, see ``read_arrow``."""
+    import polars as pl
+
+    return pl.from_arrow(read_arrow(bind, model, columns, batch_size, **kwargs))
+
+
+def read_orm(session: Session, model: Any, columns: Optional[Sequence[str]] = None,
+             **kwargs) -> Any:
+    """The ORM path the benchmark compares with: load objects, then build a frame."""
+    import polars as pl
+
+    names = list(columns) if columns else [c.key for c in model.__table__.columns]
+    objects = session.scalars(select(model).filter_by(**kwargs)).all()
+    return pl.DataFrame([{name: getattr(o, name) for name in names} for o in objects])
+
+
+def benchmark(engine: Optional[Engine] = None, players: int = 5000, seasons: int = 10,
+              repeat: int = 5) -> Dict[str, float]:
+    """
+    Time reading one table through the ORM and through the columnar path.
+
+    Fills a scratch database, in-memory SQLite by default, with synthetic
+    player basic stats and returns the best time in milliseconds of each path.
+
+    Raises:
+        RuntimeError: If the two paths do not read the same number of rows and columns.
+    """
+    from backend.database.db import make_engine
+    from backend.database.plans import fill_stats
+    from backend.models.NBA.models import PlayerBasicStats
+
+    engine = engine or make_engine("sqlite://")
+    fill_stats(engine, players, seasons)
+    timings: Dict[str, List[float]] = {"orm": [], "columnar": []}
+    for _ in range(repeat):
+        with Session(engine) as session:
+            start = time.perf_counter()
+            orm = read_orm(session, PlayerBasicStats)
+            timings["orm"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        columnar = read_polars(engine, PlayerBasicStats)
+        timings["columnar"].append(time.perf_counter() - start)
+    if orm.shape != columnar.shape:
+        raise RuntimeError(f"The ORM and columnar reads disagree: {orm.shape} rows and "
+                           f"columns against {columnar.shape}")
+    return {path: min(times) * 1000 for path, times in timings.items()}
+
+
+def main() -> None:
+    from backend.database.db import make_engine
+    from backend.utils.logger import init_file_sinks
+
+    parser = argparse.ArgumentParser(description="Compare the ORM and columnar read paths")
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--seasons", type=int, default=10)
+    parser.add_argument("--url", help="scratch database url, in-memory SQLite by default")
+    args = parser.parse_args()
+    init_file_sinks()
+    timings = benchmark(make_engine(args.url) if args.url else None,
+                        args.players, args.seasons)
+    rows = args.players * args.seasons
+    for path, milliseconds in timings.items():
+        print(f"{path:<9} {milliseconds:9.1f}ms  {rows / milliseconds * 1000:12,.0f} rows/s")
+    print(f"speedup   {timings['orm'] / timings['columnar']:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
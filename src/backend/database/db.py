@@ -1,41 +1,207 @@
-"""Functions for creating and interacting with the postgres database."""
+"""Functions for creating and interacting with the database.
+
+``Settings.DATABASE_BACKEND`` selects the database:
+
+    postgresql  the server of DATABASE_URL or its parts (default)
+    sqlite      an embedded file at DATABASE_PATH, for the ORM schema
+    duckdb      an embedded file at DATABASE_PATH, with views over the data files
+
+One sync and one async engine are created per process, on first use, with the
+pool settings of ``Settings``; nothing is resolved or created at import. Sessions are handed out by the cached session
+factories, so every request reuses pooled connections:
+
+    @app.get("/players")
+    async def players(session: AsyncSession = Depends(get_async_session)):
+        ...
+
+``get_analytics_engine`` is a DuckDB engine, in memory unless
+DATABASE_ANALYTICS_PATH is set, for scans over the Parquet and CSV data
+files whatever the main backend is. DuckDB has no SERIAL type, so the ORM
+tables need Postgres or SQLite.
+"""
+import importlib
 import os
-from sqlalchemy import create_engine, text, MetaData
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator
+
+from sqlalchemy import create_engine, event, text, MetaData
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 from loguru import logger
 from backend.core.config import settings
+from backend.core.path_config import NBA_DATA_PATH
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
-# Logger 
+
+# Logger
 logger = logger
 
 # Metadata
 metadata = MetaData()
 
 
+# Backends running in-process on a local file
+EMBEDDED_BACKENDS = ("sqlite", "duckdb")
+
+# Packages of the async drivers, from the async extra
+ASYNC_DRIVERS = {"sqlite+aiosqlite": "aiosqlite", "postgresql+asyncpg": "asyncpg"}
+
+
+def embedded_url(backend: str, path: str = "") -> str:
+    """Return the URL of an embedded database file, ':memory:' for a private one."""
+    if backend not in EMBEDDED_BACKENDS:
+        raise ValueError(f"Unknown embedded backend {backend!r}, expected one of {EMBEDDED_BACKENDS}")
+    path = path or os.path.join(NBA_DATA_PATH, "cache", f"nba.{backend}")
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return f"{backend}:///{path}"
+
+
+def database_url() -> str:
+    """Return the configured database URL, built from its parts if not set."""
+    if settings.DATABASE_BACKEND in EMBEDDED_BACKENDS:
+        return embedded_url(settings.DATABASE_BACKEND, settings.DATABASE_PATH)
+    if settings.DATABASE_URL:
+        return str(settings.DATABASE_URL)
+    if settings.DATABASE_URI:
+        return settings.DATABASE_URI
+    return f"postgresql://{settings.DATABASE_USER}:{settings.DATABASE_PASSWORD}@{settings.DATABASE_HOST}:{settings.DATABASE_PORT}/{settings.DATABASE_NAME}"
+
+
+def async_database_url() -> str:
+    """Return the database URL with the asyncpg or aiosqlite driver."""
+    url = database_url()
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite" + url[url.index("://"):]
+    return "postgresql+asyncpg" + url[url.index("://"):] if url.startswith("postgres") else url
+
+
+def engine_options(url: str = "") -> Dict[str, Any]:
+    """Return the pool options shared by the sync and async engines.
+
+    Embedded databases keep SQLAlchemy's default pools, there is no server
+    connection to size a pool for.
+    """
+    if url.split(":", 1)[0].split("+")[0] in EMBEDDED_BACKENDS:
+        return {}
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+    }
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # pysqlite begins transactions on its own and commits them on RELEASE
+    # SAVEPOINT, so it is switched to autocommit and _sqlite_begin begins them
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON")
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.close()
+
+
+def _sqlite_begin(conn) -> None:
+    conn.exec_driver_sql("BEGIN")
+
+
+def _duckdb_views(dbapi_connection, connection_record) -> None:
+    from backend.database.analytics import register_views
+
+    register_views(dbapi_connection)
+
+
+def make_engine(url: str, **kwargs) -> Engine:
+    """
+    Create an engine for any backend, the one factory of all engines.
+
+    SQLite connections get foreign keys enforced, write-ahead logging and
+    transactions begun by SQLAlchemy so savepoints work, DuckDB connections
+    get the data file views.
+    """
+    engine = create_engine(url, **{**engine_options(url), **kwargs})
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas)
+        event.listen(engine, "begin", _sqlite_begin)
+    elif engine.dialect.name == "duckdb":
+        event.listen(engine, "connect", _duckdb_views)
+    return engine
+
+
 # Database engine
-def create_engine_and_session():
-    """Create a new engine and session."""
-    SQL_URL = f"postgresql://{settings.DATABASE_USER}:{settings.DATABASE_PASSWORD}@{settings.DATABASE_HOST}:{settings.DATABASE_PORT}/{settings.DATABASE_NAME}"
-    engine = create_engine(SQL_URL)
-    session = sessionmaker(engine)
-    return engine, session
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """Return the process-wide sync engine, creating it on first use."""
+    return make_engine(database_url())
+
 
+@lru_cache(maxsize=None)
+def get_analytics_engine() -> Engine:
+    """Return the process-wide DuckDB engine over the data files."""
+    return make_engine(embedded_url("duckdb", settings.DATABASE_ANALYTICS_PATH))
 
-SQL_URL = f"postgresql://{settings.DATABASE_USER}:{settings.DATABASE_PASSWORD}@{settings.DATABASE_HOST}:{settings.DATABASE_PORT}/{settings.DATABASE_NAME}"
 
+@lru_cache(maxsize=None)
+def get_sessionmaker() -> sessionmaker:
+    """Return the session factory bound to the sync engine."""
+    return sessionmaker(get_engine(), expire_on_commit=False)
+
+
+def create_engine_and_session():
+    """Return the shared engine and session factory."""
+    return get_engine(), get_sessionmaker()
 
-ASYNC_SQL_URL = SQL_URL.replace("postgresql", "postgresql+asyncpg")
 
 # Async database engine
+@lru_cache(maxsize=None)
+def get_async_engine() -> "AsyncEngine":
+    """Return the process-wide async engine, creating it on first use.
+
+    asyncpg connections keep a cache of prepared statements, so repeated
+    queries skip the parse/plan round trip.
+
+    Raises:
+        ValueError: On the DuckDB backend, which has no async driver.
+        ImportError: If the async driver of the backend is not installed.
+    """
+    url = async_database_url()
+    if url.startswith("duckdb"):
+        raise ValueError("DuckDB has no async driver, use get_engine")
+    driver = ASYNC_DRIVERS.get(url.split(":", 1)[0])
+    if driver is not None:
+        try:
+            importlib.import_module(driver)
+        except ImportError:
+            raise ImportError(f"The async engine needs {driver}, which is not installed, "
+                              "install the async extra: pip install backend[async]") from None
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    connect_args = {}
+    if url.startswith("postgresql+asyncpg"):
+        connect_args["prepared_statement_cache_size"] = settings.DATABASE_STATEMENT_CACHE_SIZE
+    engine = create_async_engine(url, connect_args=connect_args, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", _sqlite_pragmas)
+        event.listen(engine.sync_engine, "begin", _sqlite_begin)
+    return engine
+
+
+@lru_cache(maxsize=None)
+def get_async_sessionmaker() -> "async_sessionmaker":
+    """Return the async session factory bound to the async engine."""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    return async_sessionmaker(get_async_engine(), expire_on_commit=False, class_=AsyncSession)
+
+
 async def create_async_engine_and_session():
-    """Create a new async engine and session."""
-    engine = create_async_engine(ASYNC_SQL_URL)
-    async_session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    async with engine.begin() as conn:
-        await conn.run_sync(metadata.create_all)
-    return engine, async_session
+    """Return the shared async engine and session factory."""
+    return get_async_engine(), get_async_sessionmaker()
 
 
 # Create function that creates all tables that have inherited from BaseModel
@@ -50,44 +216,50 @@ def drop_tables(engine, table_names) -> None:
     metadata.drop_all(engine, tables=table_names)
 
 
-# Test the connection to the database
-db_url = os.getenv("DATABASE_URI")
+def get_db() -> Iterator[Session]:
+    """Yield a session from the shared pool, closing it afterwards."""
+    with get_sessionmaker()() as session:
+        try:
+            yield session
+        except Exception as e:
+            logger.error(f"Database session failed: {e}")
+            session.rollback()
+            raise e
 
 
-def get_db():
-    """Return the database connection."""
-    db = create_engine_and_session(db_url)
-    try:
-        yield db
-        logger.info("Database connection successful.")
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        raise e
-    
-    finally:
-        db.close()
-        logger.info("Database connection closed.")
+async def get_async_session() -> AsyncIterator["AsyncSession"]:
+    """FastAPI dependency yielding an async session from the shared pool."""
+    async with get_async_sessionmaker()() as session:
+        try:
+            yield session
+        except Exception as e:
+            logger.error(f"Database session failed: {e}")
+            await session.rollback()
+            raise e
+
+
+async def dispose_engines() -> None:
+    """Close the pooled connections, e.g. on application shutdown."""
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    if get_analytics_engine.cache_info().currsize:
+        get_analytics_engine().dispose()
+
 
 # Test the connection to the database
 def test_connection():
-    """Test the connection to the database."""
+    """Test the connection to the database.
+
+    Not run at import: call it from the application's startup so tools and
+    workers that never touch the database start without one.
+    """
     try:
-        engine = create_engine(db_url)
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             result = conn.execute(text("SELECT 1"))
             logger.info("Database connection successful.")
             return result
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         raise e
-    finally:
-        conn.close()
-        logger.info("Database connection closed.")
-
-# Test the connection to the database
-test_connection()
-
-
-
-
-   
\ No newline at end of file
@@ -0,0 +1,91 @@
+"""Query counting and N+1 detection.
+
+``QueryCounter`` records every statement an engine executes while it is
+active. ``query_guard`` wraps a unit of work and raises ``NPlusOneError``
+when it runs more statements than allowed, or when the same statement is
+repeated with different parameters more often than ``max_repeats``, the
+signature of a lazy load firing once per object:
+
+    with query_guard(session, max_queries=4):
+        render_team_page(session, team_id)
+
+In tests it is used the same way around the code path under test.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+# Times a statement may repeat within a guarded unit of work
+DEFAULT_MAX_REPEATS = 3
+
+# Transaction control statements, not counted as queries
+TRANSACTION_STATEMENTS = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+class NPlusOneError(AssertionError):
+    """Raised when a guarded unit of work issues too many queries."""
+
+
+def _engine(bind: Union[Engine, Session, Any]) -> Engine:
+    """Return the sync engine behind an engine, a session or an async engine."""
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    return getattr(bind, "sync_engine", bind)
+
+
+class QueryCounter:
+    """Record the statements executed on an engine while active, transaction control aside."""
+
+    def __init__(self, bind: Union[Engine, Session, Any]) -> None:
+        self.engine = _engine(bind)
+        self.statements: List[str] = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters,
+                               context, executemany) -> None:
+        if not statement.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+            self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, max_repeats: int = DEFAULT_MAX_REPEATS) -> List[Tuple[str, int]]:
+        """Return the statements executed more than ``max_repeats`` times."""
+        return [(statement, times) for statement, times
+                in Counter(self.statements).most_common() if times > max_repeats]
+
+
+@contextmanager
+def query_guard(bind: Union[Engine, Session, Any], max_queries: Optional[int] = None,
+                max_repeats: int = DEFAULT_MAX_REPEATS) -> Iterator[QueryCounter]:
+    """
+    Count the queries of a unit of work and fail it when it goes N+1.
+
+    Args:
+        bind: Engine, async engine or session the work runs on.
+        max_queries: Maximum number of statements, unlimited if None.
+        max_repeats: Maximum times one statement may run.
+
+    Raises:
+        NPlusOneError: On leaving the block, if a limit was exceeded.
+    """
+    with QueryCounter(bind) as counter:
+        yield counter
+    problems = []
+    if max_queries is not None and counter.count > max_queries:
+        problems.append(f"{counter.count} queries, at most {max_queries} allowed")
+    for statement, times in counter.repeated(max_repeats):
+        problems.append(f"{times}x: {' '.join(statement.split())[:200]}")
+    if problems:
+        raise NPlusOneError("N+1 query pattern detected:\n" + "\n".join(problems))
@@ -0,0 +1,103 @@
+"""Load test showing that sessions reuse the pooled connections.
+
+Runs many short queries concurrently through the session dependencies and
+counts, with pool events, how many DBAPI connections were opened compared to
+how many times one was checked out of the pool. With pooling working the
+connection count stays at most ``pool_size + max_overflow`` however many
+requests are made.
+
+    python -m backend.database.loadtest --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+from backend.database.db import get_async_engine, get_async_session, get_db, get_engine
+
+
+@dataclass
+class PoolReport:
+    """Connections opened and checked out during a load test."""
+
+    requests: int
+    seconds: float
+    connects: int = 0
+    checkouts: int = 0
+
+    @property
+    def reuse(self) -> float:
+        """Average number of checkouts served by each opened connection."""
+        return self.checkouts / self.connects if self.connects else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.requests} requests in {self.seconds:.2f}s: "
+                f"{self.connects} connections opened, {self.checkouts} checkouts "
+                f"({self.reuse:.1f} per connection)")
+
+
+def _count(engine: Engine, report: PoolReport) -> None:
+    def on_connect(*args) -> None:
+        report.connects += 1
+
+    def on_checkout(*args) -> None:
+        report.checkouts += 1
+
+    event.listen(engine, "connect", on_connect)
+    event.listen(engine, "checkout", on_checkout)
+
+
+def sync_load_test(requests: int = 1000, concurrency: int = 20) -> PoolReport:
+    """Run ``requests`` queries from ``concurrency`` threads through get_db."""
+    report = PoolReport(requests, 0.0)
+    _count(get_engine(), report)
+
+    def query(_: int) -> None:
+        for session in get_db():
+            session.execute(text("SELECT 1"))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(query, range(requests)))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+async def load_test(requests: int = 1000, concurrency: int = 50) -> PoolReport:
+    """Run ``requests`` queries, ``concurrency`` at a time, through get_async_session."""
+    report = PoolReport(requests, 0.0)
+    _count(get_async_engine().sync_engine, report)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def query() -> None:
+        async with semaphore:
+            async for session in get_async_session():
+                await session.execute(text("SELECT 1"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(query() for _ in range(requests)))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main() -> None:
+    from backend.utils.logger import init_file_sinks
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sync", action="store_true", help="use threads and get_db")
+    args = parser.parse_args()
+    init_file_sinks()
+    if args.sync:
+        print(sync_load_test(args.requests, args.concurrency))
+    else:
+        print(asyncio.run(load_test(args.requests, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
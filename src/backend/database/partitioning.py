@@ -0,0 +1,127 @@
+"""Optional range partitioning of the season keyed tables on Postgres.
+
+``partition_by_season`` rebuilds a table as ``PARTITION BY RANGE
+(season_id)`` with one partition per season plus a default partition for
+the seasons without one, so season scans and season reloads only touch one
+partition. Postgres requires the partition key in every unique constraint,
+so the primary key becomes (id, season_id) and season_id NOT NULL: tables
+with rows lacking a season are refused. The table's own foreign keys are
+recreated; foreign keys pointing at the table, like those of the
+association tables on ``games``, cannot reference (id) alone any more and
+are dropped.
+
+Other dialects have no declarative partitioning; the call logs and returns
+without changes there.
+
+    partition_by_season(engine, "player_basic_stats", range(1947, 2025))
+"""
+from typing import Iterable, List
+
+from loguru import logger
+from sqlalchemy import Table, UniqueConstraint, inspect, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import AddConstraint, CreateIndex
+
+
+log = logger.bind(name=__file__)
+
+# Tables worth partitioning, all with a season_id column
+SEASON_TABLES = ("games", "player_basic_stats", "player_advanced_stats",
+                 "player_shooting_stats")
+
+
+def partition_ddl(table: Table, seasons: Iterable[int], column: str = "season_id") -> List[str]:
+    """Return the statements turning ``table`` into a season partitioned table.
+
+    Indexes, unique constraints and foreign keys are recreated from the
+    table definition once the old table is gone, ``LIKE`` copies none of
+    them; its id sequence is handed over to the new one.
+    """
+    name = table.name
+    staging = f"{name}_partitioned"
+    statements = [
+        f"CREATE TABLE {staging} (LIKE {name} INCLUDING DEFAULTS) "
+        f"PARTITION BY RANGE ({column})",
+    ]
+    for season in sorted(set(seasons)):
+        statements.append(
+            f"CREATE TABLE {name}_{season} PARTITION OF {staging} "
+            f"FOR VALUES FROM ({season}) TO ({season + 1})")
+    statements += [
+        f"CREATE TABLE {name}_default PARTITION OF {staging} DEFAULT",
+        f"INSERT INTO {staging} SELECT * FROM {name}",
+        f"ALTER SEQUENCE IF EXISTS {name}_id_seq OWNED BY NONE",
+        f"DROP TABLE {name} CASCADE",
+        f"ALTER TABLE {staging} RENAME TO {name}",
+        f"ALTER SEQUENCE IF EXISTS {name}_id_seq OWNED BY {name}.id",
+        f"ALTER TABLE {name} ADD PRIMARY KEY (id, {column})",
+    ]
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            columns = ", ".join(c.name for c in constraint.columns)
+            statements.append(f"ALTER TABLE {name} ADD CONSTRAINT {constraint.name} "
+                              f"UNIQUE ({columns})")
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        if column in index.columns or not index.unique:
+            statements.append(str(CreateIndex(index).compile(dialect=postgresql.dialect())))
+    for fk in sorted(table.foreign_key_constraints, key=lambda fk: fk.column_keys):
+        statements.append(str(AddConstraint(fk).compile(dialect=postgresql.dialect())))
+    return statements
+
+
+def _referencing_foreign_keys(conn: Connection, table: str) -> List[str]:
+    """Return DROP statements of the foreign keys referencing ``table``."""
+    inspector = inspect(conn)
+    statements = []
+    for other in inspector.get_table_names():
+        for fk in inspector.get_foreign_keys(other):
+            if fk["referred_table"] == table and fk.get("name"):
+                statements.append(f'ALTER TABLE {other} DROP CONSTRAINT "{fk["name"]}"')
+    return statements
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table)"),
+        {"table": table}).scalar()
+
+
+def partition_by_season(engine: Engine, table: str, seasons: Iterable[int]) -> bool:
+    """
+    Rebuild a table as range partitioned by season, in one transaction.
+
+    Args:
+        engine: Engine of the database.
+        table: One of SEASON_TABLES.
+        seasons: Season ids to create partitions for.
+
+    Returns:
+        True if the table was partitioned, False if it already was or the
+        dialect does not support it.
+
+    Raises:
+        ValueError: If rows of the table have no season_id.
+    """
+    if engine.dialect.name != "postgresql":
+        log.info(f"Partitioning is not supported on {engine.dialect.name}, "
+                 f"{table} left as is")
+        return False
+    from backend.models.NBA.models import BaseModel
+
+    with engine.begin() as conn:
+        if is_partitioned(conn, table):
+            return False
+        missing = conn.execute(text(
+            f"SELECT count(*) FROM {table} WHERE season_id IS NULL")).scalar()
+        if missing:
+            raise ValueError(f"{table} has {missing} rows without a season_id, set or "
+                             f"delete them before partitioning")
+        dropped = _referencing_foreign_keys(conn, table)
+        for statement in dropped + partition_ddl(BaseModel.metadata.tables[table], seasons):
+            conn.execute(text(statement))
+    for statement in dropped:
+        log.warning(f"Partitioning {table}: {statement}")
+    log.info(f"Partitioned {table} by season")
+    return True
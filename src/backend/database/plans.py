@@ -0,0 +1,165 @@
+"""Query plans of the stats access paths, before and after their indexes.
+
+``explain`` returns the plan of a statement on SQLite or Postgres.
+``benchmark`` fills a scratch database with synthetic player season stats,
+then times and explains the natural key lookup and the season leaderboard
+with the indexes of the models, drops the indexes and does it again:
+
+    python -m backend.database.plans --players 5000 --seasons 30
+"""
+import argparse
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Float, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import DropConstraint, DropIndex
+
+
+@dataclass
+class PlanReport:
+    """Plan and mean time of a query."""
+
+    query: str
+    plan: List[str]
+    milliseconds: float
+
+    def __str__(self) -> str:
+        return "\n".join([f"{self.query}: {self.milliseconds:.3f}ms",
+                          *(f"    {line}" for line in self.plan)])
+
+
+def explain(engine: Engine, statement: Any, params: Optional[Dict[str, Any]] = None,
+            analyze: bool = False) -> List[str]:
+    """Return the plan of a statement, one line per plan node."""
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True})) \
+        if not isinstance(statement, str) else statement
+    if engine.dialect.name == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+    with engine.connect() as conn:
+        rows = conn.execute(text(prefix + sql), params or {}).fetchall()
+    return [str(row[-1]) for row in rows]
+
+
+def _time(engine: Engine, statement: Any, repeat: int) -> float:
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(statement).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def queries() -> Dict[str, Any]:
+    """Return the benchmarked statements."""
+    from backend.models.NBA.models import PlayerBasicStats
+
+    return {
+        "player season lookup": select(PlayerBasicStats.points_per_game).where(
+            PlayerBasicStats.player_id == 42, PlayerBasicStats.season_id == 2010),
+        "season points leaderboard": select(
+            PlayerBasicStats.player_id, PlayerBasicStats.points_per_game).where(
+            PlayerBasicStats.season_id == 2010).order_by(
+            PlayerBasicStats.points_per_game.desc()).limit(10),
+    }
+
+
+def fill_stats(engine: Engine, players: int, seasons: int) -> None:
+    """Create the player stats tables and fill them with synthetic seasons.
+
+    The tables they reference are created too, the engines of ``db.make_engine``
+    enforce foreign keys on SQLite.
+    """
+    from backend.models.NBA.models import BaseModel, Player, PlayerBasicStats, Season
+
+    tables = [Player.__table__, Season.__table__, PlayerBasicStats.__table__]
+    for table in tables:
+        tables += [fk.column.table for fk in table.foreign_keys if fk.column.table not in tables]
+    BaseModel.metadata.create_all(engine, tables=tables)
+    rng = random.Random(0)
+    stats = [c.name for c in PlayerBasicStats.__table__.columns
+             if isinstance(c.type, Float)]
+    with engine.begin() as conn:
+        conn.execute(Season.__table__.insert(), [
+            {"id": 2010 - i, "year": 2010 - i} for i in range(seasons)])
+        conn.execute(Player.__table__.insert(), [{"id": i} for i in range(players)])
+        conn.execute(PlayerBasicStats.__table__.insert(), [
+            {"player_id": p, "season_id": 2010 - s, "games_played": rng.randint(1, 82),
+             **{stat: round(rng.uniform(0, 35), 1) for stat in stats}}
+            for p in range(players) for s in range(seasons)])
+        conn.execute(text("ANALYZE"))
+
+
+def _drop_indexes(engine: Engine) -> None:
+    """Drop the natural key and leaderboard indexes of player_basic_stats."""
+    from backend.models.NBA.models import PlayerBasicStats
+
+    table = PlayerBasicStats.__table__
+    with engine.begin() as conn:
+        for index in table.indexes:
+            if len(index.columns) > 1:
+                conn.execute(DropIndex(index))
+        if engine.dialect.name == "sqlite":
+            # SQLite cannot drop a table constraint, rebuild the table without it
+            conn.execute(text("CREATE TABLE stats_copy AS SELECT * FROM player_basic_stats"))
+            conn.execute(text("DROP TABLE player_basic_stats"))
+            conn.execute(text("ALTER TABLE stats_copy RENAME TO player_basic_stats"))
+        else:
+            for constraint in table.constraints:
+                if constraint.name and constraint.name.endswith("_player_season_uc"):
+                    conn.execute(DropConstraint(constraint))
+        conn.execute(text("ANALYZE"))
+
+
+def benchmark(engine: Optional[Engine] = None, players: int = 2000, seasons: int = 20,
+              repeat: int = 50) -> Dict[str, List[PlanReport]]:
+    """
+    Explain and time the stats queries with and without their indexes.
+
+    Args:
+        engine: Scratch database, an in-memory SQLite one by default. Its
+            stats tables are created, filled and have their indexes dropped.
+        players: Synthetic players per season.
+        seasons: Synthetic seasons.
+        repeat: Runs per query for the mean time.
+
+    Returns:
+        The reports of the 'after' (indexed) and 'before' (unindexed) runs.
+    """
+    from backend.database.db import make_engine
+
+    engine = engine or make_engine("sqlite://")
+    fill_stats(engine, players, seasons)
+    reports = {}
+    for label in ("after", "before"):
+        if label == "before":
+            _drop_indexes(engine)
+        reports[label] = [PlanReport(name, explain(engine, statement),
+                                     _time(engine, statement, repeat))
+                          for name, statement in queries().items()]
+    return reports
+
+
+def main() -> None:
+    from backend.database.db import make_engine
+    from backend.utils.logger import init_file_sinks
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--seasons", type=int, default=20)
+    parser.add_argument("--url", help="scratch database url, in-memory SQLite by default")
+    args = parser.parse_args()
+    init_file_sinks()
+    engine = make_engine(args.url) if args.url else None
+    reports = benchmark(engine, args.players, args.seasons)
+    for label in ("before", "after"):
+        print(f"== {label} ==")
+        for report in reports[label]:
+            print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""Read-through cache of model lookups, an in-process LRU in front of Redis.
+
+Results are cached as column values under a key made of the table, its
+generation, the lookup and its filters. Writes through ``BaseModel`` bump the
+table's generation, so every cached lookup of that model misses from then on
+and the stale entries age out of both tiers. Generations live in Redis when
+it is configured, so a write in one process invalidates the others within
+``generation_ttl`` seconds.
+
+Hits are rebuilt into instances attached to the caller's session without a
+query. Entries hold committed rows only: a session with pending changes,
+flushed but uncommitted writes or an open unit of work bypasses the cache,
+both ways. The cache is off until configured:
+
+    configure_query_cache()              # LRU, plus Redis if REDIS_URL is set
+    configure_query_cache(FakeRedis())   # in-process stand-in for tests
+
+Redis is the optional ``cache`` dependency, ``pip install backend[cache]``.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from backend.utils.logger import logger
+
+# Key prefix of every cache entry in Redis
+KEY_PREFIX = "qc"
+
+# Entries kept by the in-process tier
+DEFAULT_LRU_SIZE = 4096
+
+# Seconds an entry lives in Redis, data changes at most nightly
+DEFAULT_TTL = 24 * 3600
+
+# Seconds a process trusts its copy of the generations before re-reading Redis
+DEFAULT_GENERATION_TTL = 1.0
+
+# Flag in Session.info of a transaction that wrote rows it has not committed
+WRITTEN_KEY = "query_cache_written"
+
+
+class FakeRedis:
+    """In-process stand-in for the few Redis commands the cache uses."""
+
+    def __init__(self) -> None:
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        value = self._data.get(key)
+        if value is None:
+            return None
+        if value[1] is not None and value[1] < time.monotonic():
+            del self._data[key]
+            return None
+        return value[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._live(key)
+
+    def mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        with self._lock:
+            return [self._live(key) for key in keys]
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        if not isinstance(value, bytes):
+            value = str(value).encode()
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._live(key) or 0) + 1
+            self._data[key] = (str(value).encode(), None)
+            return value
+
+
+class LRUTier:
+    """Thread-safe in-process LRU mapping of cache keys to payloads."""
+
+    def __init__(self, maxsize: int = DEFAULT_LRU_SIZE) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, payload: bytes) -> None:
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class QueryCache:
+    """
+    Two tier read-through cache of model lookups.
+
+    Args:
+        redis: Redis client (or FakeRedis), None for the LRU tier only.
+        lru_size: Entries of the in-process tier.
+        ttl: Seconds an entry lives in Redis.
+        generation_ttl: Seconds between re-reads of the generations from Redis.
+    """
+
+    def __init__(self, redis: Any = None, lru_size: int = DEFAULT_LRU_SIZE,
+                 ttl: int = DEFAULT_TTL,
+                 generation_ttl: float = DEFAULT_GENERATION_TTL) -> None:
+        self.redis = redis
+        self.lru = LRUTier(lru_size)
+        self.ttl = ttl
+        self.generation_ttl = generation_ttl
+        self.counters: Counter = Counter()
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def _generation_key(self, table: str) -> str:
+        return f"{KEY_PREFIX}:gen:{table}"
+
+    def generation(self, table: str) -> int:
+        """Return the current generation of a table."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._generations.get(table)
+        if cached is not None and (self.redis is None or now - cached[1] < self.generation_ttl):
+            return cached[0]
+        generation = cached[0] if cached else 0
+        if self.redis is not None:
+            try:
+                generation = int(self.redis.get(self._generation_key(table)) or 0)
+            except Exception as e:
+                logger.warning(f"Query cache generation read failed: {e}")
+        with self._lock:
+            self._generations[table] = (generation, now)
+        return generation
+
+    def invalidate(self, table: str) -> None:
+        """Make every cached lookup of a table miss."""
+        generation = self.generation(table) + 1
+        if self.redis is not None:
+            try:
+                generation = int(self.redis.incr(self._generation_key(table)))
+            except Exception as e:
+                logger.warning(f"Query cache invalidation in Redis failed: {e}")
+        with self._lock:
+            self._generations[table] = (generation, time.monotonic())
+        self.counters["invalidations"] += 1
+
+    def key(self, table: str, lookup: str, params: Dict[str, Any]) -> str:
+        digest = hashlib.sha1(repr(sorted(params.items())).encode()).hexdigest()
+        return f"{KEY_PREFIX}:{table}:{self.generation(table)}:{lookup}:{digest}"
+
+    def get(self, key: str) -> Optional[bytes]:
+        payload = self.lru.get(key)
+        if payload is not None:
+            self.counters["lru_hits"] += 1
+            return payload
+        if self.redis is not None:
+            try:
+                payload = self.redis.get(key)
+            except Exception as e:
+                logger.warning(f"Query cache read from Redis failed: {e}")
+            if payload is not None:
+                self.counters["redis_hits"] += 1
+                self.lru.set(key, payload)
+                return payload
+        self.counters["misses"] += 1
+        return None
+
+    def set(self, key: str, payload: bytes) -> None:
+        self.lru.set(key, payload)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, payload, ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"Query cache write to Redis failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit, miss and invalidation counters and the hit rate."""
+        hits = self.counters["lru_hits"] + self.counters["redis_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            "lru_hits": self.counters["lru_hits"],
+            "redis_hits": self.counters["redis_hits"],
+            "misses": self.counters["misses"],
+            "bypasses": self.counters["bypasses"],
+            "invalidations": self.counters["invalidations"],
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "lru_entries": len(self.lru),
+        }
+
+
+_cache: Optional[QueryCache] = None
+
+
+def configure_query_cache(redis: Any = None, **kwargs) -> QueryCache:
+    """
+    Turn the query cache on and return it.
+
+    Without a client, Redis is used when ``Settings.REDIS_URL`` is set and
+    the cache is in-process only otherwise.
+    """
+    global _cache
+    if redis is None:
+        from backend.core.config import settings
+
+        if settings.REDIS_URL:
+            try:
+                import redis as redis_lib
+            except ImportError:
+                raise ImportError("REDIS_URL is set but redis is not installed, "
+                                  "install the cache extra: pip install backend[cache]") from None
+
+            redis = redis_lib.Redis.from_url(settings.REDIS_URL)
+        kwargs.setdefault("lru_size", settings.QUERY_CACHE_SIZE)
+        kwargs.setdefault("ttl", settings.QUERY_CACHE_TTL)
+    _cache = QueryCache(redis, **kwargs)
+    return _cache
+
+
+def disable_query_cache() -> None:
+    global _cache
+    _cache = None
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    """Return the configured cache, None while it is off."""
+    return _cache
+
+
+def _dump(model: Any, result: Any) -> bytes:
+    columns = [attr.key for attr in inspect(model).column_attrs]
+    if result is None or isinstance(result, model):
+        rows = [] if result is None else [result]
+    else:
+        rows = result
+    return pickle.dumps({
+        "one": not isinstance(result, list),
+        "rows": [{c: getattr(row, c) for c in columns} for row in rows],
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load(session: Any, model: Any, payload: bytes) -> Any:
+    """Rebuild cached rows as instances of the session, without a query."""
+    data = pickle.loads(payload)
+    instances = []
+    for row in data["rows"]:
+        instance = model(**row)
+        make_transient_to_detached(instance)
+        instances.append(session.merge(instance, load=False))
+    if data["one"]:
+        return instances[0] if instances else None
+    return instances
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context: Any) -> None:
+    session.info[WRITTEN_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _do_orm_execute(state: Any) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info[WRITTEN_KEY] = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session: Session, transaction: Any) -> None:
+    if transaction.parent is None:
+        session.info.pop(WRITTEN_KEY, None)
+
+
+def sees_committed_rows(session: Any) -> bool:
+    """Return whether a session reads only committed rows, the rows the cache holds."""
+    from backend.database.unit_of_work import UnitOfWork
+
+    if session.new or session.dirty or session.deleted:
+        return False
+    return UnitOfWork.of(session) is None and not session.info.get(WRITTEN_KEY)
+
+
+def cached_query(session: Any, model: Any, lookup: str, params: Dict[str, Any],
+                 query: Callable[[], Any]) -> Any:
+    """Return the result of ``query``, from the cache when it is on and has it.
+
+    Sessions with uncommitted changes run the query and leave the cache as is.
+    """
+    cache = _cache
+    if cache is None:
+        return query()
+    if not sees_committed_rows(session):
+        cache.counters["bypasses"] += 1
+        return query()
+    key = cache.key(model.__tablename__, lookup, params)
+    payload = cache.get(key)
+    if payload is not None:
+        return _load(session, model, payload)
+    result = query()
+    cache.set(key, _dump(model, result))
+    return result
+
+
+def invalidate_model(model: Any) -> None:
+    """Invalidate the cached lookups of a model, if the cache is on."""
+    if _cache is not None:
+        _cache.invalidate(model.__tablename__)
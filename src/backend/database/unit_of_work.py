@@ -0,0 +1,204 @@
+"""Unit of work batching the writes of ``BaseModel`` into a few transactions.
+
+Inside a unit of work the ``create``, ``update`` and ``delete`` methods stage
+their change instead of committing it. Staged rows are flushed together every
+``flush_every`` rows and committed every ``commit_every`` rows, or once at the
+end when ``commit_every`` is None:
+
+    with UnitOfWork(session, flush_every=1000, commit_every=50_000) as unit:
+        for row in rows:
+            Player().create(session, **row)
+    for failure in unit.failures:
+        print(failure)
+
+Every batch is written in a savepoint. When its flush fails, the savepoint is rolled back
+and the batch is replayed one row per savepoint, so a bad row is recorded as
+a ``RowFailure`` and the rest of its batch is still written. An exception
+raised in the block rolls back everything not yet committed.
+
+The bulk methods (``create_many``, ``upsert_many``, ``delete_where``) skip
+their per-batch commits inside a unit and leave them to it. Autoflush is off
+while the unit is open, so queries in the block do not see staged rows
+unless ``flush`` is called first.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session, SessionTransaction
+
+from backend.database.query_cache import invalidate_model
+from backend.utils.logger import logger
+
+# Key of the active unit in Session.info
+SESSION_KEY = "unit_of_work"
+
+# Staged rows per flush
+DEFAULT_FLUSH_EVERY = 1000
+
+# Flushed rows per commit
+DEFAULT_COMMIT_EVERY = 50_000
+
+
+@dataclass
+class StagedWrite:
+    """A write staged by a BaseModel method, replayable after a rollback."""
+
+    op: str
+    instance: Any
+    values: Dict[str, Any] = field(default_factory=dict)
+
+    def apply(self, session: Session) -> None:
+        for key, value in self.values.items():
+            setattr(self.instance, key, value)
+        if self.op == "delete":
+            session.delete(self.instance)
+        else:
+            session.add(self.instance)
+
+
+@dataclass
+class RowFailure:
+    """A staged row that could not be written, and why."""
+
+    op: str
+    table: str
+    key: Dict[str, Any]
+    values: Dict[str, Any]
+    error: str
+
+    def __str__(self) -> str:
+        return f"{self.op} {self.table} {self.key}: {self.error}"
+
+
+class UnitOfWork:
+    """
+    Context manager deferring the commits of the BaseModel writes on a session.
+
+    Args:
+        session: The database session.
+        flush_every: Staged rows per flush.
+        commit_every: Flushed rows per commit, None to commit once on exit.
+    """
+
+    def __init__(self, session: Session, flush_every: int = DEFAULT_FLUSH_EVERY,
+                 commit_every: Optional[int] = DEFAULT_COMMIT_EVERY) -> None:
+        self.session = session
+        self.flush_every = flush_every
+        self.commit_every = commit_every
+        self.failures: List[RowFailure] = []
+        self.written = 0
+        self.flushes = 0
+        self.commits = 0
+        self._staged: List[StagedWrite] = []
+        self._savepoint: Optional[SessionTransaction] = None
+        self._uncommitted = 0
+        self._models: Set[Any] = set()
+        self._autoflush = session.autoflush
+
+    @classmethod
+    def of(cls, session: Session) -> Optional["UnitOfWork"]:
+        """Return the unit open on a session, None if there is none."""
+        info = getattr(session, "info", None)
+        return info.get(SESSION_KEY) if info is not None else None
+
+    def __enter__(self) -> "UnitOfWork":
+        if self.of(self.session) is not None:
+            raise RuntimeError("A unit of work is already open on this session")
+        self.session.info[SESSION_KEY] = self
+        self.session.autoflush = False
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.commit()
+            else:
+                self._staged.clear()
+                self._savepoint = None
+                self.session.rollback()
+        finally:
+            self.session.info.pop(SESSION_KEY, None)
+            self.session.autoflush = self._autoflush
+        logger.info(f"Unit of work: {self.written} rows in {self.flushes} flushes and "
+                    f"{self.commits} commits, {len(self.failures)} failed, "
+                    f"{time.perf_counter() - self._start:.2f}s")
+
+    def stage(self, op: str, instance: Any, values: Dict[str, Any]) -> Any:
+        """Stage a create, update or delete, flushing when the batch is full."""
+        if self._savepoint is None:
+            # Opened before the batch's first change, so a rollback undoes the
+            # whole batch in the session as well as in the database
+            self._savepoint = self.session.begin_nested()
+        write = StagedWrite(op, instance, dict(values))
+        write.apply(self.session)
+        self._staged.append(write)
+        self._models.add(type(instance))
+        if len(self._staged) >= self.flush_every:
+            self.flush()
+        return instance
+
+    def written_rows(self, model: Any, rows: int) -> None:
+        """Count rows a bulk statement wrote, committing when the threshold is reached.
+
+        Staged rows must be flushed before the statement runs, see ``flush``.
+        """
+        self._models.add(model)
+        self.written += rows
+        self._uncommitted += rows
+        self._maybe_commit()
+
+    def flush(self) -> None:
+        """Write the staged rows, isolating the failing ones in their own savepoints."""
+        staged, self._staged = self._staged, []
+        savepoint, self._savepoint = self._savepoint, None
+        if not staged:
+            return
+        try:
+            self.session.flush()
+            savepoint.commit()
+            written = len(staged)
+        except Exception:
+            savepoint.rollback()
+            written = self._replay(staged)
+        self.flushes += 1
+        self.written += written
+        self._uncommitted += written
+        self._maybe_commit()
+
+    def _replay(self, staged: List[StagedWrite]) -> int:
+        """Write a failed batch one row per savepoint, recording the failures."""
+        written = 0
+        for write in staged:
+            try:
+                with self.session.begin_nested():
+                    write.apply(self.session)
+                    self.session.flush()
+                written += 1
+            except Exception as e:
+                self.failures.append(self._failure(write, e))
+        return written
+
+    def _failure(self, write: StagedWrite, error: Exception) -> RowFailure:
+        table = type(write.instance).__tablename__
+        # Read from __dict__, the rolled back instance may be expired
+        key = {name: write.values.get(name, write.instance.__dict__.get(name))
+               for name in type(write.instance).__natural_key__}
+        message = str(getattr(error, "orig", None) or error).splitlines()[0]
+        logger.warning(f"Unit of work: {write.op} {table} {key} failed: {message}")
+        return RowFailure(write.op, table, key, write.values, message)
+
+    def _maybe_commit(self) -> None:
+        if self.commit_every is not None and self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        """Flush what is staged and commit the transaction."""
+        self.flush()
+        self.session.commit()
+        self.commits += 1
+        self._uncommitted = 0
+        for model in self._models:
+            invalidate_model(model)
+        self._models.clear()
@@ -0,0 +1,222 @@
+"""Materialized season aggregates of the game rows.
+
+``player_season_aggregates`` and ``team_season_aggregates`` hold one row per
+(player_id, season_id) and (team_id, season_id), so pages and leaderboards
+read a single row instead of a season of games. They are plain tables
+rather than Postgres materialized views, which can only be refreshed as a
+whole, and work the same on SQLite.
+
+``refresh_aggregates`` is incremental: it finds the (entity, season) keys of
+the games written since the last refresh, by ``games.updated_at``, and
+recomputes only those rows with one ``INSERT ... SELECT ... ON CONFLICT DO
+UPDATE`` per table. Rows of ``player_game_association`` are picked up with
+their game, so links added to an existing game need the game touched or a
+``full`` refresh, which also drops the keys of deleted games.
+
+The watermark is the newest ``updated_at`` exactly as stored. SQLite keeps
+timestamps as text in the format of their writer, CURRENT_TIMESTAMP without
+a fraction of a second and SQLAlchemy with microseconds, so a watermark read
+into a datetime and written back would sort after the games of its own
+second and skip the ones written later in that second.
+
+Player aggregates count games only: ``player_game_association`` links
+players to games without a box score, so there are no player totals or
+averages to aggregate; the season stats tables hold those.
+"""
+import importlib
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import (Column, Date, DateTime, Float, ForeignKey, Integer, String,
+                        UniqueConstraint, and_, case, delete, func, select,
+                        type_coerce, union_all, update)
+from sqlalchemy.orm import relationship
+
+from backend.models.NBA.models import Game, player_game_association
+from backend.models.base import UPSERT_DIALECTS, BaseModel
+from backend.utils.logger import logger
+
+
+class PlayerSeasonAggregate(BaseModel):
+    """Games played by a player in a season."""
+
+    __tablename__ = "player_season_aggregates"  # type: ignore
+    __table_args__ = (UniqueConstraint("player_id", "season_id", name="player_season_aggregate_uc"),)
+    __natural_key__ = ("player_id", "season_id")
+
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    player = relationship("Player", backref="season_aggregates")
+    season_id = Column(Integer, ForeignKey("seasons.id"), nullable=False)
+    season = relationship("Season")
+    games_played = Column(Integer, nullable=False)
+    first_game_date = Column(Date)
+    last_game_date = Column(Date)
+
+
+class TeamSeasonAggregate(BaseModel):
+    """Record and scoring totals and averages of a team in a season."""
+
+    __tablename__ = "team_season_aggregates"  # type: ignore
+    __table_args__ = (UniqueConstraint("team_id", "season_id", name="team_season_aggregate_uc"),)
+    __natural_key__ = ("team_id", "season_id")
+
+    id = Column(Integer, primary_key=True, index=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
+    team = relationship("Team", backref="season_aggregates")
+    season_id = Column(Integer, ForeignKey("seasons.id"), nullable=False)
+    season = relationship("Season")
+    games = Column(Integer, nullable=False)
+    wins = Column(Integer, nullable=False)
+    losses = Column(Integer, nullable=False)
+    points_for = Column(Integer, nullable=False)
+    points_against = Column(Integer, nullable=False)
+    points_for_per_game = Column(Float)
+    points_against_per_game = Column(Float)
+
+
+class AggregateRefresh(BaseModel):
+    """Watermark of the newest game each aggregate table has seen."""
+
+    __tablename__ = "aggregate_refreshes"  # type: ignore
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    watermark = Column(DateTime)
+
+
+@dataclass
+class RefreshStats:
+    """Rows recomputed by a refresh of one aggregate table."""
+
+    table: str
+    rows: int
+    seconds: float
+
+
+def _team_games():
+    """One row per team and finished game, from the home and the away side."""
+    games = Game.__table__
+    finished = and_(games.c.home_team_score.isnot(None),
+                    games.c.away_team_score.isnot(None))
+    sides = []
+    for team, scored, allowed in (
+            (games.c.home_team_id, games.c.home_team_score, games.c.away_team_score),
+            (games.c.away_team_id, games.c.away_team_score, games.c.home_team_score)):
+        sides.append(select(
+            team.label("team_id"), games.c.season_id,
+            scored.label("points_for"), allowed.label("points_against"),
+            case((scored > allowed, 1), else_=0).label("win"),
+            games.c.updated_at,
+        ).where(finished, team.isnot(None)))
+    return union_all(*sides).subquery("team_games")
+
+
+def _player_games():
+    games = Game.__table__
+    links = player_game_association
+    return select(
+        links.c.player_id, games.c.season_id, games.c.date, games.c.updated_at,
+    ).select_from(links.join(games, links.c.game_id == games.c.id)).where(
+        links.c.player_id.isnot(None)).subquery("player_games")
+
+
+def _team_rows(team_games):
+    return select(
+        team_games.c.team_id, team_games.c.season_id,
+        func.count().label("games"),
+        func.sum(team_games.c.win).label("wins"),
+        (func.count() - func.sum(team_games.c.win)).label("losses"),
+        func.sum(team_games.c.points_for).label("points_for"),
+        func.sum(team_games.c.points_against).label("points_against"),
+        func.avg(team_games.c.points_for).label("points_for_per_game"),
+        func.avg(team_games.c.points_against).label("points_against_per_game"),
+    )
+
+
+def _player_rows(player_games):
+    return select(
+        player_games.c.player_id, player_games.c.season_id,
+        func.count().label("games_played"),
+        func.min(func.date(player_games.c.date)).label("first_game_date"),
+        func.max(func.date(player_games.c.date)).label("last_game_date"),
+    )
+
+
+# Aggregate model, source subquery builder, aggregate select builder and key column
+AGGREGATES = {
+    "team": (TeamSeasonAggregate, _team_games, _team_rows, "team_id"),
+    "player": (PlayerSeasonAggregate, _player_games, _player_rows, "player_id"),
+}
+
+
+def _as_stored(value):
+    """Read, compare and write a timestamp as the database stores it, see the module docstring."""
+    return type_coerce(value, String)
+
+
+def _refresh(session, name: str, full: bool) -> RefreshStats:
+    start = time.perf_counter()
+    model, source_builder, rows_builder, key = AGGREGATES[name]
+    table = model.__table__
+    refreshes = AggregateRefresh.__table__
+    if session.scalar(select(refreshes.c.id).where(refreshes.c.name == name)) is None:
+        session.add(AggregateRefresh(name=name))
+        session.flush()
+    source = source_builder()
+    watermark = None if full else session.scalar(
+        select(_as_stored(refreshes.c.watermark)).where(refreshes.c.name == name))
+    new_watermark = session.scalar(select(_as_stored(func.max(source.c.updated_at))))
+
+    rows = rows_builder(source).where(source.c.season_id.isnot(None))
+    if full:
+        session.execute(delete(table))
+    elif watermark is not None:
+        # Only the keys touched since the last refresh; >= because timestamps
+        # may have second resolution, recomputing a key twice is harmless
+        changed = select(source.c[key], source.c.season_id).where(
+            _as_stored(source.c.updated_at) >= watermark).distinct().subquery("changed")
+        rows = rows.join(changed, and_(changed.c[key] == source.c[key],
+                                       changed.c.season_id == source.c.season_id))
+    rows = rows.group_by(source.c[key], source.c.season_id)
+
+    now = func.now()
+    rows = rows.add_columns(now.label("created_at"), now.label("updated_at"))
+    columns = [c.name for c in rows.selected_columns]
+    dialect = session.get_bind().dialect.name
+    statement = importlib.import_module(UPSERT_DIALECTS[dialect]).insert(table)
+    statement = statement.from_select(columns, rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(model.__natural_key__),
+        set_={c: statement.excluded[c] for c in columns
+              if c not in model.__natural_key__ and c != "created_at"})
+    count = session.execute(statement).rowcount
+    if new_watermark is not None:
+        session.execute(update(refreshes).where(refreshes.c.name == name)
+                        .values(watermark=_as_stored(new_watermark)))
+    return RefreshStats(table.name, count, time.perf_counter() - start)
+
+
+def refresh_aggregates(session, full: bool = False,
+                       names: Optional[List[str]] = None) -> List[RefreshStats]:
+    """
+    Recompute the aggregate rows of the games written since the last refresh.
+
+    Args:
+        session: The database session, committed on success.
+        full: Rebuild the tables from scratch instead.
+        names: Aggregates to refresh, 'team' and 'player' by default.
+
+    Returns:
+        The rows recomputed per table.
+    """
+    try:
+        stats = [_refresh(session, name, full) for name in names or AGGREGATES]
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    for stat in stats:
+        logger.info(f"{stat.table}: refreshed {stat.rows} rows in {stat.seconds:.2f}s")
+    return stats
@@ -2,13 +2,29 @@
 import datetime
 
 from sqlalchemy import (Boolean, Column, Constraint, Date, DateTime, Float,
-                        ForeignKey, ForeignKeyConstraint, Integer, String,
+                        ForeignKey, ForeignKeyConstraint, Index, Integer, String,
                         Table, Text, UniqueConstraint)
-from sqlalchemy.orm import backref, relationship
+from sqlalchemy.orm import backref, joinedload, relationship, selectinload
 
 from backend.database.db import get_db
 from backend.models.base import BaseModel
 
+
+def season_stat_indexes(table: str, *stats: str):
+    """
+    Return the natural key constraint and leaderboard indexes of a stats table.
+
+    One row per player and season, and for every stat a (season_id, stat,
+    player_id) index, which covers "top players of a season by stat" so it
+    is answered from the index alone.
+    """
+    return (
+        UniqueConstraint("player_id", "season_id", name=f"{table}_player_season_uc"),
+        *(Index(f"ix_{table}_season_{stat}", "season_id", stat, "player_id")
+          for stat in stats),
+    )
+
+
 # Define the association table for the many-to-many relationship between teams and players
 team_player_association = Table(
     "team_player_association",
@@ -124,7 +140,7 @@ class Game(BaseModel):
         "Team", backref="away_games", foreign_keys=[away_team_id])
     home_team_score = Column(Integer)
     away_team_score = Column(Integer)
-    season_id = Column(Integer, ForeignKey("seasons.id"))
+    season_id = Column(Integer, ForeignKey("seasons.id"), index=True)
     season = relationship("Season", back_populates="games")
     players = relationship(
         "Player", secondary=player_game_association, back_populates="games")
@@ -153,6 +169,10 @@ class PlayerBasicStats(BaseModel):
     """NBA player basic stats model."""
 
     __tablename__ = "player_basic_stats"  # type: ignore
+    __table_args__ = season_stat_indexes(
+        "player_basic_stats", "points_per_game", "total_rebounds_per_game",
+        "assists_per_game")
+    __natural_key__ = ("player_id", "season_id")
 
     id = Column(Integer, primary_key=True, index=True)
     player_id = Column(Integer, ForeignKey("players.id"))
@@ -185,6 +205,10 @@ class PlayerAdvancedStats(BaseModel):
     """NBA player advanced stats model."""
 
     __tablename__ = "player_advanced_stats"  # type: ignore
+    __table_args__ = season_stat_indexes(
+        "player_advanced_stats", "win_shares", "box_plus_minus",
+        "value_over_replacement_player")
+    __natural_key__ = ("player_id", "season_id")
 
     id = Column(Integer, primary_key=True, index=True)
     player_id = Column(Integer, ForeignKey("players.id"))
@@ -217,6 +241,9 @@ class PlayerShootingStats(BaseModel):
     """NBA player shooting stats model."""
 
     __tablename__ = "player_shooting_stats"  # type: ignore
+    __table_args__ = season_stat_indexes(
+        "player_shooting_stats", "three_point_field_goal_percentage")
+    __natural_key__ = ("player_id", "season_id")
 
     id = Column(Integer, primary_key=True, index=True)
     player_id = Column(Integer, ForeignKey("players.id"))
@@ -241,3 +268,38 @@ class PlayerShootingStats(BaseModel):
     free_throws_assisted_percentage = Column(Float)
     free_throws_dunk_percentage = Column(Float)
     free_throws_layup_percentage = Column(Float)
+
+
+# Loading profiles, applied with e.g. Team.select_with("page") or paginate(profile=...)
+Player.add_loading_profile("card", lambda: [
+    joinedload(Player.team),
+    selectinload(Player.seasons),
+])
+Player.add_loading_profile("stats", lambda: [
+    selectinload(Player.basic_stats).joinedload(PlayerBasicStats.season),
+    selectinload(Player.advanced_stats).joinedload(PlayerAdvancedStats.season),
+    selectinload(Player.shooting_stats).joinedload(PlayerShootingStats.season),
+])
+Team.add_loading_profile("roster", lambda: [
+    selectinload(Team.players),
+])
+Team.add_loading_profile("page", lambda: [
+    selectinload(Team.players).options(
+        selectinload(Player.seasons),
+        selectinload(Player.basic_stats).joinedload(PlayerBasicStats.season),
+    ),
+])
+Team.add_loading_profile("schedule", lambda: [
+    selectinload(Team.home_games).joinedload(Game.away_team),
+    selectinload(Team.away_games).joinedload(Game.home_team),
+])
+Game.add_loading_profile("box_score", lambda: [
+    joinedload(Game.home_team),
+    joinedload(Game.away_team),
+    joinedload(Game.season),
+    selectinload(Game.players),
+])
+Season.add_loading_profile("overview", lambda: [
+    selectinload(Season.teams),
+    selectinload(Season.games),
+])
@@ -1,26 +1,21 @@
-import os
-import sys
-from pathlib import Path
-from dotenv import load_dotenv
-import pandas as pd
-import polars as pl
-import numpy as np
-import requests
-import json
-from datetime import datetime
 from typing import List, Dict, Union, Any
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, MetaData, DateTime, func
-from nba_api.stats.endpoints import LeagueDashPlayerStats, LeagueDashTeamStats, CommonTeamRoster, CommonPlayerInfo, PlayerGameLog, TeamGameLog, CommonAllPlayers, CommonTeamYears, TeamInfoCommon
-from nba_api.stats.static import teams, players
 from loguru import logger
-from backend.core.path_config import PKG_ROOT, DATA_PATH, NBA_DATA_PATH
+from backend.data.nba.fetch import endpoint_request, get_engine, result_rows
 from backend.models.base import BaseModel
 
 
 log = logger.bind(name=__file__)
 
 
+def _endpoint(name: str) -> Any:
+    """Return an nba_api endpoint class, importing the endpoints on first use."""
+    from nba_api.stats import endpoints
+
+    return getattr(endpoints, name)
+
+
 class NBA_Player(BaseModel):
     """Model for the NBA player table.
 
@@ -54,17 +49,54 @@ class NBA_Player(BaseModel):
     @classmethod
     def get_all_players(cls) -> List[Dict[str, Union[str, int]]]:
         """Return a list of all the players that have played in the NBA."""
-        all_players = CommonAllPlayers().get_dict()
+        all_players = get_engine().fetch(*endpoint_request(_endpoint('CommonAllPlayers')))
         return all_players.get('resultSets')[0].get('rowSet')
 
     @classmethod
     def get_player_info(cls, player_id: int) -> Dict[str, Union[str, int]]:
         """Return the player info for the given player_id."""
-        player_info = CommonPlayerInfo(player_id=player_id).get_dict()
+        player_info = get_engine().fetch(
+            *endpoint_request(_endpoint('CommonPlayerInfo'), player_id=player_id))
         return player_info.get('resultSets')[0].get('rowSet')[0]
 
     @classmethod
     def get_player_game_log(cls, player_id: int) -> List[Dict[str, Union[str, int]]]:
         """Return the game log for the given player_id."""
-        game_log = PlayerGameLog(player_id=player_id).get_dict()
+        game_log = get_engine().fetch(
+            *endpoint_request(_endpoint('PlayerGameLog'), player_id=player_id))
         return game_log.get('resultSets')[0].get('rowSet')
+
+    @classmethod
+    def get_players_info(cls, player_ids: List[int]) -> Dict[int, Dict[str, Union[str, int]]]:
+        """Return the player info of every player_id, fetched concurrently.
+
+        Players whose request failed after all retries are left out.
+        """
+        results = get_engine().fetch_many(
+            endpoint_request(_endpoint('CommonPlayerInfo'), player_id=player_id)
+            for player_id in player_ids)
+        players_info = {}
+        for player_id, result in zip(player_ids, results):
+            if not result.ok:
+                log.error(f"CommonPlayerInfo {player_id} failed: {result.error}")
+                continue
+            players_info[player_id] = result_rows(result.data)[0]
+        return players_info
+
+    @classmethod
+    def get_player_game_logs(cls, player_ids: List[int], **kwargs) -> Dict[int, List[Dict[str, Union[str, int]]]]:
+        """Return the game log of every player_id, fetched concurrently.
+
+        Keyword arguments are passed to PlayerGameLog, e.g. season='2023-24'.
+        Players whose request failed after all retries are left out.
+        """
+        results = get_engine().fetch_many(
+            endpoint_request(_endpoint('PlayerGameLog'), player_id=player_id, **kwargs)
+            for player_id in player_ids)
+        game_logs = {}
+        for player_id, result in zip(player_ids, results):
+            if not result.ok:
+                log.error(f"PlayerGameLog {player_id} failed: {result.error}")
+                continue
+            game_logs[player_id] = result_rows(result.data)
+        return game_logs
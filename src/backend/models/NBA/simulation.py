@@ -0,0 +1,306 @@
+"""Monte Carlo simulation of the rest of a season from the game rows.
+
+The games of a season with scores are used to fit a team strength model,
+home margin = home advantage + rating(home) - rating(away) + noise, as a
+Bayesian linear regression with ratings shrunk towards 0 and the home
+advantage towards ``PRIOR_HOME_ADVANTAGE``. Every simulation draws its own
+ratings and home advantage from the posterior, so the uncertainty of the
+ratings shows in the odds, then draws the margin of every game not played
+yet. Before any game is played the model is the prior.
+
+Simulations run in chunks of arrays, (simulations, games), and the wins of
+every team are one matrix product with the schedule. Teams are seeded by
+wins within their conference, ties broken at random rather than by the NBA
+tiebreakers. Seeds 7 to 10 play the play-in: 7 v 8, whose winner is the 7
+seed, and 9 v 10, whose winner plays the loser of 7 v 8 for the 8 seed.
+
+The simulations are split into shards of ``shard_size`` run on a process
+pool. Each shard gets its own child of ``SeedSequence(seed)``, so results
+depend on the seed and the shard size only, not on the number of workers:
+
+    schedule = load_schedule(session, season_id)
+    result = simulate_season(schedule, simulations=200_000, seed=7)
+    result.table()
+"""
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+from sqlalchemy import select
+
+from backend.models.NBA.models import Game, Team
+from backend.utils.logger import logger
+
+# Prior of the team model, in points of home margin
+PRIOR_RATING_SD = 4.0
+PRIOR_HOME_ADVANTAGE = 2.5
+PRIOR_HOME_ADVANTAGE_SD = 1.5
+DEFAULT_MARGIN_SD = 12.5
+
+# Games needed per team before the margin deviation is estimated from the residuals
+MIN_GAMES_PER_TEAM = 10
+
+# Seeds playing the play-in, the seeds above make the playoffs directly
+PLAY_IN_SEEDS = (7, 8, 9, 10)
+
+# Simulations per shard, and per array chunk within a shard
+DEFAULT_SHARD_SIZE = 25_000
+DEFAULT_CHUNK_SIZE = 5_000
+
+
+@dataclass
+class Schedule:
+    """The games of a season, as indices into ``team_ids``."""
+
+    team_ids: np.ndarray
+    conferences: np.ndarray
+    home: np.ndarray
+    away: np.ndarray
+    # Home minus away points, nan for the games not played yet
+    margin: np.ndarray
+
+    @property
+    def played(self) -> np.ndarray:
+        return ~np.isnan(self.margin)
+
+    @classmethod
+    def from_games(cls, games: Iterable[Tuple[int, int, Optional[int], Optional[int]]],
+                   conferences: Optional[Dict[int, Optional[str]]] = None) -> "Schedule":
+        """
+        Build a schedule from (home_team_id, away_team_id, home_score, away_score) rows.
+
+        Args:
+            games: The rows, scores None for the games not played yet.
+            conferences: Conference of every team id; teams without one are
+                seeded together.
+        """
+        games = list(games)
+        team_ids = np.array(sorted({team for game in games for team in game[:2]}), dtype=np.int64)
+        index = {team: i for i, team in enumerate(team_ids.tolist())}
+        conferences = conferences or {}
+        return cls(
+            team_ids=team_ids,
+            conferences=np.array([conferences.get(team) or "" for team in team_ids.tolist()]),
+            home=np.array([index[game[0]] for game in games], dtype=np.int64),
+            away=np.array([index[game[1]] for game in games], dtype=np.int64),
+            margin=np.array([np.nan if game[2] is None or game[3] is None
+                             else game[2] - game[3] for game in games], dtype=np.float64),
+        )
+
+
+def load_schedule(session, season_id: int) -> Schedule:
+    """Load the games of a season and the conferences of their teams."""
+    games = session.execute(
+        select(Game.home_team_id, Game.away_team_id, Game.home_team_score, Game.away_team_score)
+        .where(Game.season_id == season_id, Game.home_team_id.is_not(None),
+               Game.away_team_id.is_not(None))
+    ).all()
+    team_ids = {team for game in games for team in game[:2]}
+    conferences = dict(session.execute(
+        select(Team.id, Team.conference).where(Team.id.in_(team_ids))).all())
+    return Schedule.from_games(games, conferences)
+
+
+@dataclass
+class TeamModel:
+    """Posterior of the team ratings and home advantage."""
+
+    ratings: np.ndarray
+    home_advantage: float
+    margin_sd: float
+    # Covariance of (ratings..., home_advantage)
+    covariance: np.ndarray
+
+    @classmethod
+    def fit(cls, schedule: Schedule) -> "TeamModel":
+        teams = len(schedule.team_ids)
+        played = schedule.played
+        home, away, margin = schedule.home[played], schedule.away[played], schedule.margin[played]
+        design = np.zeros((len(margin), teams + 1))
+        design[np.arange(len(margin)), home] = 1.0
+        design[np.arange(len(margin)), away] = -1.0
+        design[:, teams] = 1.0
+        prior_mean = np.zeros(teams + 1)
+        prior_mean[teams] = PRIOR_HOME_ADVANTAGE
+        prior_precision = np.diag(
+            [PRIOR_RATING_SD ** -2] * teams + [PRIOR_HOME_ADVANTAGE_SD ** -2])
+
+        margin_sd = DEFAULT_MARGIN_SD
+        for _ in range(2):
+            # Refit once with the deviation of the residuals of the first fit
+            precision = prior_precision + design.T @ design / margin_sd ** 2
+            covariance = np.linalg.inv(precision)
+            mean = covariance @ (prior_precision @ prior_mean + design.T @ margin / margin_sd ** 2)
+            if len(margin) < MIN_GAMES_PER_TEAM * teams / 2:
+                break
+            margin_sd = float(np.sqrt(np.mean((margin - design @ mean) ** 2)))
+        return cls(mean[:teams], float(mean[teams]), margin_sd, covariance)
+
+    def draw(self, rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Draw n (ratings, home advantage) samples of the posterior."""
+        mean = np.append(self.ratings, self.home_advantage)
+        samples = rng.multivariate_normal(mean, self.covariance, size=n, method="cholesky")
+        return samples[:, :-1].astype(np.float32), samples[:, -1].astype(np.float32)
+
+
+@dataclass
+class SimulationResult:
+    """Counts of the simulated outcomes of every team, summed over simulations."""
+
+    team_ids: np.ndarray
+    conferences: np.ndarray
+    simulations: int
+    wins: np.ndarray
+    # seeds[team, seed - 1]: simulations ending with the seed
+    seeds: np.ndarray
+    play_in: np.ndarray
+    playoffs: np.ndarray
+
+    @classmethod
+    def empty(cls, schedule: Schedule) -> "SimulationResult":
+        teams = len(schedule.team_ids)
+        max_seed = max(np.unique(schedule.conferences, return_counts=True)[1])
+        return cls(schedule.team_ids, schedule.conferences, 0, np.zeros(teams, dtype=np.int64),
+                   np.zeros((teams, max_seed), dtype=np.int64),
+                   np.zeros(teams, dtype=np.int64), np.zeros(teams, dtype=np.int64))
+
+    def merge(self, other: "SimulationResult") -> "SimulationResult":
+        return SimulationResult(self.team_ids, self.conferences,
+                                self.simulations + other.simulations, self.wins + other.wins,
+                                self.seeds + other.seeds, self.play_in + other.play_in,
+                                self.playoffs + other.playoffs)
+
+    def table(self) -> pl.DataFrame:
+        """Return the mean wins and the seed, play-in and playoff probabilities of every team."""
+        n = max(self.simulations, 1)
+        return pl.DataFrame({
+            "team_id": self.team_ids,
+            "conference": self.conferences,
+            "wins": self.wins / n,
+            **{f"seed_{seed + 1}": self.seeds[:, seed] / n for seed in range(self.seeds.shape[1])},
+            "play_in": self.play_in / n,
+            "playoffs": self.playoffs / n,
+        }).sort("conference", "wins", descending=[False, True])
+
+
+def _home_wins(rng: np.random.Generator, ratings: np.ndarray, home_advantage: np.ndarray,
+               margin_sd: float, home: np.ndarray, away: np.ndarray) -> np.ndarray:
+    """Draw the winners of games, per simulation; home and away are (sims, games) or (games,)."""
+    rows = np.arange(len(ratings))[:, None]
+    expected = (home_advantage[:, None] + ratings[rows, home] - ratings[rows, away])
+    noise = rng.standard_normal(expected.shape, dtype=np.float32)
+    return expected + margin_sd * noise > 0
+
+
+def _play_in(rng: np.random.Generator, ratings: np.ndarray, home_advantage: np.ndarray,
+             margin_sd: float, by_seed: np.ndarray) -> None:
+    """Replace seeds 7 to 10 of (sims, seeds) team indices by the play-in outcome."""
+    seventh, eighth, ninth, tenth = (by_seed[:, seed - 1].copy() for seed in PLAY_IN_SEEDS)
+    first = _home_wins(rng, ratings, home_advantage, margin_sd,
+                       np.stack([seventh, ninth], 1), np.stack([eighth, tenth], 1))
+    winner_78 = np.where(first[:, 0], seventh, eighth)
+    loser_78 = np.where(first[:, 0], eighth, seventh)
+    winner_910 = np.where(first[:, 1], ninth, tenth)
+    loser_910 = np.where(first[:, 1], tenth, ninth)
+    final = _home_wins(rng, ratings, home_advantage, margin_sd,
+                       loser_78[:, None], winner_910[:, None])[:, 0]
+    by_seed[:, 6] = winner_78
+    by_seed[:, 7] = np.where(final, loser_78, winner_910)
+    by_seed[:, 8] = np.where(final, winner_910, loser_78)
+    by_seed[:, 9] = loser_910
+
+
+def simulate_chunk(schedule: Schedule, model: TeamModel, simulations: int,
+                   rng: np.random.Generator, play_in: bool = True) -> SimulationResult:
+    """Simulate the games not played yet ``simulations`` times, as arrays."""
+    result = SimulationResult.empty(schedule)
+    teams = len(schedule.team_ids)
+    played = schedule.played
+    home, away = schedule.home[~played], schedule.away[~played]
+    base_wins = np.bincount(np.where(schedule.margin[played] > 0, schedule.home[played],
+                                     schedule.away[played]), minlength=teams)
+
+    ratings, home_advantage = model.draw(rng, simulations)
+    home_won = _home_wins(rng, ratings, home_advantage, model.margin_sd,
+                          home, away).astype(np.float32)
+    # A home win adds a win to the home team, otherwise to the away team
+    swing = np.zeros((len(home), teams), dtype=np.float32)
+    swing[np.arange(len(home)), home] += 1.0
+    swing[np.arange(len(home)), away] -= 1.0
+    wins = home_won @ swing + np.bincount(away, minlength=teams) + base_wins
+    wins = np.rint(wins).astype(np.int64)
+
+    result.simulations = simulations
+    result.wins = wins.sum(axis=0)
+    # Random fractions below 1 break ties of wins
+    keys = wins + rng.random(wins.shape, dtype=np.float32)
+    for conference in np.unique(schedule.conferences):
+        members = np.flatnonzero(schedule.conferences == conference)
+        by_seed = members[np.argsort(-keys[:, members], axis=1)]
+        if play_in and len(members) >= max(PLAY_IN_SEEDS):
+            in_play_in = by_seed[:, PLAY_IN_SEEDS[0] - 1:PLAY_IN_SEEDS[-1]]
+            result.play_in += np.bincount(in_play_in.ravel(), minlength=teams)
+            _play_in(rng, ratings, home_advantage, model.margin_sd, by_seed)
+            playoff_seeds = PLAY_IN_SEEDS[1]
+        else:
+            playoff_seeds = min(PLAY_IN_SEEDS[1], len(members))
+        max_seed = result.seeds.shape[1]
+        cells = by_seed * max_seed + np.arange(len(members))
+        result.seeds += np.bincount(cells.ravel(), minlength=teams * max_seed) \
+            .reshape(teams, max_seed)
+        result.playoffs += np.bincount(by_seed[:, :playoff_seeds].ravel(), minlength=teams)
+    return result
+
+
+def _run_shard(args: Tuple[Schedule, TeamModel, int, np.random.SeedSequence, int, bool]
+               ) -> SimulationResult:
+    schedule, model, simulations, seed, chunk_size, play_in = args
+    rng = np.random.default_rng(seed)
+    result = SimulationResult.empty(schedule)
+    for start in range(0, simulations, chunk_size):
+        result = result.merge(simulate_chunk(schedule, model, min(chunk_size, simulations - start),
+                                             rng, play_in))
+    return result
+
+
+def simulate_season(schedule: Schedule, simulations: int = 100_000, seed: int = 0,
+                    workers: Optional[int] = None, shard_size: int = DEFAULT_SHARD_SIZE,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE, play_in: bool = True,
+                    model: Optional[TeamModel] = None) -> SimulationResult:
+    """
+    Simulate the rest of a season and count the seeds and playoff spots of every team.
+
+    Args:
+        schedule: The season's games, see ``load_schedule``.
+        simulations: Number of simulated seasons.
+        seed: Seed of the ``SeedSequence`` the shards are spawned from.
+        workers: Processes to run the shards on, all CPUs by default; 1 runs
+            them in this process.
+        shard_size: Simulations per shard, a shard being run by one process.
+        chunk_size: Simulations per array chunk, bounding the memory of a shard.
+        play_in: Play the play-in for seeds 7 to 10.
+        model: Team model to draw from, fitted to the played games by default.
+    """
+    start = time.perf_counter()
+    model = model or TeamModel.fit(schedule)
+    shards = math.ceil(simulations / shard_size)
+    sizes = [min(shard_size, simulations - i * shard_size) for i in range(shards)]
+    jobs = [(schedule, model, size, child, chunk_size, play_in)
+            for size, child in zip(sizes, np.random.SeedSequence(seed).spawn(shards))]
+    workers = min(workers or os.cpu_count() or 1, shards)
+    if workers <= 1:
+        results: List[SimulationResult] = [_run_shard(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_shard, jobs))
+    result = SimulationResult.empty(schedule)
+    for shard in results:
+        result = result.merge(shard)
+    logger.info(f"Simulated {simulations} seasons of {int((~schedule.played).sum())} games "
+                f"in {shards} shards on {workers} workers in {time.perf_counter() - start:.2f}s")
+    return result
@@ -1,19 +1,37 @@
 """Base model for all models to inherit from."""
+import base64
+import datetime
+import importlib
+import itertools
+import json
 import os
 import re
-from typing import List, Tuple, Any, Callable, Self
+import time
+from dataclasses import dataclass
+from typing import Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Tuple, Any, Callable, Self, TypeVar
 
-from sqlalchemy import Column, DateTime, Integer, MetaData, Table, func
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, and_, delete, func, insert, or_
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Relationship
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from sqlalchemy.orm import DeclarativeBase, declared_attr, relationship
+from sqlalchemy.orm import DeclarativeBase, declared_attr, raiseload, relationship
 from sqlalchemy.sql import select
 
+from backend.database.query_cache import cached_query, invalidate_model
+from backend.database.unit_of_work import UnitOfWork
 from backend.utils.logger import logger
 
 metadata = MetaData()
 
+# Rows per statement and transaction of the bulk operations
+DEFAULT_BATCH_SIZE = 5000
+
+# Dialects whose INSERT construct supports ON CONFLICT, imported when used
+UPSERT_DIALECTS = {
+    "postgresql": "sqlalchemy.dialects.postgresql",
+    "sqlite": "sqlalchemy.dialects.sqlite",
+}
+
 # Player and team association table
 player_team_association = Table(
     'player_team_association',
@@ -50,42 +68,108 @@ def log_wrap(func) -> Callable[..., Any | None]:
     return wrapper
 
 
+@dataclass
+class BatchStats:
+    """Rows written by one batch of a bulk operation and how long it took."""
+
+    batch: int
+    rows: int
+    seconds: float
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class Page(Generic[T]):
+    """One page of a keyset paginated query and the token of the next one."""
+
+    items: List[T]
+    next_token: Optional[str] = None
+
+
+def _encode_token(column: str, descending: bool, value: Any, id: int) -> str:
+    """Return the opaque continuation token of the last row of a page."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat()
+    payload = json.dumps([column, descending, value, id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_token(token: str, column: Column) -> Tuple[str, bool, Any, int]:
+    """Decode a continuation token, converting its value back to the column type."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        name, descending, value, id = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError as e:
+        raise ValueError(f"Invalid continuation token: {token}") from e
+    python_type = column.type.python_type
+    if isinstance(value, str) and python_type in (datetime.date, datetime.datetime):
+        value = python_type.fromisoformat(value)
+    return name, descending, value, id
+
+
+def _batches(rows: Iterable[Dict[str, Any]], batch_size: int) -> Iterable[List[Dict[str, Any]]]:
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, batch_size)):
+        yield batch
+
+
 class BaseModel(DeclarativeBase):
     """Base model for all models to inherit from."""
     __abstract__ = True
 
+    # Columns identifying a row for upserts, overridden by models with a natural key
+    __natural_key__: Tuple[str, ...] = ("id",)
+
+    # Named eager loading strategies, registered with add_loading_profile
+    __loading_profiles__: Dict[str, Callable[[], Sequence[Any]]] = {}
+
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     @log_wrap
     def create(self, session, **kwargs) -> Self:
-        """Create a new record in the database."""
+        """Create a new record in the database, staged if a unit of work is open."""
+        unit = UnitOfWork.of(session)
+        if unit is not None:
+            return unit.stage("create", self, kwargs)
         for key, value in kwargs.items():
             setattr(self, key, value)
         session.add(self)
         session.commit()
+        invalidate_model(self.__class__)
         return self
 
     @log_wrap
     def update(self, session, **kwargs) -> Self:
-        """Update a record in the database."""
+        """Update a record in the database, staged if a unit of work is open."""
+        unit = UnitOfWork.of(session)
+        if unit is not None:
+            return unit.stage("update", self, kwargs)
         for key, value in kwargs.items():
             setattr(self, key, value)
         session.commit()
+        invalidate_model(self.__class__)
         return self
 
     @log_wrap
     def delete(self, session) -> Self:
-        """Delete a record in the database."""
+        """Delete a record in the database, staged if a unit of work is open."""
+        unit = UnitOfWork.of(session)
+        if unit is not None:
+            return unit.stage("delete", self, {})
         session.delete(self)
         session.commit()
+        invalidate_model(self.__class__)
         return self
 
     @log_wrap
     def get(self, session, id: int) -> Self:
-        """Get a record from the database."""
-        return session.query(self.__class__).filter_by(id=id).first()
+        """Get a record from the database, through the query cache when it is on."""
+        return cached_query(session, self.__class__, "get", {"id": id},
+                            lambda: session.query(self.__class__).filter_by(id=id).first())
 
     @log_wrap
     def get_all(self, session) -> List[Self]:
@@ -119,7 +203,8 @@ class BaseModel(DeclarativeBase):
         Returns:
         - List['BaseModel']: List of instances matching the filter
         """
-        return session.query(self.__class__).filter_by(**kwargs).all()
+        return cached_query(session, self.__class__, "filter", kwargs,
+                            lambda: session.query(self.__class__).filter_by(**kwargs).all())
 
     @log_wrap
     def get_all_with_filter_and_limit(self, session, limit: int, **kwargs) -> List['BaseModel']:
@@ -133,7 +218,278 @@ class BaseModel(DeclarativeBase):
         Returns:
             A list of BaseModel instances that meet the filter criteria.
         """
-        return session.query(self.__class__).filter_by(**kwargs).limit(limit).all()
+        return cached_query(
+            session, self.__class__, "filter_limit", {**kwargs, "__limit__": limit},
+            lambda: session.query(self.__class__).filter_by(**kwargs).limit(limit).all())
+
+    @classmethod
+    def add_loading_profile(cls, name: str, options: Callable[[], Sequence[Any]]) -> None:
+        """
+        Register a named set of loader options for queries on this model.
+
+        ``options`` is called when the profile is first used, so it can refer
+        to backrefs, which only exist once the mappers are configured.
+        """
+        if "__loading_profiles__" not in cls.__dict__:
+            cls.__loading_profiles__ = {}
+        cls.__loading_profiles__[name] = options
+
+    @classmethod
+    def loading_profile(cls, name: str) -> Sequence[Any]:
+        """Return the loader options of a profile registered on this model."""
+        profiles = cls.__dict__.get("__loading_profiles__", {})
+        if name not in profiles:
+            raise KeyError(f"{cls.__name__} has no loading profile {name!r}, "
+                           f"available: {sorted(profiles)}")
+        return list(profiles[name]())
+
+    @classmethod
+    def select_with(cls, profile: Optional[str] = None, strict: bool = False, **kwargs):
+        """
+        Build a select of this model with a loading profile applied.
+
+        Args:
+            profile: Name of a loading profile.
+            strict: Raise on any relationship the profile does not load,
+                instead of silently emitting a query per object.
+            **kwargs: Filtering criteria.
+        """
+        query = select(cls).filter_by(**kwargs)
+        if profile is not None:
+            query = query.options(*cls.loading_profile(profile))
+        if strict:
+            query = query.options(raiseload("*"))
+        return query
+
+    @classmethod
+    def _keyset_column(cls, name: str) -> Column:
+        """Return a column that keyset pagination can seek on."""
+        column = cls.__table__.columns.get(name)
+        if column is None:
+            raise ValueError(f"{cls.__name__} has no column {name}")
+        indexed = column.primary_key or column.index or column.unique or any(
+            index.columns[0] is column for index in cls.__table__.indexes)
+        if not indexed:
+            raise ValueError(f"{cls.__tablename__}.{name} is not indexed")
+        return column
+
+    @classmethod
+    def paginate(cls, session, limit: int = 100, token: Optional[str] = None,
+                 order_by: str = "id", descending: bool = False,
+                 profile: Optional[str] = None, **kwargs) -> Page[Self]:
+        """
+        Get one page of records, seeking past the previous page instead of using OFFSET.
+
+        Rows are ordered by ``order_by`` with the primary key as tie breaker,
+        so every page costs one index range scan however deep it is.
+
+        Args:
+            session: The database session.
+            limit: Rows per page.
+            token: ``next_token`` of the previous page, None for the first page.
+            order_by: Primary key or indexed, non-null column to order by.
+            descending: Order from the highest value down.
+            profile: Loading profile applied to the page's rows.
+            **kwargs: Filtering criteria.
+
+        Returns:
+            The page, whose ``next_token`` is None on the last page.
+        """
+        column = cls._keyset_column(order_by)
+        key = cls.__table__.c.id
+        query = cls.select_with(profile, **kwargs)
+        if token is not None:
+            name, token_descending, value, last_id = _decode_token(token, column)
+            if (name, token_descending) != (order_by, descending):
+                raise ValueError(f"Token was issued for ordering by {name}")
+            if column is key:
+                seek = key < last_id if descending else key > last_id
+            elif descending:
+                seek = or_(column < value, and_(column == value, key < last_id))
+            else:
+                seek = or_(column > value, and_(column == value, key > last_id))
+            query = query.where(seek)
+        order = [column.desc(), key.desc()] if descending else [column, key]
+        if column is key:
+            order = order[:1]
+        items = session.scalars(query.order_by(*order).limit(limit + 1)).all()
+        if len(items) <= limit:
+            return Page(list(items))
+        last = items[limit - 1]
+        return Page(list(items[:limit]), _encode_token(
+            order_by, descending, getattr(last, column.key), last.id))
+
+    @classmethod
+    def stream(cls, session, batch_size: int = 1000, order_by: Optional[str] = None,
+               profile: Optional[str] = None, **kwargs) -> Iterator[Self]:
+        """
+        Iterate over all matching records in constant memory.
+
+        Rows are fetched ``batch_size`` at a time through a server-side cursor
+        where the driver supports one, instead of loading the whole result.
+
+        Args:
+            session: The database session.
+            batch_size: Rows fetched per round trip.
+            order_by: Optional column to order by.
+            profile: Loading profile applied per batch, selectin strategies only.
+            **kwargs: Filtering criteria.
+        """
+        query = cls.select_with(profile, **kwargs)
+        if order_by is not None:
+            query = query.order_by(cls.__table__.c[order_by])
+        result = session.execute(query.execution_options(yield_per=batch_size))
+        for partition in result.scalars().partitions():
+            yield from partition
+
+    @classmethod
+    def to_arrow(cls, bind, columns: Optional[Sequence[str]] = None, **kwargs):
+        """
+        Read this model's rows straight into an Arrow table, without ORM objects.
+
+        Args:
+            bind: Engine, connection or session.
+            columns: Columns to read, all by default.
+            **kwargs: Column equality filters.
+        """
+        from backend.database.columnar import read_arrow
+
+        return read_arrow(bind, cls, columns, **kwargs)
+
+    @classmethod
+    def to_polars(cls, bind, columns: Optional[Sequence[str]] = None, **kwargs):
+        """Read this model's rows straight into a polars DataFrame, see ``to_arrow``."""
+        from backend.database.columnar import read_polars
+
+        return read_polars(bind, cls, columns, **kwargs)
+
+    @classmethod
+    def _run_batches(cls, session, statement, rows: Iterable[Dict[str, Any]],
+                     batch_size: int) -> List[BatchStats]:
+        """Execute ``statement`` once per batch of rows, committing each batch.
+
+        Inside a unit of work the commits are left to the unit.
+        """
+        unit = UnitOfWork.of(session)
+        if unit is not None:
+            unit.flush()
+        stats = []
+        for number, batch in enumerate(_batches(rows, batch_size)):
+            start = time.perf_counter()
+            if unit is not None:
+                session.execute(statement, batch)
+                unit.written_rows(cls, len(batch))
+                stats.append(BatchStats(number, len(batch), time.perf_counter() - start))
+                continue
+            try:
+                session.execute(statement, batch)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            invalidate_model(cls)
+            stats.append(BatchStats(number, len(batch), time.perf_counter() - start))
+        logger.info(f"{cls.__tablename__}: wrote {sum(s.rows for s in stats)} rows "
+                    f"in {len(stats)} batches")
+        return stats
+
+    @classmethod
+    def create_many(cls, session, rows: Iterable[Dict[str, Any]],
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> List[BatchStats]:
+        """
+        Insert rows in batches, one multi-row INSERT and commit per batch.
+
+        Args:
+            session: The database session.
+            rows: Dicts of column values, all with the same keys.
+            batch_size: Rows per batch.
+
+        Returns:
+            The stats of every batch.
+        """
+        return cls._run_batches(session, insert(cls.__table__), rows, batch_size)
+
+    @classmethod
+    def upsert_many(cls, session, rows: Iterable[Dict[str, Any]],
+                    key: Optional[Sequence[str]] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> List[BatchStats]:
+        """
+        Insert rows in batches, updating the rows that already exist.
+
+        Uses ``INSERT ... ON CONFLICT (key) DO UPDATE``, so the key columns
+        need a primary key or unique constraint.
+
+        Args:
+            session: The database session.
+            rows: Dicts of column values, all with the same keys.
+            key: Conflict columns, ``__natural_key__`` by default.
+            batch_size: Rows per batch.
+
+        Returns:
+            The stats of every batch.
+
+        Raises:
+            ValueError: If the session's dialect has no ``ON CONFLICT`` insert,
+                see ``UPSERT_DIALECTS``.
+        """
+        key = tuple(key or cls.__natural_key__)
+        dialect = session.get_bind().dialect.name
+        if dialect not in UPSERT_DIALECTS:
+            raise ValueError(f"upsert_many is not supported on {dialect}")
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return []
+        statement = importlib.import_module(UPSERT_DIALECTS[dialect]).insert(cls.__table__)
+        updates = {c: statement.excluded[c] for c in first
+                   if c not in key and c not in ("id", "created_at")}
+        if "updated_at" in cls.__table__.columns:
+            updates["updated_at"] = func.now()
+        statement = statement.on_conflict_do_update(index_elements=list(key), set_=updates)
+        return cls._run_batches(session, statement, itertools.chain([first], rows), batch_size)
+
+    @classmethod
+    def delete_where(cls, session, *criteria, batch_size: Optional[int] = None,
+                     **kwargs) -> List[BatchStats]:
+        """
+        Delete the rows matching a filter without loading them.
+
+        Args:
+            session: The database session.
+            *criteria: SQL expressions to filter on.
+            batch_size: Delete at most this many rows per transaction, all at once by default.
+            **kwargs: Column equality filters.
+
+        Returns:
+            The stats of every batch.
+        """
+        criteria = [*criteria, *(getattr(cls, k) == v for k, v in kwargs.items())]
+        unit = UnitOfWork.of(session)
+        if unit is not None:
+            unit.flush()
+        stats = []
+        for number in itertools.count():
+            start = time.perf_counter()
+            statement = delete(cls.__table__).where(*criteria)
+            if batch_size is not None:
+                ids = select(cls.id).where(*criteria).limit(batch_size).scalar_subquery()
+                statement = delete(cls.__table__).where(cls.__table__.c.id.in_(ids))
+            if unit is not None:
+                deleted = session.execute(statement).rowcount
+                unit.written_rows(cls, deleted)
+            else:
+                try:
+                    deleted = session.execute(statement).rowcount
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    raise
+                invalidate_model(cls)
+            stats.append(BatchStats(number, deleted, time.perf_counter() - start))
+            if batch_size is None or deleted < batch_size:
+                break
+        logger.info(f"{cls.__tablename__}: deleted {sum(s.rows for s in stats)} rows")
+        return stats
 
     # @log_wrap
     # @staticmethod
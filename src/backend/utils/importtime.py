@@ -0,0 +1,112 @@
+"""Import-time budget for the backend modules.
+
+Each module is imported in a fresh interpreter with ``-X importtime`` and its
+cumulative import time is compared with its budget. A module also fails the
+check when it pulls in one of the heavy libraries that must only be loaded
+lazily, whatever the time measured.
+
+    python -m backend.utils.importtime            # exit status 1 on a violation
+"""
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+# Cumulative import time budget in milliseconds of each module
+BUDGETS_MS = {
+    "backend.utils.logger": 150,
+    "backend.core.config": 600,
+    "backend.database.db": 650,
+    "backend.models.NBA.models": 650,
+    "backend.models.NBA.nba_models": 650,
+    "backend.data.nba.fetch": 200,
+    "backend.data.nba.processed.Data.nba.stats.nba_data": 200,
+}
+
+# Libraries none of the budgeted modules may import eagerly
+LAZY_MODULES = ("pandas", "numpy", "polars", "pyarrow", "requests",
+                "nba_api.stats.endpoints", "rich", "sqlalchemy.ext.asyncio")
+
+# Runs per module, the fastest one is kept to smooth out noise
+DEFAULT_RUNS = 3
+
+# Directory containing the backend package
+SRC_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@dataclass
+class ImportProfile:
+    """Cumulative import time of a module and the modules it imported."""
+
+    module: str
+    total_us: int
+    modules: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_us / 1000
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Return the cumulative microseconds of every module in ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def measure(module: str, runs: int = DEFAULT_RUNS) -> ImportProfile:
+    """Import ``module`` in fresh interpreters and return its fastest profile."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [SRC_PATH, os.environ.get("PYTHONPATH")])))
+    best: Optional[ImportProfile] = None
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True, text=True, env=env)
+        if process.returncode != 0:
+            raise ImportError(f"Importing {module} failed:\n{process.stderr[-2000:]}")
+        modules = parse_importtime(process.stderr)
+        profile = ImportProfile(module, modules.get(module, 0), modules)
+        if best is None or profile.total_us < best.total_us:
+            best = profile
+    return best
+
+
+def violations(profile: ImportProfile, budget_ms: float,
+               lazy_modules: Sequence[str] = LAZY_MODULES) -> List[str]:
+    """Return why a profile breaks its budget, empty if it does not."""
+    problems = []
+    if profile.total_ms > budget_ms:
+        problems.append(f"{profile.module} took {profile.total_ms:.0f}ms, "
+                        f"budget {budget_ms:.0f}ms")
+    for name in lazy_modules:
+        if name in profile.modules:
+            problems.append(f"{profile.module} imports {name} eagerly")
+    return problems
+
+
+def check(budgets: Optional[Dict[str, float]] = None,
+          runs: int = DEFAULT_RUNS) -> List[str]:
+    """Measure every budgeted module and return all violations."""
+    problems = []
+    for module, budget_ms in (budgets or BUDGETS_MS).items():
+        profile = measure(module, runs)
+        problems.extend(violations(profile, budget_ms))
+        print(f"{module:<55} {profile.total_ms:8.1f}ms / {budget_ms}ms")
+    return problems
+
+
+def main() -> int:
+    problems = check()
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
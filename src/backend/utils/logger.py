@@ -3,65 +3,44 @@ from loguru import logger
 import os
 import sys
 from typing import Any, Dict, List, Tuple
-from rich.traceback import install
-from rich.logging import RichHandler
+
+# Levels that get their own log file
+FILE_SINK_LEVELS = ["DEBUG", "INFO", "ERROR", "WARNING", "CRITICAL"]
 
 # Set up the class BaseLogger
 
 class BaseLogger:
     def __init__(self, log_level: str = "DEBUG") -> None:
-        """Initialize the logger with the given log level."""
+        """Initialize the logger with the given log level.
+
+        Only the stderr sink is added here, so importing the logger does no
+        file I/O. Long running processes call ``init_file_sinks`` to also
+        write the per-level log files.
+        """
         self.log_level = log_level
         self.logger = logger
         self.logger.remove()
         self.logger.add(sys.stderr, level=self.log_level)
-        self.logger.add(
-            os.path.join("logs", "debug.log"),
-            level="DEBUG",
-            rotation="1 week",
-            retention="1 month",
-            enqueue=True,
-            backtrace=True,
-            diagnose=True,
-        )
-        self.logger.add(
-            os.path.join("logs", "info.log"),
-            level="INFO",
-            rotation="1 week",
-            retention="1 month",
-            enqueue=True,
-            backtrace=True,
-            diagnose=True,
-        )
-        self.logger.add(
-            os.path.join("logs", "error.log"),
-            level="ERROR",
-            rotation="1 week",
-            retention="1 month",
-            enqueue=True,
-            backtrace=True,
-            diagnose=True,
-        )
-        self.logger.add(
-            os.path.join("logs", "warning.log"),
-            level="WARNING",
-            rotation="1 week",
-            retention="1 month",
-            enqueue=True,
-            backtrace=True,
-            diagnose=True,
-        )
-        self.logger.add(
-            os.path.join("logs", "critical.log"),
-            level="CRITICAL",
-            rotation="1 week",
-            retention="1 month",
-            enqueue=True,
-            backtrace=True,
-            diagnose=True,
-        )
-        install()
         self.logger.enable("backend")
+        self.file_sinks: List[int] = []
+
+    def init_file_sinks(self, log_dir: str = "logs") -> None:
+        """Add the rotating per-level log files under log_dir and rich tracebacks."""
+        if self.file_sinks:
+            return
+        from rich.traceback import install
+
+        for level in FILE_SINK_LEVELS:
+            self.file_sinks.append(self.logger.add(
+                os.path.join(log_dir, f"{level.lower()}.log"),
+                level=level,
+                rotation="1 week",
+                retention="1 month",
+                enqueue=True,
+                backtrace=True,
+                diagnose=True,
+            ))
+        install()
 
     def log(self, message: str, level: str = "DEBUG") -> None:
         """Log a message at the given level."""
@@ -187,9 +166,12 @@ class BaseLogger:
             self.logger.critical(message, exc_info=True)
 
 
-# Set up the logger
+# Set up the logger, file sinks are added by init_file_sinks()
 logger = BaseLogger()
 
+# Called by the entry points of long running processes, before their work starts
+init_file_sinks = logger.init_file_sinks
+
 # Create an importable wrapper for the logger
 from functools import wraps
 
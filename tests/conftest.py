@@ -0,0 +1,25 @@
+"""Fixtures shared by the database tests."""
+import functools
+
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.database.db import make_engine
+from backend.database.guard import query_guard
+from backend.models.base import BaseModel
+
+
+@pytest.fixture
+def nba_session(tmp_path):
+    """Session on a file SQLite database with the ORM schema."""
+    engine = make_engine(f"sqlite:///{tmp_path / 'nba.db'}")
+    BaseModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def guard(nba_session):
+    """``query_guard`` on ``nba_session``: ``with guard(max_queries=4) as counter:``."""
+    return functools.partial(query_guard, nba_session)
@@ -0,0 +1,62 @@
+"""Vectorized advanced stats against the published bball_ref values."""
+import polars as pl
+import pytest
+
+from backend.data.nba import advanced
+
+
+SEASONS = [2015, 2016]
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return advanced.compute_advanced(SEASONS)
+
+
+def test_matches_the_published_values():
+    errors = advanced.validate(SEASONS)
+    assert errors["team pace"] < 0.1
+    for metric in ("ts_percent", "e_fg_percent", "x3p_ar", "f_tr"):
+        assert errors[f"team {metric}"] < 0.001
+    assert errors["player o_rtg"] < 1
+    assert errors["player d_rtg"] < 1
+
+
+def test_one_row_per_player_season(frame):
+    assert frame.select("player_id", "season").is_unique().all()
+    traded = frame.filter(pl.col("tm").str.contains("/"))
+    assert traded.height > 0
+    assert traded.filter(pl.col("tm").str.contains(r"TOT|\dTM")).height == 0
+
+
+def test_win_shares_add_up_to_the_wins(frame):
+    # 30 teams of 82 games: 1230 wins a season
+    totals = frame.group_by("season").agg(pl.col("ws").sum())["ws"]
+    assert all(abs(ws - 1230) < 60 for ws in totals)
+
+
+def test_bpm_sums_to_the_team_net_rating():
+    stints = advanced._stints([2016]).group_by("tm").agg(
+        (pl.col("bpm") * pl.col("minutes_share")).sum().alias("bpm"),
+        pl.col("tm_net_rtg").first()).collect()
+    assert (stints["bpm"] - stints["tm_net_rtg"]).abs().max() < 1e-6
+
+
+def test_obpm_sums_to_the_team_offense(frame):
+    stints = advanced._stints([2016]).group_by("tm").agg(
+        (pl.col("obpm") * pl.col("minutes_share")).sum().alias("obpm"),
+        (100 * (pl.col("tm_pts") / pl.col("tm_poss") - pl.col("lg_ppp"))).first().alias("ortg"),
+    ).collect()
+    assert (stints["obpm"] - stints["ortg"]).abs().max() < 1e-6
+    rated = frame.filter(pl.col("bpm").is_not_null())
+    assert rated["obpm"].null_count() == 0
+    assert ((rated["bpm"] - rated["obpm"] - rated["dbpm"]).abs() < 1e-9).all()
+
+
+def test_model_rows(frame):
+    player_id = frame["player_id"][0]
+    rows = advanced.model_rows(frame, {player_id: 77})
+    assert rows.height == frame.filter(pl.col("player_id") == player_id).height
+    assert set(rows["player_id"]) == {77}
+    assert set(rows["season_id"]) <= {2014, 2015}
+    assert rows.columns == ["player_id", "season_id", *advanced.MODEL_COLUMNS]
@@ -0,0 +1,61 @@
+"""Incremental refresh of the season aggregate tables."""
+from sqlalchemy import insert, select, text
+
+from backend.models.NBA.aggregates import (
+    PlayerSeasonAggregate, TeamSeasonAggregate, refresh_aggregates)
+from backend.models.NBA.models import Player, Season, Team, player_game_association
+
+# Written like CURRENT_TIMESTAMP, without a fraction of a second
+SECOND = "2026-10-18 12:00:00"
+
+
+def add_game(session, game_id, home_score, away_score, updated_at=SECOND):
+    session.execute(text(
+        "INSERT INTO games (id, date, home_team_id, away_team_id, home_team_score, "
+        "away_team_score, season_id, created_at, updated_at) "
+        "VALUES (:id, :date, 1, 2, :home, :away, 2016, :at, :at)"),
+        {"id": game_id, "date": f"2016-11-{game_id:02d} 19:30:00", "home": home_score,
+         "away": away_score, "at": updated_at})
+    session.execute(insert(player_game_association),
+                    [{"player_id": 10, "game_id": game_id}, {"player_id": 20, "game_id": game_id}])
+    session.commit()
+
+
+def seed(session):
+    session.execute(insert(Team.__table__), [{"id": 1, "full_name": "Home"},
+                                             {"id": 2, "full_name": "Away"}])
+    session.execute(insert(Season.__table__), [{"id": 2016, "year": 2016}])
+    session.execute(insert(Player.__table__), [{"id": 10, "team_id": 1}, {"id": 20, "team_id": 2}])
+    session.commit()
+
+
+def team_row(session, team_id):
+    return session.scalars(select(TeamSeasonAggregate).filter_by(
+        team_id=team_id, season_id=2016).execution_options(populate_existing=True)).one()
+
+
+def test_incremental_refresh_matches_full(nba_session):
+    seed(nba_session)
+    add_game(nba_session, 1, 110, 100)
+    refresh_aggregates(nba_session)
+    add_game(nba_session, 2, 90, 95, updated_at="2026-10-18 12:00:05")
+    refresh_aggregates(nba_session)
+    home = team_row(nba_session, 1)
+    assert (home.games, home.wins, home.losses, home.points_for) == (2, 1, 1, 200)
+    assert home.points_against_per_game == 97.5
+    player = nba_session.scalars(select(PlayerSeasonAggregate).filter_by(player_id=10)).one()
+    assert player.games_played == 2
+
+    refresh_aggregates(nba_session, full=True)
+    assert (team_row(nba_session, 2).games, team_row(nba_session, 2).wins) == (2, 1)
+
+
+def test_games_written_in_the_watermark_second_are_refreshed(nba_session):
+    seed(nba_session)
+    add_game(nba_session, 1, 110, 100)
+    refresh_aggregates(nba_session)
+    # Same second as the watermark, written after the refresh
+    add_game(nba_session, 2, 120, 100)
+    refresh_aggregates(nba_session)
+    assert team_row(nba_session, 1).games == 2
+    assert team_row(nba_session, 2).losses == 2
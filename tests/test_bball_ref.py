@@ -0,0 +1,32 @@
+"""Typed lazy scans over the bball_ref CSVs."""
+import polars as pl
+
+from backend.data.nba.bball_ref import GUARD_SPLIT_COLUMNS, TABLES, guard_seasons_with_splits, join, scan
+
+
+def test_every_table_scans_with_its_schema():
+    for name, table in TABLES.items():
+        frame = scan(name).head(50).collect()
+        assert dict(frame.schema) == dict(table.schema), name
+
+
+def test_na_is_read_as_null():
+    frame = scan("player_shooting", ["season", "avg_dist_fga"]).collect()
+    assert frame["avg_dist_fga"].dtype == pl.Float64
+    assert frame["avg_dist_fga"].null_count() > 0
+
+
+def test_join_takes_shared_columns_from_the_base():
+    frame = join("per_100_poss", "player_shooting",
+                 columns={"player_shooting": ["player", "avg_dist_fga"]})
+    assert frame.collect_schema().names().count("player") == 1
+
+
+def test_guard_splits_read_only_the_projected_columns():
+    plan = guard_seasons_with_splits().explain()
+    assert f"PROJECT {len(GUARD_SPLIT_COLUMNS['per_100_poss']) + 1}/" in plan
+    frame = guard_seasons_with_splits(2010).collect()
+    assert set(frame["pos"]) == {"SG"} and frame["season"].min() >= 2010
+    assert frame.columns == ["seas_id", *GUARD_SPLIT_COLUMNS["per_100_poss"],
+                             *GUARD_SPLIT_COLUMNS["player_shooting"],
+                             *GUARD_SPLIT_COLUMNS["player_play_by_play"]]
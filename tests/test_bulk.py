@@ -0,0 +1,89 @@
+"""Bulk load of the bundled data files into SQLite, player season stats included."""
+import polars as pl
+import pytest
+from sqlalchemy import text
+
+from backend.data.nba import identity, season_store
+from backend.database import analytics, bulk
+from backend.database.db import make_engine
+from backend.models.base import BaseModel
+
+
+STATS_TABLES = ["player_basic_stats", "player_advanced_stats", "player_shooting_stats"]
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("bulk")
+    # Keep the identity index and Parquet copies out of the shipped cache directory
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(identity, "NBA_IDENTITY_PATH", str(tmp_path / "identity.pickle"))
+        monkeypatch.setattr(analytics, "PARQUET_CACHE_PATH", str(tmp_path / "parquet"))
+        identity.get_identity_index.cache_clear()
+        engine = make_engine(f"sqlite:///{tmp_path / 'nba.db'}")
+        BaseModel.metadata.create_all(engine)
+        reports = bulk.load_all(engine)
+        identity.get_identity_index.cache_clear()
+    assert [report.table for report in reports] == [
+        "teams", "seasons", "players", *STATS_TABLES]
+    yield engine
+    engine.dispose()
+
+
+def count(engine, table):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+
+
+def test_seasons_are_keyed_by_start_year(engine):
+    with engine.connect() as conn:
+        first, last = conn.execute(text("SELECT min(id), max(id) FROM seasons")).one()
+    years = season_store.load(["PLAYER_ID"], per_mode=None)["season"].unique()
+    assert first <= years.min() and years.max() <= last
+
+
+@pytest.mark.parametrize("table", STATS_TABLES)
+def test_stats_reference_loaded_players_and_seasons(engine, table):
+    assert count(engine, table) > 0
+    with engine.connect() as conn:
+        orphans = conn.execute(text(
+            f"SELECT count(*) FROM {table} s "
+            f"LEFT JOIN players p ON p.id = s.player_id "
+            f"LEFT JOIN seasons y ON y.id = s.season_id "
+            f"WHERE p.id IS NULL OR y.id IS NULL")).scalar()
+    assert orphans == 0
+
+
+def test_basic_stats_are_per_game(engine):
+    stored = season_store.load(["PLAYER_ID", "GP", "PTS"], per_mode=None)
+    per_game = stored.filter(pl.col("per_mode") == "PerGame").row(0, named=True)
+    totals = stored.filter(pl.col("per_mode") == "Totals", pl.col("GP") > 0).row(0, named=True)
+    with engine.connect() as conn:
+        def points(row):
+            return conn.execute(text(
+                "SELECT points_per_game FROM player_basic_stats "
+                "WHERE player_id = :player_id AND season_id = :season"),
+                {"player_id": row["PLAYER_ID"], "season": row["season"]}).scalar()
+        assert points(per_game) == pytest.approx(per_game["PTS"])
+        assert points(totals) == pytest.approx(totals["PTS"] / totals["GP"])
+
+
+def test_shooting_stats_add_up(engine):
+    with engine.connect() as conn:
+        made, attempts, percentage = conn.execute(text(
+            "SELECT two_point_field_goals_made_per_game, "
+            "two_point_field_goals_attempted_per_game, two_point_field_goal_percentage "
+            "FROM player_shooting_stats WHERE two_point_field_goals_attempted_per_game > 5 "
+            "LIMIT 1")).one()
+    assert made / attempts == pytest.approx(percentage)
+
+
+def test_reloading_updates_in_place(engine):
+    before = {table: count(engine, table) for table in STATS_TABLES}
+    with engine.connect() as conn:
+        player_ids = set(conn.execute(text("SELECT id FROM players")).scalars())
+    report = bulk.copy_rows(engine, BaseModel.metadata.tables["player_basic_stats"],
+                            bulk.basic_stats_rows(player_ids=player_ids),
+                            key_columns=bulk.STATS_KEY)
+    assert report.rows == before["player_basic_stats"]
+    assert {table: count(engine, table) for table in STATS_TABLES} == before
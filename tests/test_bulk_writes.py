@@ -0,0 +1,58 @@
+"""Batched writes of BaseModel: create_many, upsert_many and delete_where."""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.database.db import make_engine
+from backend.models.base import BaseModel
+from backend.models.NBA.models import Team
+
+
+def teams(ids, city="Boston"):
+    return [{"id": i, "full_name": f"Team {i}", "name": f"T{i}", "abbreviation": f"T{i}",
+             "city": city} for i in ids]
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'nba.db'}")
+    BaseModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def test_create_many_commits_each_batch(session):
+    stats = Team.create_many(session, teams(range(1, 8)), batch_size=3)
+    assert [s.rows for s in stats] == [3, 3, 1]
+    assert session.scalars(select(Team.id).order_by(Team.id)).all() == list(range(1, 8))
+
+
+def test_create_many_raises_on_conflict(session):
+    Team.create_many(session, teams([1, 2]))
+    with pytest.raises(IntegrityError):
+        Team.create_many(session, teams([2, 3]))
+    # The failed batch was rolled back, the session is usable
+    assert session.scalars(select(Team.id).order_by(Team.id)).all() == [1, 2]
+
+
+def test_upsert_many_updates_existing_rows(session):
+    Team.create_many(session, teams([1, 2]))
+    Team.upsert_many(session, teams([2, 3], city="Denver"))
+    cities = dict(session.execute(select(Team.id, Team.city).order_by(Team.id)).all())
+    assert cities == {1: "Boston", 2: "Denver", 3: "Denver"}
+
+
+def test_upsert_many_rejects_unsupported_dialects():
+    engine = make_engine("duckdb:///:memory:")
+    with Session(engine) as session, pytest.raises(ValueError, match="duckdb"):
+        Team.upsert_many(session, teams([1]))
+    engine.dispose()
+
+
+def test_delete_where_deletes_in_batches(session):
+    Team.create_many(session, teams(range(1, 6)) + teams(range(6, 8), city="Denver"))
+    stats = Team.delete_where(session, Team.id > 1, city="Boston", batch_size=2)
+    assert [s.rows for s in stats] == [2, 2, 0]
+    assert session.scalars(select(Team.id).order_by(Team.id)).all() == [1, 6, 7]
@@ -0,0 +1,90 @@
+"""Persistent nba_api response cache: TTLs, expiry and LRU eviction."""
+import datetime
+import time
+
+import pytest
+
+from backend.data.nba import cache
+from backend.data.nba.cache import FOREVER, ResponseCache, cache_key, ttl_for
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def responses(tmp_path):
+    responses = ResponseCache(str(tmp_path / "cache" / "responses.sqlite"))
+    yield responses
+    responses.close()
+
+
+def result(rows):
+    return {"resultSets": [{"headers": ["ID"], "rowSet": [[i] for i in range(rows)]}]}
+
+
+def test_ttls(monkeypatch):
+    assert cache.current_season_start(datetime.date(2024, 9, 30)) == 2023
+    assert cache.current_season_start(datetime.date(2024, 10, 1)) == 2024
+    monkeypatch.setattr(cache, "current_season_start", lambda: 2024)
+    assert ttl_for("leaguegamelog", {"Season": "2015-16"}) is FOREVER
+    assert ttl_for("leaguegamelog", {"Season": "2024-25"}) == cache.CURRENT_SEASON_TTL
+    assert ttl_for("commonteamyears", {}) == cache.ENDPOINT_TTLS["commonteamyears"]
+    assert ttl_for("scoreboardv2", {}) == cache.DEFAULT_TTL
+    retired = {"resultSets": [{"headers": ["ROSTERSTATUS"], "rowSet": [["Inactive"]]}]}
+    assert ttl_for("commonplayerinfo", {"PlayerID": 1}, retired) is FOREVER
+
+
+def test_keys_ignore_order_case_and_empty_params():
+    assert cache_key("LeagueGameLog", {"Season": "2015-16", "PlayerOrTeam": "P", "Date": ""}) \
+        == cache_key("leaguegamelog", {"PlayerOrTeam": "P", "Season": "2015-16"})
+    assert cache_key("leaguegamelog", {"Season": "2015-16"}) \
+        != cache_key("leaguegamelog", {"Season": "2016-17"})
+
+
+def test_entries_expire(clock, responses):
+    responses.set("scoreboardv2", {"GameDate": "2024-01-01"}, result(1), ttl=60)
+    responses.set("leaguegamelog", {"Season": "2015-16"}, result(2), ttl=FOREVER)
+    assert responses.get("scoreboardv2", {"GameDate": "2024-01-01"}) == result(1)
+    clock.now += 60
+    assert responses.get("scoreboardv2", {"GameDate": "2024-01-01"}) is None
+    assert responses.get("leaguegamelog", {"Season": "2015-16"}) == result(2)
+    assert (responses.hits, responses.misses) == (2, 1)
+    assert responses.purge(expired_only=True) == 1
+    assert [e.endpoint for e in responses.entries()] == ["leaguegamelog"]
+
+
+def test_evicts_least_recently_used(clock, responses):
+    for season in range(2000, 2003):
+        clock.now += 1
+        responses.set("leaguegamelog", {"Season": season}, result(50), ttl=FOREVER)
+    clock.now += 1
+    assert responses.get("leaguegamelog", {"Season": 2000}) is not None
+    # Room for two entries: the next one evicts 2001 and 2002, the least recently used
+    responses.max_bytes = 2 * responses.stats()["bytes"] // 3 + 1
+    clock.now += 1
+    responses.set("leaguegamelog", {"Season": 2003}, result(50), ttl=FOREVER)
+    assert sorted(e.params["Season"] for e in responses.entries()) == ["2000", "2003"]
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    first = ResponseCache(path)
+    first.set("leaguegamelog", {"Season": "2015-16"}, result(3))
+    first.close()
+    second = ResponseCache(path)
+    assert second.get("leaguegamelog", {"Season": "2015-16"}) == result(3)
+    assert second.purge("leaguegamelog") == 1
+    assert second.stats()["entries"] == 0
+    second.close()
@@ -0,0 +1,62 @@
+"""Columnar read path against the ORM path."""
+import sys
+
+import polars as pl
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.database import columnar, db, plans
+from backend.database.db import make_engine
+from backend.database.plans import fill_stats
+from backend.models.base import BaseModel
+from backend.models.NBA.models import PlayerBasicStats
+from backend.utils import logger
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'nba.db'}")
+    BaseModel.metadata.create_all(engine)
+    fill_stats(engine, players=50, seasons=3)
+    yield engine
+    engine.dispose()
+
+
+def test_reads_the_orm_rows(engine):
+    columns = ["id", "player_id", "season_id", "points_per_game", "created_at"]
+    frame = columnar.read_polars(engine, PlayerBasicStats, columns, batch_size=40)
+    with Session(engine) as session:
+        orm = columnar.read_orm(session, PlayerBasicStats, columns)
+    assert frame.schema["created_at"] == pl.Datetime("us")
+    assert frame.sort("id").equals(orm.sort("id").cast(frame.schema))
+
+
+def test_filters_and_session_bind(engine):
+    with Session(engine) as session:
+        frame = PlayerBasicStats.to_polars(session, ["player_id"], season_id=2010)
+    assert frame.height == 50
+
+
+def test_benchmark_checks_both_paths_agree(monkeypatch):
+    timings = columnar.benchmark(players=20, seasons=2, repeat=1)
+    assert set(timings) == {"orm", "columnar"}
+    monkeypatch.setattr(columnar, "read_orm", lambda session, model: pl.DataFrame())
+    with pytest.raises(RuntimeError, match="disagree"):
+        columnar.benchmark(players=20, seasons=2, repeat=1)
+
+
+@pytest.mark.parametrize("module", [columnar, plans])
+def test_benchmarks_use_the_engine_factory(module, tmp_path, monkeypatch):
+    urls = []
+
+    def spy(url, **kwargs):
+        urls.append(url)
+        return make_engine(url, **kwargs)
+
+    monkeypatch.setattr(db, "make_engine", spy)
+    monkeypatch.setattr(logger, "init_file_sinks", lambda: None)
+    url = f"sqlite:///{tmp_path / 'scratch.db'}"
+    monkeypatch.setattr(sys, "argv", [module.__name__, "--players", "10", "--seasons", "1",
+                                      "--url", url])
+    module.main()
+    assert urls == [url]
@@ -0,0 +1,80 @@
+"""Engine and session factories of backend.database.db."""
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import event, text
+
+from backend.core.config import settings
+from backend.database import db
+
+
+CACHED = [db.get_engine, db.get_sessionmaker, db.get_async_engine, db.get_async_sessionmaker]
+
+
+@pytest.fixture
+def sqlite_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "DATABASE_PATH", str(tmp_path / "nba.sqlite"))
+    for getter in CACHED:
+        getter.cache_clear()
+    yield tmp_path
+    if db.get_engine.cache_info().currsize:
+        db.get_engine().dispose()
+    for getter in CACHED:
+        getter.cache_clear()
+
+
+def test_import_resolves_no_url(tmp_path):
+    path = tmp_path / "missing" / "nba.sqlite"
+    env = {**os.environ, "DATABASE_BACKEND": "sqlite", "DATABASE_PATH": str(path),
+           "PYTHONPATH": os.pathsep.join(sys.path)}
+    subprocess.run([sys.executable, "-c", "import backend.database.db"], env=env, check=True)
+    assert not path.parent.exists()
+
+
+def test_sessions_reuse_pooled_connections(sqlite_settings):
+    engine = db.get_engine()
+    assert db.get_engine() is engine
+    counts = {"connect": 0, "checkout": 0}
+    for name in counts:
+        event.listen(engine, name, lambda *args, name=name: counts.__setitem__(
+            name, counts[name] + 1))
+    for _ in range(5):
+        for session in db.get_db():
+            assert session.execute(text("SELECT 1")).scalar() == 1
+    assert counts == {"connect": 1, "checkout": 5}
+    assert (sqlite_settings / "nba.sqlite").exists()
+
+
+def test_sqlite_savepoints_roll_back(tmp_path):
+    engine = db.make_engine(f"sqlite:///{tmp_path / 'nba.sqlite'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+    with engine.connect() as conn:
+        # A savepoint first thing in the transaction, which pysqlite would
+        # turn into the transaction itself and commit on release
+        savepoint = conn.begin_nested()
+        conn.exec_driver_sql("INSERT INTO t VALUES (1)")
+        savepoint.commit()
+        savepoint = conn.begin_nested()
+        conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+        savepoint.rollback()
+        assert conn.exec_driver_sql("SELECT id FROM t").scalars().all() == [1]
+        conn.rollback()
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT count(*) FROM t").scalar() == 0
+    engine.dispose()
+
+
+def test_async_engine_names_the_missing_driver(sqlite_settings, monkeypatch):
+    monkeypatch.setitem(sys.modules, "aiosqlite", None)
+    with pytest.raises(ImportError, match=r"aiosqlite.*backend\[async\]"):
+        db.get_async_engine()
+
+
+def test_duckdb_has_no_async_engine(sqlite_settings, monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_BACKEND", "duckdb")
+    with pytest.raises(ValueError, match="DuckDB"):
+        db.get_async_engine()
@@ -0,0 +1,130 @@
+"""FetchEngine against a local stub of the stats api."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.data.nba.fetch import FetchEngine, FetchError, TokenBucket
+
+
+class StubStats(BaseHTTPRequestHandler):
+    """Serves /<endpoint>, failing the first calls of an endpoint as scripted."""
+
+    # endpoint -> list of (status, headers) returned before the first 200
+    script = {}
+    calls = {}
+    times = {}
+    in_flight = {}
+    max_in_flight = {}
+    lock = threading.Lock()
+    delay = 0.0
+
+    def do_GET(self) -> None:
+        endpoint = self.path.split("?")[0].strip("/")
+        with self.lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            self.times.setdefault(endpoint, []).append(time.monotonic())
+            self.in_flight[endpoint] = self.in_flight.get(endpoint, 0) + 1
+            self.max_in_flight[endpoint] = max(self.max_in_flight.get(endpoint, 0),
+                                               self.in_flight[endpoint])
+            failures = self.script.get(endpoint, [])
+            status, headers = failures.pop(0) if failures else (200, {})
+        try:
+            time.sleep(self.delay)
+            body = json.dumps({"resultSets": [{"name": endpoint, "headers": ["A"],
+                                               "rowSet": [[1]]}]}).encode()
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with self.lock:
+                self.in_flight[endpoint] -= 1
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def stub():
+    for state in (StubStats.script, StubStats.calls, StubStats.times, StubStats.in_flight,
+                  StubStats.max_in_flight):
+        state.clear()
+    StubStats.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubStats)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield StubStats, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def engine(base_url: str, **kwargs) -> FetchEngine:
+    options = dict(base_url=base_url, headers={}, rate=1000.0, backoff_base=0.01,
+                   backoff_cap=0.05, timeout=5.0)
+    options.update(kwargs)
+    return FetchEngine(**options)
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    for rate in (0, -1.0):
+        with pytest.raises(ValueError):
+            TokenBucket(rate)
+
+
+def test_token_bucket_limits_request_rate(stub):
+    handler, url = stub
+    results = engine(url, rate=20.0, burst=1.0, max_workers=4).fetch_many(
+        ("ratelimited", {"i": i}) for i in range(6))
+    assert all(result.ok for result in results)
+    times = handler.times["ratelimited"]
+    # One token at start, then one every 1 / 20 s
+    assert times[-1] - times[0] >= 5 / 20 * 0.9
+
+
+def test_retries_5xx_with_backoff(stub):
+    handler, url = stub
+    handler.script["flaky"] = [(503, {}), (500, {})]
+    result = engine(url)._fetch_result("flaky", {})
+    assert result.ok and result.attempts == 3
+    assert result.data["resultSets"][0]["rowSet"] == [[1]]
+
+
+def test_gives_up_after_max_retries(stub):
+    handler, url = stub
+    handler.script["down"] = [(503, {})] * 5
+    with pytest.raises(FetchError):
+        engine(url, max_retries=2).fetch("down", {})
+    assert handler.calls["down"] == 3
+
+
+def test_does_not_retry_client_errors(stub):
+    handler, url = stub
+    handler.script["missing"] = [(404, {})]
+    result = engine(url)._fetch_result("missing", {})
+    assert not result.ok and result.attempts == 1
+
+
+def test_honors_retry_after_on_429(stub):
+    handler, url = stub
+    handler.script["throttled"] = [(429, {"Retry-After": "0.3"})]
+    result = engine(url)._fetch_result("throttled", {})
+    assert result.ok and result.attempts == 2
+    first, second = handler.times["throttled"]
+    # Jittered backoff alone would wait at most backoff_cap = 0.05s
+    assert second - first >= 0.3
+
+
+def test_endpoint_semaphore_caps_in_flight_requests(stub):
+    handler, url = stub
+    handler.delay = 0.05
+    results = engine(url, max_workers=8, endpoint_limits={"slow": 2}).fetch_many(
+        [("slow", {"i": i}) for i in range(8)] + [("fast", {"i": i}) for i in range(8)])
+    assert all(result.ok for result in results)
+    assert handler.max_in_flight["slow"] <= 2
+    assert handler.max_in_flight["fast"] > 2
@@ -0,0 +1,65 @@
+"""N+1 detection of query_guard against the loading profiles."""
+import pytest
+from sqlalchemy import insert
+
+from backend.database.guard import NPlusOneError, QueryCounter
+from backend.models.NBA.models import (
+    Player, PlayerBasicStats, Season, Team, player_season_association, team_player_association)
+
+
+TEAMS, PLAYERS, SEASONS = 3, 4, 2
+
+
+@pytest.fixture
+def session(nba_session):
+    players = [(team, team * 10 + i) for team in range(1, TEAMS + 1) for i in range(PLAYERS)]
+    seasons = range(2015, 2015 + SEASONS)
+    for table, rows in (
+            (Team.__table__, [{"id": team, "full_name": f"Team {team}"}
+                              for team in range(1, TEAMS + 1)]),
+            (Season.__table__, [{"id": season, "year": season} for season in seasons]),
+            (Player.__table__, [{"id": player, "full_name": f"Player {player}", "team_id": team}
+                                for team, player in players]),
+            (team_player_association, [{"team_id": team, "player_id": player}
+                                       for team, player in players]),
+            (player_season_association, [{"player_id": player, "season_id": season}
+                                         for _, player in players for season in seasons]),
+            (PlayerBasicStats.__table__, [{"player_id": player, "season_id": season,
+                                           "points_per_game": 10.0}
+                                          for _, player in players for season in seasons])):
+        nba_session.execute(insert(table), rows)
+    nba_session.commit()
+    return nba_session
+
+
+def render_team_page(session, profile=None):
+    """Touch what the team page shows: players, their seasons and stats per season."""
+    rows = []
+    for team in session.scalars(Team.select_with(profile)).all():
+        for player in team.players:
+            rows.append((team.full_name, player.full_name, len(player.seasons),
+                         [(stats.season.year, stats.points_per_game)
+                          for stats in player.basic_stats]))
+    return rows
+
+
+def test_lazy_loads_are_caught(session, guard):
+    with pytest.raises(NPlusOneError, match="N\\+1"):
+        with guard(max_queries=4):
+            render_team_page(session)
+
+
+def test_page_profile_loads_in_four_queries(session, guard):
+    with guard(max_queries=4, max_repeats=1) as counter:
+        rows = render_team_page(session, profile="page")
+    assert counter.count == 4
+    assert len(rows) == TEAMS * PLAYERS
+    assert all(len(stats) == SEASONS for *_, stats in rows)
+
+
+def test_counter_stops_counting_on_exit(session):
+    with QueryCounter(session) as counter:
+        render_team_page(session, profile="page")
+    session.expunge_all()
+    render_team_page(session)
+    assert counter.count == 4
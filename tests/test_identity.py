@@ -0,0 +1,71 @@
+"""Cross-source player identity index: name normalization, linking and search."""
+import pytest
+
+from backend.data.nba import identity
+from backend.data.nba.identity import IdentityIndex, PlayerIdentity, link, normalize_name
+
+
+def bbref(name, bbref_id, first, last, birth_year=None):
+    return PlayerIdentity(name, bbref_id=bbref_id, birth_year=birth_year,
+                          first_season=first, last_season=last)
+
+
+def nba(name, nba_id, first, last, birth_year=None):
+    return PlayerIdentity(name, nba_id=nba_id, birth_year=birth_year,
+                          first_season=first, last_season=last)
+
+
+def test_normalize_name():
+    assert normalize_name("Nikola Jokić") == "nikola jokic"
+    assert normalize_name("Jaren Jackson Jr.") == "jaren jackson"
+    assert normalize_name("D'Angelo Russell") == "dangelo russell"
+    assert normalize_name("A.J. Green") == "aj green"
+    assert normalize_name("Jr.") == "jr"
+
+
+def test_link_checks_careers_and_birth_years():
+    players = link(
+        [bbref("Gary Payton", 1, 1990, 2006, 1968), bbref("Gary Payton", 2, 2016, 2022, 1992),
+         bbref("Nene Hilario", 3, 2002, 2019), bbref("Greg Smith", 4, 1968, 1975),
+         bbref("Tony Mitchell", 5, 2013, 2013, 1992)],
+        [nba("Gary Payton", 56, 1990, 2006), nba("Gary Payton II", 1627780, 2016, 2022),
+         nba("Nene", 2403, 2002, 2019), nba("Greg Smith", 202962, 2011, 2014),
+         nba("Tony Mitchell", 203502, 2013, 2013, 1989)])
+    by_bbref = {p.bbref_id: p.nba_id for p in players if p.bbref_id is not None}
+    # Same names, told apart by career; a fuzzy name needs a close enough match;
+    # an exact name with a conflicting birth year stays unlinked
+    assert by_bbref == {1: 56, 2: 1627780, 3: None, 4: None, 5: None}
+    assert len(players) == 8
+
+
+def test_fuzzy_link():
+    players = link([bbref("Mo Bamba", 1, 2018, 2023)], [nba("Mohamed Bamba", 1628964, 2018, 2023),
+                                                        nba("Mo Bambaa", 1, 2018, 2023)])
+    assert [p.nba_id for p in players if p.bbref_id == 1] == [1]
+
+
+def test_index_lookups_and_round_trip(tmp_path):
+    index = IdentityIndex(link([bbref("Nikola Jokic", 10, 2015, 2023)],
+                               [nba("Nikola Jokić", 203999, 2015, 2023),
+                                nba("Nikola Vucevic", 202696, 2011, 2023)]))
+    assert index.nba_id(10) == 203999
+    assert index.bbref_id(203999) == 10
+    assert index.nba_ids([10, 11]) == {10: 203999}
+    assert index.search("jokic", 1)[0].player.nba_id == 203999
+    path = str(tmp_path / "identity.pickle")
+    index.save(path)
+    assert IdentityIndex.load(path).nba_id(10) == 203999
+
+
+def test_rejects_other_versions(tmp_path, monkeypatch):
+    path = str(tmp_path / "identity.pickle")
+    IdentityIndex([]).save(path)
+    monkeypatch.setattr(identity, "INDEX_VERSION", 2)
+    with pytest.raises(ValueError, match="version 2"):
+        IdentityIndex.load(path)
+
+
+def test_links_the_shipped_sources():
+    index = identity.build_index()
+    assert index.nba_id(5025) == 1631260
+    assert index.search("jokic", 1)[0].player.name == "Nikola Jokic"
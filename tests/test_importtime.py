@@ -0,0 +1,51 @@
+"""Import-time budgets of the backend modules and the entry points' log files."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from backend.utils import importtime
+from backend.utils.logger import logger
+
+
+def test_budgeted_modules_stay_within_budget():
+    env = dict(os.environ, PYTHONPATH=importtime.SRC_PATH)
+    process = subprocess.run([sys.executable, "-m", "backend.utils.importtime"],
+                             capture_output=True, text=True, env=env, timeout=300)
+    assert process.returncode == 0, process.stdout + process.stderr
+    for module in importtime.BUDGETS_MS:
+        assert module in process.stdout
+
+
+def test_violations():
+    profile = importtime.ImportProfile("pkg", 120_000, {"pkg": 120_000, "polars": 90_000})
+    assert importtime.violations(profile, 200) == ["pkg imports polars eagerly"]
+    assert importtime.violations(profile, 100, lazy_modules=()) == [
+        "pkg took 120ms, budget 100ms"]
+
+
+def test_parse_importtime():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   json.decoder\n"
+              "import time:       300 |        420 | json\n")
+    assert importtime.parse_importtime(stderr) == {"json.decoder": 120, "json": 420}
+
+
+@pytest.fixture
+def log_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path / "logs"
+    for sink in logger.file_sinks:
+        logger.logger.remove(sink)
+    logger.file_sinks.clear()
+
+
+def test_entry_points_write_log_files(log_dir, monkeypatch):
+    from backend.database import columnar
+
+    monkeypatch.setattr(sys, "argv", ["columnar", "--players", "10", "--seasons", "1"])
+    columnar.main()
+    logger.info("entry point started")
+    logger.logger.complete()
+    assert "entry point started" in (log_dir / "info.log").read_text()
@@ -0,0 +1,118 @@
+"""Watermark-based game log ingestion against an in-process fake fetch engine."""
+import datetime
+
+import pytest
+
+from backend.data.nba.fetch import FetchResult
+from backend.data.nba.ingest import API_DATE_FORMAT, GameLogIngestor
+from backend.data.nba.rolling import load_state, update_from_ingest
+from backend.data.nba.schemas import headers
+
+
+SEASON = "2023-24"
+HEADERS = headers("playergamelog")
+DATE = HEADERS.index("GAME_DATE")
+
+
+def game(player_id, game_id, date):
+    row = dict.fromkeys(HEADERS, 0)
+    row.update(SEASON_ID="22023", Player_ID=player_id, Game_ID=game_id,
+               GAME_DATE=date.strftime("%b %d, %Y").upper(), MATCHUP="BOS vs. NYK", WL="W")
+    return [row[name] for name in HEADERS]
+
+
+class FakeEngine:
+    """Answers game log requests from in-memory rows, honoring DateFrom."""
+
+    def __init__(self):
+        self.games = {}
+        self.failing = set()
+        self.requests = []
+
+    def play(self, player_id, game_id, date):
+        self.games.setdefault(player_id, []).append(game(player_id, game_id, date))
+
+    def fetch_many(self, requests_, on_result=None):
+        results = []
+        for endpoint, params in requests_:
+            self.requests.append(params)
+            player_id = params["PlayerID"]
+            if player_id in self.failing:
+                result = FetchResult(endpoint, params, error=RuntimeError("503"))
+            else:
+                since = datetime.date.min
+                if params["DateFrom"]:
+                    since = datetime.datetime.strptime(params["DateFrom"], API_DATE_FORMAT).date()
+                rows = [row for row in self.games.get(player_id, [])
+                        if datetime.datetime.strptime(row[DATE], "%b %d, %Y").date() >= since]
+                result = FetchResult(endpoint, params, data={"resultSets": [
+                    {"name": "PlayerGameLog", "headers": HEADERS, "rowSet": rows}]})
+            on_result(result)
+            results.append(result)
+        return results
+
+
+@pytest.fixture
+def engine():
+    engine = FakeEngine()
+    engine.play(1, "0022300001", datetime.date(2023, 10, 24))
+    engine.play(1, "0022300002", datetime.date(2023, 10, 26))
+    engine.play(2, "0022300003", datetime.date(2023, 10, 24))
+    return engine
+
+
+@pytest.fixture
+def ingestor(tmp_path, engine):
+    return GameLogIngestor(str(tmp_path), engine=engine)
+
+
+def game_ids(ingestor):
+    return sorted(ingestor.scan("player", SEASON).collect()["Game_ID"].to_list())
+
+
+def test_appends_only_games_after_the_watermark(ingestor, engine):
+    stats = ingestor.run("player", [1, 2], SEASON)
+    assert (stats.entities, stats.new_games) == (2, 3)
+    # The watermark day is asked for again: its ingested game is dropped, a later one kept
+    engine.play(1, "0022300004", datetime.date(2023, 10, 26))
+    engine.play(1, "0022300005", datetime.date(2023, 10, 28))
+    stats = ingestor.run("player", [1, 2], SEASON, run_id="next")
+    assert engine.requests[-2]["DateFrom"] == "10/26/2023"
+    assert stats.new_games == 2
+    assert game_ids(ingestor) == ["0022300001", "0022300002", "0022300003", "0022300004",
+                                  "0022300005"]
+    watermark = ingestor.store.get("player", 1, SEASON)
+    assert watermark.position == (datetime.date(2023, 10, 28), "0022300005")
+
+
+def test_resumes_a_failed_run(ingestor, engine):
+    engine.failing.add(2)
+    stats = ingestor.run("player", [1, 2], SEASON, run_id="nightly")
+    assert (stats.entities, stats.failed) == (1, 1)
+    engine.failing.clear()
+    stats = ingestor.run("player", [1, 2], SEASON, run_id="nightly")
+    assert (stats.skipped, stats.entities, stats.new_games) == (1, 1, 1)
+    assert ingestor.store.done("nightly", "player") == set()
+    assert game_ids(ingestor) == ["0022300001", "0022300002", "0022300003"]
+
+
+def test_compact_merges_the_parts(ingestor, engine):
+    ingestor.run("player", [1, 2], SEASON)
+    assert ingestor.compact("player", SEASON) == 3
+    assert ingestor.compact("player", SEASON) == 0
+    assert game_ids(ingestor) == ["0022300001", "0022300002", "0022300003"]
+
+
+def test_rolling_update_reads_compacted_parts(ingestor, engine, tmp_path):
+    state_path = str(tmp_path / "rolling.npz")
+    ingestor.run("player", [1, 2], SEASON, run_id="first")
+    ingestor.compact("player", SEASON)
+    assert update_from_ingest(SEASON, ingestor.root, state_path) == 3
+    # The new game is compacted into the part file the state already applied
+    engine.play(1, "0022300004", datetime.date(2023, 10, 28))
+    ingestor.run("player", [1, 2], SEASON, run_id="second")
+    ingestor.compact("player", SEASON)
+    assert update_from_ingest(SEASON, ingestor.root, state_path) == 1
+    assert update_from_ingest(SEASON, ingestor.root, state_path) == 0
+    games = dict(load_state(state_path).features().select("Player_ID", "games").iter_rows())
+    assert games == {1: 3, 2: 1}
@@ -0,0 +1,61 @@
+"""Local ranks against the API ranks of the season store."""
+import polars as pl
+import pytest
+
+from backend.data.nba import season_store
+from backend.data.nba.leaderboard import Leaderboard, add_ranks, validate
+
+
+@pytest.mark.parametrize("season, per_mode", [(2015, "Totals"), (2016, "PerGame")])
+def test_ranks_agree_with_the_stored_api_ranks(season, per_mode):
+    shares = validate(season, per_mode)
+    assert shares and all(share == 1.0 for share in shares.values()), shares
+
+
+def test_store_leaderboard_matches_api_ranks():
+    stored = season_store.load(seasons=(2015, 2015))
+    board = Leaderboard.from_store(seasons=(2015, 2015))
+    assert board.seasons == [2015]
+    for player_id, rank in stored.select("PLAYER_ID", "PTS_RANK").iter_rows():
+        assert board.rank(2015, "PTS", player_id) == rank
+    assert Leaderboard.from_store(seasons=(2016, 2016)).seasons == []
+
+
+def frame(rows):
+    return pl.DataFrame(rows, schema=["season", "PLAYER_ID", "GP", "PTS", "PF", "FGM", "FGA"],
+                        orient="row")
+
+
+def test_ties_share_the_best_rank():
+    board = Leaderboard.from_frame(frame([
+        (2020, 1, 10, 50.0, 5.0, 1.0, 2.0), (2020, 2, 10, 70.0, 3.0, 2.0, 4.0),
+        (2020, 3, 10, 50.0, 3.0, 0.0, 0.0), (2020, 4, 10, 40.0, 9.0, 3.0, 4.0)]))
+    assert [(e.rank, e.player_id) for e in board.top(2020, "PTS", 4)] == \
+        [(1, 2), (2, 1), (2, 3), (4, 4)]
+    # Fouls rank from the fewest, no attempts count as a 0 percentage
+    assert board.rank(2020, "PF", 2) == board.rank(2020, "PF", 3) == 1
+    assert [e.player_id for e in board.top(2020, "FG_PCT", 4)] == [4, 1, 2, 3]
+    assert board.rank_of(2020, "PTS", 60.0) == 2
+    assert board.rank_of(2020, "PTS", 50.0) == 2
+
+
+def test_updates_and_min_gp_follow_add_ranks():
+    rows = [(2020, i, i % 7, float((i * 37) % 23), float(i % 5), float(i % 4), 4.0)
+            for i in range(1, 60)]
+    board = Leaderboard.from_frame(frame(rows))
+    for min_gp in (0, 3):
+        board.top(2020, "PTS", min_gp=min_gp)
+    updated = [(2020, i, 6, float(i), 1.0, 1.0, 2.0) for i in range(1, 60, 4)]
+    board.update(frame(updated))
+    current = {row[1]: row for row in rows}
+    current.update({row[1]: row for row in updated})
+    expected = frame(list(current.values()))
+    for min_gp in (0, 3):
+        ranks = add_ranks(expected, ["PTS"], min_gp=min_gp)
+        for player_id, rank in ranks.select("PLAYER_ID", "PTS_RANK").iter_rows():
+            assert board.rank(2020, "PTS", player_id, min_gp) == rank
+
+
+def test_unknown_per_mode_is_rejected():
+    with pytest.raises(ValueError):
+        Leaderboard("Per48Furlongs")
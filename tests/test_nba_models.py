@@ -0,0 +1,62 @@
+"""NBA_Player API helpers routed through the fetch engine.
+
+nba_models maps NBA_Player onto a foreign key to an nba_team table no model
+defines, so it is imported in a subprocess to keep the shared metadata usable.
+"""
+import json
+import os
+import subprocess
+import sys
+
+
+SCRIPT = """
+import json
+from loguru import logger
+from backend.data.nba.fetch import FetchError, FetchResult
+from backend.models.NBA import nba_models
+
+
+def response(player_id):
+    return {"resultSets": [{"name": "Rows", "headers": ["ID"], "rowSet": [[player_id]]}]}
+
+
+class FakeEngine:
+    def __init__(self):
+        self.endpoints = []
+
+    def fetch(self, endpoint, params):
+        self.endpoints.append(endpoint)
+        return response(params["PlayerID"])
+
+    def fetch_many(self, requests_):
+        results = []
+        for endpoint, params in requests_:
+            self.endpoints.append(endpoint)
+            if params["PlayerID"] == 2:
+                error = FetchError(endpoint, params, "503")
+                results.append(FetchResult(endpoint, params, error=error))
+            else:
+                results.append(FetchResult(endpoint, params, data=response(params["PlayerID"])))
+        return results
+
+
+engine = FakeEngine()
+nba_models.get_engine = lambda: engine
+errors = []
+logger.add(errors.append, level="ERROR")
+game_log = nba_models.NBA_Player.get_player_game_log(2544)
+info = nba_models.NBA_Player.get_players_info([1, 2, 3])
+print(json.dumps({"game_log": game_log, "info": info, "endpoints": engine.endpoints,
+                  "errors": [str(e) for e in errors]}))
+"""
+
+
+def test_requests_go_through_the_engine():
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    out = subprocess.run([sys.executable, "-c", SCRIPT], env=env, check=True,
+                         capture_output=True, text=True).stdout
+    result = json.loads(out.splitlines()[-1])
+    assert result["game_log"] == [[2544]]
+    assert result["info"] == {"1": [1], "3": [3]}
+    assert result["endpoints"] == ["playergamelog"] + ["commonplayerinfo"] * 3
+    assert len(result["errors"]) == 1 and "CommonPlayerInfo 2 failed" in result["errors"][0]
@@ -0,0 +1,61 @@
+"""Keyset pagination and streaming of BaseModel."""
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.database.db import make_engine
+from backend.models.base import BaseModel
+from backend.models.NBA.models import Team
+
+
+NAMES = ["Celtics", "Bulls", "Nets", "Bulls", "Heat", "Jazz", "Kings"]
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'nba.db'}")
+    BaseModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        Team.create_many(session, [{"id": i, "full_name": name, "city": "City"}
+                                   for i, name in enumerate(NAMES, 1)])
+        yield session
+    engine.dispose()
+
+
+def pages(session, **kwargs):
+    token, result = None, []
+    while True:
+        page = Team.paginate(session, limit=2, token=token, **kwargs)
+        result.append([team.id for team in page.items])
+        if page.next_token is None:
+            return result
+        token = page.next_token
+
+
+def test_pages_by_primary_key(session):
+    assert pages(session) == [[1, 2], [3, 4], [5, 6], [7]]
+    assert pages(session, descending=True) == [[7, 6], [5, 4], [3, 2], [1]]
+
+
+def test_pages_by_indexed_column_break_ties_on_id(session):
+    by_name = sorted(range(1, 8), key=lambda i: (NAMES[i - 1], i))
+    flat = [i for page in pages(session, order_by="full_name") for i in page]
+    assert flat == by_name
+    flat = [i for page in pages(session, order_by="full_name", descending=True) for i in page]
+    assert flat == by_name[::-1]
+
+
+def test_stream_yields_every_row(session):
+    assert [team.id for team in Team.stream(session, batch_size=3, order_by="id")] == \
+        list(range(1, 8))
+
+
+def test_invalid_requests_raise(session):
+    with pytest.raises(ValueError, match="not indexed"):
+        Team.paginate(session, order_by="city")
+    with pytest.raises(ValueError, match="no column"):
+        Team.paginate(session, order_by="missing")
+    with pytest.raises(ValueError, match="Invalid continuation token"):
+        Team.paginate(session, token="not a token")
+    token = Team.paginate(session, limit=2).next_token
+    with pytest.raises(ValueError, match="issued for ordering by id"):
+        Team.paginate(session, limit=2, token=token, order_by="full_name")
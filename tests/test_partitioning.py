@@ -0,0 +1,33 @@
+"""Season partitioning DDL; the Postgres run itself needs a server."""
+from sqlalchemy import inspect
+
+from backend.database.partitioning import partition_by_season, partition_ddl
+from backend.models.base import BaseModel
+from backend.models.NBA import models  # noqa: F401, registers the tables
+
+
+def test_ddl_recreates_keys_after_the_swap():
+    statements = partition_ddl(BaseModel.metadata.tables["player_basic_stats"], [2016, 2015])
+    renamed = statements.index("ALTER TABLE player_basic_stats_partitioned "
+                               "RENAME TO player_basic_stats")
+    assert statements[1:4] == [
+        "CREATE TABLE player_basic_stats_2015 PARTITION OF player_basic_stats_partitioned "
+        "FOR VALUES FROM (2015) TO (2016)",
+        "CREATE TABLE player_basic_stats_2016 PARTITION OF player_basic_stats_partitioned "
+        "FOR VALUES FROM (2016) TO (2017)",
+        "CREATE TABLE player_basic_stats_default PARTITION OF player_basic_stats_partitioned "
+        "DEFAULT",
+    ]
+    after = statements[renamed:]
+    assert "ALTER TABLE player_basic_stats ADD PRIMARY KEY (id, season_id)" in after
+    assert "ALTER TABLE player_basic_stats ADD FOREIGN KEY(player_id) REFERENCES players (id)" \
+        in after
+    assert "ALTER TABLE player_basic_stats ADD FOREIGN KEY(season_id) REFERENCES seasons (id)" \
+        in after
+
+
+def test_other_dialects_are_left_as_is(nba_session):
+    engine = nba_session.get_bind()
+    before = inspect(engine).get_foreign_keys("games")
+    assert partition_by_season(engine, "games", range(2015, 2017)) is False
+    assert inspect(engine).get_foreign_keys("games") == before
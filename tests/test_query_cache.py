@@ -0,0 +1,96 @@
+"""Read-through query cache of BaseModel lookups, with the in-process FakeRedis."""
+import pytest
+from sqlalchemy.orm import Session
+
+from backend.database import query_cache
+from backend.database.db import make_engine
+from backend.database.query_cache import FakeRedis, QueryCache
+from backend.database.unit_of_work import UnitOfWork
+from backend.models.base import BaseModel
+from backend.models.NBA.models import Team
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'nba.db'}")
+    BaseModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        Team.create_many(session, [{"id": 1, "full_name": "Boston Celtics", "city": "Boston"}])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def cache(redis):
+    cache = query_cache.configure_query_cache(redis, generation_ttl=0)
+    yield cache
+    query_cache.disable_query_cache()
+
+
+def city(engine):
+    with Session(engine) as session:
+        return Team().get(session, 1).city
+
+
+def test_hits_the_lru_then_redis(engine, cache, redis):
+    assert city(engine) == "Boston"
+    assert city(engine) == "Boston"
+    assert (cache.counters["misses"], cache.counters["lru_hits"]) == (1, 1)
+
+    # Another process sharing the Redis server
+    other = query_cache.configure_query_cache(redis, generation_ttl=0)
+    assert city(engine) == "Boston"
+    assert other.stats()["redis_hits"] == 1
+
+
+def test_commit_invalidates_other_processes(engine, cache, redis):
+    assert city(engine) == "Boston"
+    other = QueryCache(redis, generation_ttl=0)
+    key = other.key("teams", "get", {"id": 1})
+    assert other.get(key) is not None
+    with Session(engine) as session:
+        Team().get(session, 1).update(session, city="Brooklyn")
+    assert other.get(other.key("teams", "get", {"id": 1})) is None
+    assert city(engine) == "Brooklyn"
+
+
+def test_dirty_sessions_bypass_the_cache(engine, cache):
+    with Session(engine) as session:
+        team = Team().get(session, 1)
+        team.city = "Brooklyn"
+        assert Team().get_all_with_filter(session, city="Brooklyn")[0] is team
+        session.rollback()
+    assert cache.counters["bypasses"] == 1
+    assert city(engine) == "Boston"
+    with Session(engine) as session:
+        assert Team().get_all_with_filter(session, city="Brooklyn") == []
+
+
+def test_flushed_writes_bypass_the_cache(engine, cache):
+    with Session(engine) as session:
+        session.add(Team(id=2, full_name="Brooklyn Nets", city="Brooklyn"))
+        session.flush()
+        assert Team().get(session, 2).city == "Brooklyn"
+        session.rollback()
+        # A new transaction reads committed rows again
+        assert Team().get(session, 2) is None
+    assert cache.counters["bypasses"] == 1
+    with Session(engine) as session:
+        assert Team().get(session, 2) is None
+
+
+def test_open_unit_of_work_bypasses_the_cache(engine, cache):
+    with Session(engine) as session:
+        with pytest.raises(RuntimeError):
+            with UnitOfWork(session, flush_every=1):
+                Team().create(session, id=2, full_name="Brooklyn Nets", city="Brooklyn")
+                assert Team().get(session, 2).city == "Brooklyn"
+                raise RuntimeError("abort")
+    assert cache.counters["bypasses"] == 1
+    with Session(engine) as session:
+        assert Team().get(session, 2) is None
@@ -0,0 +1,74 @@
+"""Rolling game log features: backfill and game by game updates agree."""
+import datetime
+
+import numpy as np
+import polars as pl
+import pytest
+
+from backend.data.nba.rolling import STATS, RollingState, backfill, feature_names
+
+
+def game_logs(players=3, games=30, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for player_id in range(1, players + 1):
+        # Players miss games, so their game dates differ
+        days = np.sort(rng.choice(np.arange(games * 2), games, replace=False))
+        for day in days.tolist():
+            rows.append({"Player_ID": player_id, "GAME_DATE": datetime.date(2023, 10, 24)
+                         + datetime.timedelta(days=day), "Game_ID": f"00223{day:05d}",
+                         "WL": "W" if rng.random() < 0.6 else "L",
+                         **{stat: float(rng.integers(0, 30)) for stat in STATS}})
+    frame = pl.DataFrame(rows)
+    return frame.with_columns(pl.when(pl.col("Game_ID") == "0022300003")
+                              .then(None).otherwise(pl.col("PLUS_MINUS")).alias("PLUS_MINUS"))
+
+
+def assert_same(a, b):
+    assert a.select("Player_ID", "games", "Game_ID").equals(b.select("Player_ID", "games",
+                                                                       "Game_ID"))
+    np.testing.assert_allclose(a.select(feature_names()).to_numpy(),
+                               b.select(feature_names()).to_numpy(), rtol=1e-9, atol=1e-9)
+
+
+@pytest.fixture
+def logs():
+    return game_logs()
+
+
+def test_updates_match_the_backfill(logs):
+    history, backfilled = backfill(logs)
+    state = RollingState()
+    for _, night in logs.sort("GAME_DATE").group_by("GAME_DATE", maintain_order=True):
+        state.update(night)
+    assert_same(state.features().sort("Player_ID"), backfilled.features().sort("Player_ID"))
+    last = history.group_by("Player_ID").last().sort("Player_ID")
+    assert_same(last, backfilled.features().sort("Player_ID"))
+
+
+def test_backfill_then_update(logs):
+    cutoff = datetime.date(2023, 11, 20)
+    _, state = backfill(logs.filter(pl.col("GAME_DATE") < cutoff))
+    assert state.update(logs) == logs.filter(pl.col("GAME_DATE") >= cutoff).height
+    # Applying the same games again is a no-op
+    assert state.update(logs) == 0
+    assert_same(state.features().sort("Player_ID"), backfill(logs)[1].features().sort("Player_ID"))
+
+
+def test_window_features(logs):
+    history, _ = backfill(logs)
+    player = logs.filter(pl.col("Player_ID") == 1).sort("GAME_DATE")
+    row = history.filter(pl.col("Player_ID") == 1).row(-1, named=True)
+    assert row["pts_last_5"] == pytest.approx(player["PTS"].tail(5).mean())
+    assert row["pts_last_20"] == pytest.approx(player["PTS"].tail(20).mean())
+    wins = (player["WL"] == "W").to_list()[::-1]
+    assert row["streak_win"] == (wins.index(False) if False in wins else len(wins))
+
+
+def test_save_and_load(logs, tmp_path):
+    _, state = backfill(logs)
+    path = str(tmp_path / "rolling.npz")
+    state.save(path)
+    loaded = RollingState.load(path)
+    assert_same(loaded.features(), state.features())
+    assert loaded.update(logs) == 0
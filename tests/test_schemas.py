@@ -0,0 +1,44 @@
+"""Endpoint schema registry: header lookups, drift checks and typed projection."""
+import polars as pl
+import pytest
+
+from backend.data.nba import schemas
+from backend.data.nba.schemas import SchemaDriftError, check_headers, headers, project
+
+
+def payload(names, rows, name="PlayerGameLog"):
+    return {"resultSets": [{"name": name, "headers": names, "rowSet": rows}]}
+
+
+def test_headers_come_from_the_registry():
+    assert headers("LeagueDashPlayerStats")[-1] == "WNBA_FANTASY_PTS_RANK"
+    assert schemas.get_schema("leaguedashplayerstats", version=1).headers == \
+        [h for h in schemas.LEAGUE_DASH_PLAYER_STATS_V2
+         if h not in ("NICKNAME", "WNBA_FANTASY_PTS_RANK")]
+    with pytest.raises(KeyError):
+        headers("unknownendpoint")
+
+
+def test_check_headers_matches_older_versions():
+    old = schemas.get_schema("leaguedashplayerstats", version=1)
+    data = payload(old.headers, [], name="LeagueDashPlayerStats")
+    assert check_headers("leaguedashplayerstats", data)["LeagueDashPlayerStats"] is old
+
+
+def test_check_headers_reports_drift():
+    names = [h for h in headers("playergamelog") if h != "VIDEO_AVAILABLE"] + ["NEW_STAT"]
+    with pytest.raises(SchemaDriftError, match=r"added \['NEW_STAT'\], missing "
+                                               r"\['VIDEO_AVAILABLE'\]"):
+        check_headers("playergamelog", payload(names, []))
+
+
+def test_project_casts_only_the_requested_columns():
+    data = payload(["Game_ID", "Player_ID", "MIN", "FG_PCT"],
+                   [[21500001, "2544", 35, None], ["0021500002", 2544, 30, 0.5]])
+    frame = project(data, "playergamelog", ["Player_ID", "Game_ID", "FG_PCT"])
+    assert frame.columns == ["Player_ID", "Game_ID", "FG_PCT"]
+    assert frame.schema == {"Player_ID": pl.Int64, "Game_ID": pl.Utf8, "FG_PCT": pl.Float64}
+    assert frame["Player_ID"].to_list() == [2544, 2544]
+    assert frame["Game_ID"].to_list() == ["21500001", "0021500002"]
+    with pytest.raises(SchemaDriftError, match="missing"):
+        project(data, "playergamelog", ["PTS"])
@@ -0,0 +1,46 @@
+"""Season store partitions, per mode included."""
+import polars as pl
+
+from backend.data.nba import season_store
+
+
+def frame(player_ids, pts, gp=10):
+    return pl.DataFrame({"PLAYER_ID": player_ids, "TEAM_ID": [1] * len(player_ids),
+                         "TEAM_ABBREVIATION": ["BOS"] * len(player_ids),
+                         "GP": [gp] * len(player_ids), "PTS": pts})
+
+
+def test_per_modes_are_separate_partitions(tmp_path):
+    root = str(tmp_path)
+    season_store.write_season(frame([1, 2], [200.0, 100.0]), 2015, "Totals", root)
+    season_store.write_season(frame([1, 2], [20.0, 10.0]), 2015, "PerGame", root)
+    season_store.write_season(frame([1], [300.0]), "2016-17", root=root)
+
+    totals = season_store.load(["PLAYER_ID", "PTS"], root=root)
+    assert totals.columns == ["season", "PLAYER_ID", "PTS"]
+    assert sorted(totals["PTS"].to_list()) == [100.0, 200.0, 300.0]
+    per_game = season_store.load(["PTS"], per_mode="PerGame", root=root)
+    assert per_game["PTS"].to_list() == [20.0, 10.0]
+    both = season_store.load(["PTS"], seasons=(2015, 2015), per_mode=None, root=root)
+    assert both.columns == ["season", "per_mode", "PTS"]
+    assert both.group_by("per_mode").len().sort("per_mode")["len"].to_list() == [2, 2]
+
+    assert season_store.seasons(root=root) == [2015, 2016]
+    assert season_store.seasons("PerGame", root) == [2015]
+    assert season_store.seasons(None, root) == [2015, 2016]
+
+
+def test_rewriting_a_partition_replaces_it(tmp_path):
+    root = str(tmp_path)
+    season_store.write_season(frame([1, 2], [1.0, 2.0]), 2015, root=root)
+    season_store.write_season(frame([3], [3.0], gp=30), 2015, root=root)
+    loaded = season_store.load(root=root)
+    assert loaded["PLAYER_ID"].to_list() == [3]
+    # Columns missing from the frame are added as nulls of the registry dtype
+    assert loaded["PTS_RANK"].is_null().all()
+    assert season_store.load(min_gp=31, root=root).is_empty()
+
+
+def test_stored_seasons_keep_their_per_mode():
+    assert season_store.seasons("Totals") == [2015]
+    assert season_store.seasons("PerGame") == [2016]
@@ -0,0 +1,59 @@
+"""Player season similarity index over the bball_ref CSV files."""
+import numpy as np
+import polars as pl
+import pytest
+
+from backend.data.nba import similarity
+from backend.data.nba.similarity import SimilarityIndex, build_index, profiles
+
+
+# Seasons with both NBA and ABA profiles
+SEASONS = [1974, 1975, 1976]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return build_index(SEASONS)
+
+
+def test_profiles_are_standardized_per_league():
+    frame = profiles(SEASONS)
+    assert frame["seas_id"].is_unique().all()
+    assert frame.select("player_id", "season", "lg").is_unique().all()
+    assert sorted(frame["lg"].unique().to_list()) == ["ABA", "NBA"]
+    means = frame.filter(pl.col("mp") >= 250).group_by("season", "lg") \
+        .agg(pl.col("pts_per_100_poss").mean())
+    assert means["pts_per_100_poss"].abs().max() < 0.1
+
+
+def test_keeps_the_combined_rows_of_traded_players():
+    frame = pl.LazyFrame({"player_id": [1, 1, 1, 2, 2, 2, 3],
+                          "season": [2025, 2025, 2025, 1990, 1990, 1990, 2025],
+                          "lg": ["NBA"] * 7,
+                          "tm": ["2TM", "BOS", "LAL", "TOT", "ATL", "NYK", "MIA"]})
+    kept = similarity._combined_rows(frame).collect()
+    assert kept["tm"].to_list() == ["2TM", "TOT", "MIA"]
+
+
+def test_player_in_both_leagues_has_a_profile_per_league(index):
+    # Chuck Terry played for Milwaukee and San Antonio in 1974
+    seas_ids = index.seas_ids(1432, 1974)
+    assert len(seas_ids) == 2
+    assert sorted(index.labels[index.row(s)]["lg"].item() for s in seas_ids) == ["ABA", "NBA"]
+    neighbors = index.most_similar(seas_ids[0], k=5)
+    assert len(neighbors) == 5
+    assert all(n.player_id != 1432 for n in neighbors)
+    assert [n.score for n in neighbors] == sorted((n.score for n in neighbors), reverse=True)
+    with pytest.raises(KeyError, match="seas_id"):
+        index.row(-1)
+
+
+def test_round_trip_without_pickle(index, tmp_path):
+    path = str(tmp_path / "similarity.npz")
+    index.save(path)
+    with np.load(path, allow_pickle=False) as data:
+        assert all(data[name].dtype != object for name in data.files)
+    loaded = SimilarityIndex.load(path)
+    assert loaded.labels.equals(index.labels)
+    assert np.array_equal(loaded.vectors, index.vectors)
+    assert loaded.sources == index.sources
@@ -0,0 +1,92 @@
+"""Monte Carlo season simulator: reproducibility, outcome counts and the team model."""
+import numpy as np
+import pytest
+
+from backend.models.NBA.models import Game, Season, Team
+from backend.models.NBA.simulation import Schedule, TeamModel, load_schedule, simulate_season
+
+
+TEAMS = 30
+
+
+def league(played=0.5, seed=0):
+    """Double round robin of two 15 team conferences, the first games played."""
+    rng = np.random.default_rng(seed)
+    ratings = np.linspace(-8, 8, TEAMS)
+    games = [(home, away) for home in range(TEAMS) for away in range(TEAMS) if home != away]
+    games = [games[i] for i in rng.permutation(len(games))]
+    rows = []
+    for i, (home, away) in enumerate(games):
+        if i < played * len(games):
+            margin = round(2.5 + ratings[home] - ratings[away] + 12 * rng.standard_normal())
+            margin = margin or 1
+            rows.append((home + 1, away + 1, 100 + max(margin, 0), 100 + max(-margin, 0)))
+        else:
+            rows.append((home + 1, away + 1, None, None))
+    conferences = {team: "East" if team <= TEAMS // 2 else "West" for team in range(1, TEAMS + 1)}
+    return Schedule.from_games(rows, conferences)
+
+
+@pytest.fixture(scope="module")
+def schedule():
+    return league()
+
+
+def counts(result):
+    return result.wins, result.seeds, result.play_in, result.playoffs
+
+
+def test_results_do_not_depend_on_the_workers(schedule):
+    kwargs = dict(simulations=2_000, seed=7, shard_size=500, chunk_size=200)
+    single = simulate_season(schedule, workers=1, **kwargs)
+    pooled = simulate_season(schedule, workers=2, **kwargs)
+    for a, b in zip(counts(single), counts(pooled)):
+        np.testing.assert_array_equal(a, b)
+    other = simulate_season(schedule, workers=1, **{**kwargs, "seed": 8})
+    assert not np.array_equal(single.wins, other.wins)
+
+
+def test_outcome_counts_add_up(schedule):
+    n = 1_000
+    result = simulate_season(schedule, simulations=n, workers=1)
+    assert result.wins.sum() == len(schedule.home) * n
+    for conference in ("East", "West"):
+        members = result.conferences == conference
+        assert (result.seeds[members].sum(axis=0) == n).all()
+        assert result.play_in[members].sum() == 4 * n
+        assert result.playoffs[members].sum() == 8 * n
+    table = result.table()
+    assert table["playoffs"].max() <= 1
+    # The strongest team of each conference makes the playoffs nearly always
+    assert result.playoffs[[TEAMS // 2 - 1, TEAMS - 1]].min() > 0.9 * n
+
+
+def test_played_season_is_certain():
+    schedule = league(played=1.0)
+    result = simulate_season(schedule, simulations=100, workers=1)
+    won = np.where(schedule.margin > 0, schedule.home, schedule.away)
+    np.testing.assert_array_equal(result.wins, 100 * np.bincount(won, minlength=TEAMS))
+
+
+def test_model_recovers_the_ratings(schedule):
+    model = TeamModel.fit(schedule)
+    assert np.corrcoef(model.ratings, np.linspace(-8, 8, TEAMS))[0, 1] > 0.8
+    assert 0 < model.home_advantage < 5
+    assert 10 < model.margin_sd < 14
+    # Before any game the model is the prior
+    prior = TeamModel.fit(league(played=0.0))
+    assert (prior.ratings == 0).all() and prior.home_advantage == pytest.approx(2.5)
+
+
+def test_load_schedule(nba_session):
+    nba_session.add_all([Season(id=2023, year=2023), Team(id=1, conference="East"),
+                         Team(id=2, conference="West"),
+                         Game(id=1, season_id=2023, home_team_id=1, away_team_id=2,
+                              home_team_score=110, away_team_score=100),
+                         Game(id=2, season_id=2023, home_team_id=2, away_team_id=1),
+                         Game(id=3, season_id=2023, home_team_id=1)])
+    nba_session.commit()
+    schedule = load_schedule(nba_session, 2023)
+    assert schedule.team_ids.tolist() == [1, 2]
+    assert schedule.conferences.tolist() == ["East", "West"]
+    assert schedule.margin[0] == 10 and np.isnan(schedule.margin[1])
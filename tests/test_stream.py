@@ -0,0 +1,65 @@
+"""Streaming resultSets reader: batches, typing and the envelope layouts."""
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from backend.data.nba import stream
+from backend.data.nba.schemas import headers
+
+
+def save(tmp_path, data, name="response.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps(data, indent=1))
+    return str(path)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Values straddle the buffer edge on almost every refill
+    monkeypatch.setattr(stream._Reader.__init__, "__defaults__", (7,))
+
+
+def test_batches_match_json_load(tmp_path, small_chunks):
+    rows = [[i, f"Player {i}", i * 1.5 if i % 3 else None] for i in range(25)]
+    path = save(tmp_path, {"resource": "unregistered", "parameters": {"Season": "2015-16"},
+                           "resultSets": [
+                               {"name": "Players", "headers": ["ID", "NAME", "PTS"],
+                                "rowSet": rows},
+                               {"name": "Empty", "headers": ["ID"], "rowSet": []}]})
+    batches = list(stream.iter_batches(path, batch_size=10))
+    assert [(name, batch.num_rows) for name, batch in batches] == \
+        [("Players", 10), ("Players", 10), ("Players", 5)]
+    table = pa.Table.from_batches([batch for _, batch in batches])
+    assert table.schema.types == [pa.int64(), pa.string(), pa.float64()]
+    assert [list(row.values()) for row in table.to_pylist()] == rows
+
+
+def test_registered_schemas_type_the_columns(tmp_path, small_chunks):
+    names = headers("playerindex")
+    row = dict.fromkeys(names)
+    row.update(PERSON_ID=2544, PLAYER_LAST_NAME="James", JERSEY_NUMBER=23, DRAFT_YEAR="2003")
+    path = save(tmp_path, {"resource": "playerindex", "resultSets": [
+        {"name": "PlayerIndex", "headers": names, "rowSet": [[row[n] for n in names]]}]})
+    table = stream.read_table(path)
+    assert table.schema.field("JERSEY_NUMBER").type == pa.string()
+    assert table.schema.field("DRAFT_YEAR").type == pa.int64()
+    assert table.to_pylist()[0]["JERSEY_NUMBER"] == "23"
+    assert table.to_pylist()[0]["DRAFT_YEAR"] == 2003
+
+
+def test_single_result_set_with_headers_last(tmp_path):
+    path = save(tmp_path, {"resultSet": {"rowSet": [[1, "a"], [2, "b"]], "name": "Legacy",
+                                         "headers": ["ID", "CODE"]}})
+    assert stream.read_table(path, "Legacy").to_pydict() == {"ID": [1, 2], "CODE": ["a", "b"]}
+    with pytest.raises(KeyError):
+        stream.read_table(path, "Missing")
+
+
+def test_to_parquet(tmp_path):
+    path = save(tmp_path, {"resultSets": [{"name": "Players", "headers": ["ID"],
+                                           "rowSet": [[i] for i in range(7)]}]})
+    target = str(tmp_path / "players.parquet")
+    assert stream.to_parquet(path, target, batch_size=3) == 7
+    assert pq.read_table(target)["ID"].to_pylist() == list(range(7))
@@ -0,0 +1,55 @@
+"""UnitOfWork batching BaseModel writes on file SQLite."""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from backend.database.db import make_engine
+from backend.database.unit_of_work import UnitOfWork
+from backend.models.base import BaseModel
+from backend.models.NBA.models import Team
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'nba.db'}")
+    BaseModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def team_ids(engine):
+    with Session(engine) as session:
+        return session.scalars(select(Team.id).order_by(Team.id)).all()
+
+
+def test_commits_in_batches(engine):
+    with Session(engine) as session:
+        with UnitOfWork(session, flush_every=2, commit_every=4) as unit:
+            for i in range(1, 6):
+                Team().create(session, id=i, full_name=f"Team {i}")
+    assert (unit.written, unit.flushes, unit.commits) == (5, 3, 2)
+    assert team_ids(engine) == [1, 2, 3, 4, 5]
+
+
+def test_rolls_back_flushed_rows(engine):
+    with Session(engine) as session:
+        with pytest.raises(RuntimeError):
+            with UnitOfWork(session, flush_every=2, commit_every=None) as unit:
+                for i in range(1, 4):
+                    Team().create(session, id=i, full_name=f"Team {i}")
+                assert unit.flushes == 1
+                raise RuntimeError("abort")
+    # The flushed batch was released, not committed
+    assert team_ids(engine) == []
+
+
+def test_failed_rows_are_isolated(engine):
+    with Session(engine) as session:
+        Team().create(session, id=2, full_name="Existing")
+    with Session(engine) as session:
+        with UnitOfWork(session, flush_every=3) as unit:
+            for i in range(1, 4):
+                Team().create(session, id=i, full_name=f"Team {i}")
+    assert [failure.key for failure in unit.failures] == [{"id": 2}]
+    assert unit.written == 2
+    assert team_ids(engine) == [1, 2, 3]